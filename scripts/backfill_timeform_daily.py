@@ -9,6 +9,7 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(PROJECT_ROOT))
 
 from src.config import settings
+from src.utils.files import read_csv_with_log
 
 
 def _ensure_output_dir(name: str) -> Path:
@@ -43,7 +44,8 @@ def consolidate_day(day_str: str) -> None:
 
 	for track_folder_name, csv_path in _iter_race_csvs(day_dir):
 		try:
-			df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+			# CSVs por corrida gravados via log (src/utils/files.py): inclui registros ainda não compactados
+			df = read_csv_with_log(csv_path)
 		except Exception as e:
 			logger.error("Falha ao ler {}: {}", csv_path, e)
 			continue
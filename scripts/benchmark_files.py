@@ -0,0 +1,250 @@
+import sys
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.utils.files import append_or_create_csv, compact_csv_log, condense_day_folders, upsert_row_by_keys, upsert_single_row_csv
+
+
+def _timed(label: str, fn: Callable[[], object], repeat: int) -> Tuple[object, float]:
+    best = float("inf")
+    out: object = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    logger.info("{}: {:.3f}s (melhor de {})", label, best, max(1, repeat))
+    return out, best
+
+
+def _legacy_append_or_create_csv(csv_path: Path, row: Dict[str, object]) -> None:
+    """append_or_create_csv original (relê e regrava o CSV inteiro), mantido apenas como referência."""
+    if csv_path.exists():
+        df = pd.read_csv(csv_path)
+        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+        df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+    else:
+        pd.DataFrame([row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+
+
+def _legacy_upsert_single_row_csv(csv_path: Path, update_row: Dict[str, object]) -> None:
+    """upsert_single_row_csv original, mantido apenas como referência."""
+    if csv_path.exists():
+        try:
+            df_existing = pd.read_csv(csv_path)
+            base = {}
+            if not df_existing.empty:
+                base = df_existing.iloc[-1].to_dict()
+            base.update(update_row)
+            pd.DataFrame([base]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+            return
+        except Exception:
+            pass
+    pd.DataFrame([update_row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+
+
+def _legacy_upsert_row_by_keys(csv_path: Path, new_row: Dict[str, object], key_fields: list) -> None:
+    """upsert_row_by_keys original, mantido apenas como referência."""
+    if csv_path.exists():
+        try:
+            df = pd.read_csv(csv_path)
+            if not df.empty and all(k in df.columns for k in key_fields):
+                mask = pd.Series([True] * len(df))
+                for k in key_fields:
+                    mask &= (df[k].astype(str) == str(new_row.get(k, "")))
+                if mask.any():
+                    out_df = pd.concat([df[~mask], pd.DataFrame([new_row])], ignore_index=True)
+                    out_df = out_df[list(new_row.keys())]
+                    out_df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+                    return
+            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+            df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+            return
+        except Exception:
+            pass
+    pd.DataFrame([new_row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+
+
+def _csv_workload(rows: int, seed: int = 7) -> list:
+    """Operações sintéticas (append, upsert por pista/horário/trap e atualização de linha única)."""
+    rng = np.random.default_rng(seed)
+    ops = []
+    for i in range(rows):
+        trap = int(rng.integers(1, 7))
+        race = f"2025-01-{1 + int(rng.integers(0, 28)):02d}T{12 + int(rng.integers(0, 8)):02d}:00"
+        row = {"track_name": f"Track {int(rng.integers(0, 5))}", "race_time_iso": race, "trap": trap, "odds": round(float(rng.uniform(1.5, 20)), 2), "seq": i}
+        kind = int(rng.integers(0, 3))
+        if kind == 0:
+            ops.append(("append", row))
+        elif kind == 1:
+            ops.append(("upsert", row))
+        else:
+            ops.append(("single", {"last_update": i, "status": "ok" if i % 3 else None}))
+    return ops
+
+
+def bench_csvlog(rows: int) -> bool:
+    """Upserts/appends em CSV: leitura+regravação por linha (antigo) x log com compactação.
+
+    Os CSVs finais de cada tipo de operação precisam ser idênticos byte a byte.
+    """
+    keys = ["track_name", "race_time_iso", "trap"]
+    ops = _csv_workload(rows)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+
+        def _run(prefix: str, append, upsert, single) -> None:
+            for op, row in ops:
+                if op == "append":
+                    append(base / f"{prefix}_append.csv", row)
+                elif op == "upsert":
+                    upsert(base / f"{prefix}_upsert.csv", row, keys)
+                else:
+                    single(base / f"{prefix}_single.csv", row)
+
+        _, t_old = _timed(f"{rows} operações, leitura+regravação", lambda: _run("old", _legacy_append_or_create_csv, _legacy_upsert_row_by_keys, _legacy_upsert_single_row_csv), 1)
+
+        def _new() -> None:
+            _run("new", append_or_create_csv, upsert_row_by_keys, upsert_single_row_csv)
+            for name in ("append", "upsert", "single"):
+                compact_csv_log(base / f"new_{name}.csv")
+
+        _, t_new = _timed(f"{rows} operações, log + compactação", _new, 1)
+        for name in ("append", "upsert", "single"):
+            same = (base / f"old_{name}.csv").read_bytes() == (base / f"new_{name}.csv").read_bytes()
+            ok &= same
+            if not same:
+                logger.error("CSV {} diverge da implementação antiga", name)
+    logger.info("CSV por registro: {:.3f}s antigo x {:.3f}s log -> {:.1f}x; idêntico: {}", t_old, t_new, t_old / max(t_new, 1e-9), ok)
+    return ok
+
+
+def _legacy_condense_csv_to_single_row(csv_path: Path) -> None:
+    """condense_csv_to_single_row original (laço por coluna/célula), mantido apenas como referência."""
+    if not csv_path.exists():
+        return
+    try:
+        df = pd.read_csv(csv_path)
+        if df.empty:
+            df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+            return
+        aggregated: Dict[str, object] = {}
+        for col in df.columns:
+            series = df[col]
+            val = None
+            for item in series[::-1]:
+                if pd.notna(item) and str(item).strip() != "":
+                    val = item
+                    break
+            aggregated[col] = val if val is not None else (series.iloc[-1] if len(series) > 0 else None)
+        pd.DataFrame([aggregated]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+    except Exception:
+        return
+
+
+def _condense_fixtures(root: Path, days: int, races: int, seed: int = 11) -> None:
+    """Pastas de dia sintéticas (AAAA-MM-DD/<pista>/<corrida>.csv) com linhas repetidas por corrida.
+
+    Cobrem células vazias, só com espaços, colunas sem nenhum valor, números, booleanos,
+    arquivos só com cabeçalho e arquivos vazios.
+    """
+    rng = np.random.default_rng(seed)
+    cols = ["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3", "TimeformForecast", "num_runners", "bsp", "is_final", "notes"]
+    for d in range(days):
+        day_dir = root / (pd.Timestamp("2025-01-01") + pd.Timedelta(days=d)).strftime("%Y-%m-%d")
+        day_dir.mkdir(parents=True)
+        # race_links.csv fica na raiz do dia e não deve ser condensado
+        pd.DataFrame([{"track_name": "Track_0", "race_url": "a"}, {"track_name": "Track_0", "race_url": "a"}]).to_csv(day_dir / "race_links.csv", index=False, encoding=settings.CSV_ENCODING)
+        for r in range(races):
+            track_dir = day_dir / f"Track_{r % 6}"
+            track_dir.mkdir(exist_ok=True)
+            path = track_dir / f"race_{r:03d}.csv"
+            kind = int(rng.integers(0, 20))
+            if kind == 0:
+                path.write_text("")
+                continue
+            n = 0 if kind == 1 else int(rng.integers(1, 30))
+            rows = []
+            for i in range(n):
+                row = {}
+                for c in cols:
+                    roll = rng.random()
+                    if c == "notes" and kind == 2:
+                        row[c] = None
+                    elif roll < 0.25:
+                        row[c] = None
+                    elif roll < 0.35 and c not in ("num_runners", "bsp", "is_final"):
+                        row[c] = "   "
+                    elif c == "num_runners":
+                        row[c] = int(rng.integers(4, 9))
+                    elif c == "bsp":
+                        row[c] = round(float(rng.uniform(1.1, 30)), 2)
+                    elif c == "is_final":
+                        row[c] = bool(rng.integers(0, 2))
+                    else:
+                        row[c] = f"{c}_{i}_{int(rng.integers(0, 100))}"
+                rows.append(row)
+            pd.DataFrame(rows, columns=cols).to_csv(path, index=False, encoding=settings.CSV_ENCODING)
+
+
+def bench_condense(days: int, races: int, workers: list) -> bool:
+    """Condensação dos CSVs por corrida: laço célula a célula (antigo) x vetorizado em lote por pasta de dia.
+
+    Os arquivos condensados precisam ser idênticos byte a byte aos do laço antigo.
+    """
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = Path(tmp) / "fixtures"
+        _condense_fixtures(fixtures, days, races)
+        day_dirs = sorted(p for p in fixtures.iterdir() if p.is_dir())
+        paths = sorted(p.relative_to(fixtures) for d in day_dirs for p in d.glob("*/*.csv"))
+        ref = Path(tmp) / "ref"
+        shutil.copytree(fixtures, ref)
+        _, t_old = _timed(f"{len(paths)} CSVs, laço por célula", lambda: [_legacy_condense_csv_to_single_row(ref / p) for p in paths], 1)
+        for w in [1] + [int(x) for x in workers if int(x) > 1]:
+            out = Path(tmp) / f"out_{w}"
+            shutil.copytree(fixtures, out)
+            _, t_new = _timed(f"{len(paths)} CSVs, vetorizado ({w} processo(s))", lambda: condense_day_folders(sorted(out.iterdir()), workers=w), 1)
+            diff = [p for p in paths if (ref / p).read_bytes() != (out / p).read_bytes()]
+            diff += [p for d in day_dirs for p in [d.relative_to(fixtures) / "race_links.csv"] if (out / p).read_bytes() != (fixtures / p).read_bytes()]
+            ok &= not diff
+            if diff:
+                logger.error("{} arquivos divergem (ex.: {})", len(diff), diff[:3])
+            logger.info("Condensação com {} processo(s): {:.3f}s x {:.3f}s antigo -> {:.1f}x; idêntico: {}", w, t_new, t_old, t_old / max(t_new, 1e-9), not diff)
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Benchmarks (e checagens de equivalência) da gravação de CSVs (src/utils/files.py)")
+    parser.add_argument("target", choices=["csvlog", "condense"], help="Etapa a medir")
+    parser.add_argument("--rows", type=int, default=None, help="Operações de append/upsert sintéticas (csvlog, padrão 3000) / corridas por dia (condense, padrão 200)")
+    parser.add_argument("--days", type=int, default=10, help="Pastas de dia sintéticas (condense)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8], help="Quantidades de processos a medir (condense; 1 sempre é medido)")
+    args = parser.parse_args(argv)
+
+    ok = True
+    if args.target == "csvlog":
+        ok &= bench_csvlog(max(1, int(args.rows or 3000)))
+    elif args.target == "condense":
+        ok &= bench_condense(max(1, int(args.days)), max(1, int(args.rows or 200)), args.workers)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,828 @@
+import sys
+import argparse
+import json
+import math
+import shutil
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.analysis.betfair import (
+    RESULT_FILE_PREFIX,
+    RunnerBF,
+    RunnerTable,
+    _read_result_csv,
+    _extract_track_from_menu_hint,
+    _strip_trap_prefix,
+    _to_iso_yyyy_mm_dd_thh_mm,
+    load_betfair_results,
+    load_normalized_results,
+    stream_betfair_results,
+)
+from src.analysis.identity import SelectionIdentity, matched_pairs
+from src.analysis.feature_store import FEATURES_CODE, _input_paths, code_digest, load_or_build, load_race_table, race_table
+from src.analysis.races import RaceIndex
+from src.analysis.signal_store import (
+    DASHBOARD_SIGNAL_COLUMNS,
+    load_normalized_signals,
+    load_signals_dataset,
+    normalized_paths,
+    signals_dataset_dates,
+    write_normalized_signals,
+    write_signals_dataset,
+)
+from src.analysis.incremental import _fingerprint, generate_signals_incremental
+from src.analysis import sqlite_store
+from src.analysis.signal_engine import compute_signals_frame, race_features
+from src.analysis.sweep import parse_grid, sweep_rule
+from src.analysis.signals import (
+    SignalContext,
+    _calc_signals_for_race,
+    generate_signals,
+    generate_signals_batch,
+    iter_signals,
+    load_betfair_place,
+    load_betfair_win,
+    load_timeform_forecast_frame,
+    load_timeform_forecast_top3,
+    load_timeform_top3,
+    load_timeform_top3_frame,
+    write_signals_csv,
+    write_signals_stream,
+)
+from src.utils.text import clean_horse_name, clean_horse_names, name_cache_stats, normalize_track_name, normalize_track_names
+
+
+def bench_sqlite(repeat: int, workers: int) -> bool:
+    """Banco SQLite x CSVs: sincroniza um banco temporário e compara cada consulta com o loader de CSV.
+
+    Confere Result normalizado (win/place), frames Timeform, sinais (tipos de pd.read_csv) e o
+    export dos CSVs de sinais byte a byte; mede a janela da primeira tela do dashboard.
+    """
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        with sqlite_store.open_store(Path(tmp) / "greyhounds.sqlite") as conn:
+            changed, t_sync = _timed("sync completo", lambda: sqlite_store.sync_store(conn, workers=workers), 1)
+            _, t_resync = _timed("sync sem mudanças", lambda: sqlite_store.sync_store(conn, workers=workers), 1)
+            logger.info("Arquivos importados: {}; linhas: {}", changed, sqlite_store.store_stats(conn))
+            for market in ("win", "place"):
+                csv_df, t_csv = _timed(f"Result {market} (CSV/cache)", lambda: load_normalized_results(market, workers=workers), repeat)
+                db_df, t_db = _timed(f"Result {market} (SQLite)", lambda: sqlite_store.read_results(conn, market), repeat)
+                same = db_df.equals(csv_df)
+                ok &= same
+                logger.info("Result {}: {} linhas, {:.3f}s x {:.3f}s; idêntico: {}", market, len(csv_df), t_csv, t_db, same)
+            for source, load in (("top3", load_timeform_top3_frame), ("forecast", load_timeform_forecast_frame)):
+                csv_df, t_csv = _timed(f"Timeform {source} (CSV)", load, repeat)
+                db_df, t_db = _timed(f"Timeform {source} (SQLite)", lambda: load(sqlite_store.read_timeform(conn, source)), repeat)
+                same = db_df.equals(csv_df)
+                ok &= same
+                logger.info("Timeform {}: {} linhas, {:.3f}s x {:.3f}s; idêntico: {}", source, len(csv_df), t_csv, t_db, same)
+            for path in sorted((settings.DATA_DIR / "signals").glob("signals_*.csv")):
+                combo = sqlite_store.parse_signals_name(path.name)
+                if combo is None:
+                    continue
+                wide = pd.read_csv(path, encoding=settings.CSV_ENCODING)
+                db_df = sqlite_store.read_signals(conn, *combo)
+                same = db_df is not None and db_df.equals(wide)
+                dates = sqlite_store.signal_dates(conn, *combo) or []
+                window = dates[-settings.DASHBOARD_DEFAULT_DAYS:]
+
+                def _before() -> pd.DataFrame:
+                    df = pd.read_csv(path, encoding=settings.CSV_ENCODING)
+                    return df[df["date"].isin(window)].reset_index(drop=True)
+
+                before, t_before = _timed(f"{path.name} CSV + filtro", _before, repeat)
+                after, t_after = _timed(
+                    f"{path.name} SQLite, {len(window)} dias",
+                    lambda: sqlite_store.read_signals(conn, *combo, dates=window, columns=DASHBOARD_SIGNAL_COLUMNS), repeat,
+                )
+                cols = [c for c in before.columns if c in DASHBOARD_SIGNAL_COLUMNS]
+                same &= after is not None and after.equals(before[cols])
+                ok &= same
+                if not same:
+                    logger.error("Sinais do banco divergem do CSV: {}", path.name)
+            for path in sqlite_store.export_csvs(conn, Path(tmp) / "export", ["signals"]):
+                same = path.read_bytes() == (settings.DATA_DIR / "signals" / path.name).read_bytes()
+                ok &= same
+                if not same:
+                    logger.error("Export diverge do CSV original: {}", path.name)
+        size = (Path(tmp) / "greyhounds.sqlite").stat().st_size
+    logger.info("SQLite: sync {:.3f}s, ressync {:.3f}s, {:.1f} MB; tudo idêntico: {}", t_sync, t_resync, size / 2**20, ok)
+    return ok
+
+
+def _timed(label: str, fn: Callable[[], object], repeat: int) -> Tuple[object, float]:
+    best = float("inf")
+    out: object = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    logger.info("{}: {:.3f}s (melhor de {})", label, best, max(1, repeat))
+    return out, best
+
+
+def _legacy_load_betfair(market: str) -> Dict[Tuple[str, str], Dict[str, RunnerBF]]:
+    """Implementação original (groupby + iterrows), mantida apenas como referência."""
+    result_dir = settings.DATA_DIR / "Result"
+    index: Dict[Tuple[str, str], Dict[str, RunnerBF]] = {}
+    for csv_path in sorted(result_dir.glob(f"{RESULT_FILE_PREFIX[market]}*.csv")):
+        try:
+            df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+        except Exception:
+            continue
+        for col in ["menu_hint", "event_dt", "selection_name", "pptradedvol", "bsp", "win_lose"]:
+            if col not in df.columns:
+                df[col] = ""
+        df["track_key"] = df["menu_hint"].astype(str).map(_extract_track_from_menu_hint)
+        df["race_iso"] = df["event_dt"].astype(str).map(_to_iso_yyyy_mm_dd_thh_mm)
+        df["selection_name_raw"] = df["selection_name"].astype(str)
+        df["selection_name_clean"] = df["selection_name_raw"].map(_strip_trap_prefix).map(clean_horse_name)
+        df["pptradedvol"] = pd.to_numeric(df["pptradedvol"], errors="coerce").fillna(0.0)
+        df["bsp"] = pd.to_numeric(df["bsp"], errors="coerce")
+        df["win_lose"] = pd.to_numeric(df["win_lose"], errors="coerce").fillna(0).astype(int)
+        for (track_key, race_iso), grp in df.groupby(["track_key", "race_iso"], dropna=False):
+            if not track_key or not race_iso:
+                continue
+            runners = index.setdefault((track_key, race_iso), {})
+            for _, r in grp.iterrows():
+                name_clean = r["selection_name_clean"]
+                if not isinstance(name_clean, str) or not name_clean:
+                    continue
+                runners[name_clean] = RunnerBF(
+                    selection_name_raw=r["selection_name_raw"],
+                    selection_name_clean=name_clean,
+                    pptradedvol=float(r["pptradedvol"]),
+                    bsp=float(r["bsp"]) if pd.notna(r["bsp"]) else float("nan"),
+                    win_lose=int(r["win_lose"]),
+                )
+    return index
+
+
+def _same_runner(a: RunnerBF, b: RunnerBF) -> bool:
+    same_bsp = (math.isnan(a.bsp) and math.isnan(b.bsp)) or a.bsp == b.bsp
+    return (
+        a.selection_name_raw == b.selection_name_raw
+        and a.selection_name_clean == b.selection_name_clean
+        and a.pptradedvol == b.pptradedvol
+        and same_bsp
+        and a.win_lose == b.win_lose
+    )
+
+
+def _frames_equal(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(a, b)
+        return True
+    except AssertionError:
+        return False
+
+
+def _tables_equal(a: RunnerTable, b: RunnerTable) -> bool:
+    return a.race_keys == b.race_keys and all(
+        list(a[k]) == list(b[k]) and all(_same_runner(r, b[k][name]) for name, r in a[k].items())
+        for k in a.race_keys
+    )
+
+
+def bench_loader(market: str, repeat: int) -> bool:
+    legacy, t_legacy = _timed(f"loader {market} (iterrows)", lambda: _legacy_load_betfair(market), repeat)
+    table, t_table = _timed(f"loader {market} (colunar)", lambda: load_betfair_results(market, use_cache=False), repeat)
+    logger.info("Speedup loader {}: {:.1f}x", market, t_legacy / t_table if t_table > 0 else float("inf"))
+
+    ok = set(legacy) == set(table)
+    for key, runners in legacy.items():
+        if not ok:
+            break
+        group = table.get(key)
+        ok = group is not None and list(runners) == list(group) and all(
+            _same_runner(r, group[name]) for name, r in runners.items()
+        )
+        if not ok:
+            logger.error("Divergência na corrida {}", key)
+    logger.info("Equivalência loader {}: {}", market, "OK" if ok else "FALHOU")
+    return ok
+
+
+def bench_names(market: str, repeat: int) -> bool:
+    result_dir = settings.DATA_DIR / "Result"
+    frames = []
+    for csv_path in sorted(result_dir.glob(f"{RESULT_FILE_PREFIX[market]}*.csv")):
+        try:
+            frames.append(pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, usecols=["menu_hint", "selection_name"]))
+        except Exception:
+            continue
+    if not frames:
+        logger.warning("Sem arquivos {} para medir", market)
+        return True
+    df = pd.concat(frames, ignore_index=True).astype(str)
+    names = df["selection_name"].map(_strip_trap_prefix)
+    tracks = df["menu_hint"]
+
+    old_names, t_old_n = _timed(f"clean_horse_name .map ({len(names)} linhas)", lambda: names.map(clean_horse_name), repeat)
+    new_names, t_new_n = _timed("clean_horse_names (distintos)", lambda: clean_horse_names(names), repeat)
+    old_tracks, t_old_t = _timed("normalize_track_name .map", lambda: tracks.map(normalize_track_name), repeat)
+    new_tracks, t_new_t = _timed("normalize_track_names (distintos)", lambda: normalize_track_names(tracks), repeat)
+    logger.info("Speedup nomes: {:.1f}x, pistas: {:.1f}x", t_old_n / max(t_new_n, 1e-9), t_old_t / max(t_new_t, 1e-9))
+    logger.info("Cache de nomes: {}", name_cache_stats())
+
+    ok = old_names.equals(new_names) and old_tracks.equals(new_tracks)
+    logger.info("Equivalência nomes {}: {}", market, "OK" if ok else "FALHOU")
+    return ok
+
+
+def bench_ingest(market: str, repeat: int, workers_list: list[int]) -> bool:
+    base, t_base = _timed(f"ingestão {market} (1 processo)", lambda: load_normalized_results(market, use_cache=False), repeat)
+    ok = True
+    for n in workers_list:
+        if n <= 1:
+            continue
+        out, t_n = _timed(f"ingestão {market} ({n} processos)", lambda: load_normalized_results(market, use_cache=False, workers=n), repeat)
+        same = _frames_equal(base, out)
+        ok &= same
+        logger.info("Speedup ingestão {} com {} processos: {:.2f}x (eficiência {:.0%}); idêntico: {}", market, n, t_base / t_n, t_base / t_n / n, same)
+    return ok
+
+
+def _traced(label: str, fn: Callable[[], object]) -> object:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.info("{}: {:.3f}s, pico {:.1f} MB", label, elapsed, peak / 1024 / 1024)
+    return out
+
+
+def bench_chunked(market: str, chunk_rows: int) -> bool:
+    """Compara a leitura inteira x em blocos do maior CSV do mercado e a RunnerTable do
+    histórico montada de uma vez x em blocos (mesma saída, menos pico)."""
+    paths = sorted((settings.DATA_DIR / "Result").glob(f"{RESULT_FILE_PREFIX[market]}*.csv"), key=lambda p: p.stat().st_size)
+    if not paths:
+        logger.warning("Sem arquivos {} para medir", market)
+        return True
+    path = paths[-1]
+    whole = _traced(f"{path.name} inteiro", lambda: _read_result_csv(path, chunk_rows=None, memory_mb=1 << 20))
+    chunked = _traced(f"{path.name} em blocos de {chunk_rows}", lambda: _read_result_csv(path, chunk_rows=chunk_rows))
+    if whole is None or chunked is None:
+        return False
+    ok = _frames_equal(whole, chunked) and _tables_equal(RunnerTable.from_frame(whole), RunnerTable.from_frame(chunked))
+    logger.info("Equivalência leitura em blocos {}: {}", market, "OK" if ok else "FALHOU")
+    # Histórico inteiro: DataFrame normalizado + from_frame x RunnerTableBuilder bloco a bloco
+    full = _traced(f"{market} histórico (DataFrame + from_frame)", lambda: RunnerTable.from_frame(load_normalized_results(market, use_cache=False)))
+    streamed = _traced(f"{market} histórico em blocos de {chunk_rows}", lambda: stream_betfair_results(market, chunk_rows=chunk_rows))
+    ok_stream = _tables_equal(full, streamed)
+    logger.info("Equivalência RunnerTable em blocos {}: {}", market, "OK" if ok_stream else "FALHOU")
+    return ok and ok_stream
+
+
+@dataclass
+class _LegacyRunnerBF:
+    # RunnerBF original (dataclass sem __slots__), só para medir o índice antigo
+    selection_name_raw: str
+    selection_name_clean: str
+    pptradedvol: float
+    bsp: float
+    win_lose: int
+
+
+def _retained_mb(fn: Callable[[], object]) -> Tuple[object, float]:
+    tracemalloc.start()
+    out = fn()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, current / 1024 / 1024
+
+
+def bench_memory(market: str) -> bool:
+    """Memória retida: dict-de-dicts com um dataclass por corredor x RunnerTable compacta."""
+    frame = load_normalized_results(market, use_cache=False)
+    table, mb_table = _retained_mb(lambda: RunnerTable.from_frame(frame))
+
+    def _legacy() -> Dict[Tuple[str, str], Dict[str, _LegacyRunnerBF]]:
+        index: Dict[Tuple[str, str], Dict[str, _LegacyRunnerBF]] = {}
+        for (track, iso), runners in table.items():
+            index[(str(track), str(iso))] = {
+                name: _LegacyRunnerBF(r.selection_name_raw, r.selection_name_clean, r.pptradedvol, r.bsp, r.win_lose)
+                for name, r in runners.items()
+            }
+        return index
+
+    legacy, mb_legacy = _retained_mb(_legacy)
+    n_runners = sum(len(v) for v in legacy.values())
+    logger.info(
+        "Memória {} ({} corridas, {} corredores): dict-de-dicts {:.1f} MB x RunnerTable {:.1f} MB (nbytes {:.1f} MB) -> {:.1f}x menor",
+        market, len(table), n_runners, mb_legacy, mb_table, table.nbytes() / 1024 / 1024, mb_legacy / max(mb_table, 1e-9),
+    )
+    return len(legacy) == len(table)
+
+
+def bench_engine(repeat: int, leader_share_min: float) -> bool:
+    """Motor por corrida (_calc_signals_for_race) x compute_signals_frame, em todas as combinações."""
+    bf_win = load_betfair_win()
+    bf_place = load_betfair_place()
+    ok = True
+    t_loop_total = t_vec_total = 0.0
+    for source in ["top3", "forecast"]:
+        tf_rows = load_timeform_forecast_top3() if source == "forecast" else load_timeform_top3()
+        tf = load_timeform_forecast_frame() if source == "forecast" else load_timeform_top3_frame()
+        for market in ["win", "place"]:
+            place = bf_place if market == "place" else None
+            for rule in ["terceiro_queda50", "lider_volume_total"]:
+                label = f"{source}/{market}/{rule}"
+
+                def _loop() -> pd.DataFrame:
+                    rows = []
+                    for row in tf_rows:
+                        rows.extend(_calc_signals_for_race(row, bf_win, place, market=market, rule=rule, leader_share_min=leader_share_min))
+                    return pd.DataFrame(rows)
+
+                loop_df, t_loop = _timed(f"{label} por corrida", _loop, repeat)
+                vec_df, t_vec = _timed(
+                    f"{label} vetorizado",
+                    lambda: compute_signals_frame(tf, bf_win, place, market=market, rule=rule, leader_share_min=leader_share_min),
+                    repeat,
+                )
+                t_loop_total += t_loop
+                t_vec_total += t_vec
+                same = _frames_equal(loop_df, vec_df)
+                for entry in ["back", "lay"]:
+                    sub = loop_df[loop_df["entry_type"] == entry].reset_index(drop=True) if not loop_df.empty else loop_df
+                    one = compute_signals_frame(tf, bf_win, place, market=market, rule=rule, leader_share_min=leader_share_min, entry_type=entry)
+                    same &= _frames_equal(sub, one)
+                ok &= same
+                logger.info("{}: {} sinais, speedup {:.1f}x, idêntico: {}", label, len(loop_df), t_loop / max(t_vec, 1e-9), same)
+    logger.info("Motor de sinais (8 combinações): por corrida {:.3f}s x vetorizado {:.3f}s -> {:.1f}x", t_loop_total, t_vec_total, t_loop_total / max(t_vec_total, 1e-9))
+    logger.info("Equivalência motor: {}", "OK" if ok else "FALHOU")
+    return ok
+
+
+def bench_batch(repeat: int, leader_share_min: float, engine: str) -> bool:
+    """8 combinações recarregando as entradas a cada chamada x modo batch (SignalContext único)."""
+    combos = [(s, m, r) for s in ["top3", "forecast"] for m in ["win", "place"] for r in ["lider_volume_total", "terceiro_queda50"]]
+    # Aquece o cache Parquet para que as duas medições partam do mesmo estado
+    load_betfair_win()
+    load_betfair_place()
+
+    def _reload() -> Dict[Tuple[str, str, str], pd.DataFrame]:
+        return {
+            (s, m, r): generate_signals(source=s, market=m, rule=r, leader_share_min=leader_share_min, engine=engine)
+            for s, m, r in combos
+        }
+
+    reloaded, t_reload = _timed(f"8 combinações recarregando ({engine})", _reload, repeat)
+    batched, t_batch = _timed(f"8 combinações em batch ({engine})", lambda: generate_signals_batch(combos, leader_share_min=leader_share_min, engine=engine), repeat)
+    ok = list(reloaded) == list(batched) and all(_frames_equal(reloaded[k], batched[k]) for k in combos)
+    logger.info("Batch: {:.3f}s x {:.3f}s recarregando -> {:.1f}x; idêntico: {}", t_batch, t_reload, t_reload / max(t_batch, 1e-9), ok)
+    return ok
+
+
+def _aggregate_signals(df: pd.DataFrame, entry: str, low: float, high: float) -> Tuple[int, int, float]:
+    if df.empty:
+        return 0, 0, 0.0
+    bsp_col = f"{entry}_target_bsp"
+    sub = df[(df["entry_type"] == entry) & df[bsp_col].between(low, high)]
+    return len(sub), int((sub["is_green"] == True).sum()), float(sub["pnl_stake_fixed_10"].sum())
+
+
+def bench_sweep(grid_text: str, source: str, market: str) -> bool:
+    """Varredura vetorizada x uma chamada de compute_signals_frame por ponto (limiar do líder)."""
+    grid = parse_grid(grid_text)
+    bands = [(1.01, 3.0), (3.0, 6.0), (6.0, 1000.0)]
+    bf_win = load_betfair_win()
+    bf_place = load_betfair_place() if market == "place" else None
+    tf = load_timeform_forecast_frame() if source == "forecast" else load_timeform_top3_frame()
+
+    def _per_point() -> Dict[Tuple[float, float, float, str], Tuple[int, int, float]]:
+        out = {}
+        for t in grid:
+            df = compute_signals_frame(tf, bf_win, bf_place, market=market, rule="lider_volume_total", leader_share_min=t)
+            for low, high in bands:
+                for entry in ["back", "lay"]:
+                    out[(t, low, high, entry)] = _aggregate_signals(df, entry, low, high)
+        return out
+
+    def _swept() -> pd.DataFrame:
+        features = race_features(tf, bf_win, bf_place, market=market)
+        return sweep_rule(features, "lider_volume_total", grid, bands)
+
+    expected, t_points = _timed(f"{len(grid) * len(bands)} pontos, um cálculo por limiar", _per_point, 1)
+    table, t_sweep = _timed(f"{len(grid) * len(bands)} pontos, varredura única", _swept, 1)
+    ok = len(table) == len(expected)
+    for row in table.itertuples(index=False):
+        count, greens, pnl = expected[(row.threshold, row.bsp_min, row.bsp_max, row.entry_type)]
+        if row.count != count or row.greens != greens or not math.isclose(row.pnl_stake_fixed_10, pnl, abs_tol=1e-6):
+            logger.error("Divergência em {}: {} x {}", row, (count, greens, pnl), (row.count, row.greens, row.pnl_stake_fixed_10))
+            ok = False
+    terceiro = sweep_rule(race_features(tf, bf_win, bf_place, market=market), "terceiro_queda50", [0.5])
+    reference = compute_signals_frame(tf, bf_win, bf_place, market=market, rule="terceiro_queda50")
+    for row in terceiro.itertuples(index=False):
+        ok &= row.count == _aggregate_signals(reference, row.entry_type, 0.0, float("inf"))[0]
+    logger.info("Varredura: {:.3f}s x {:.3f}s por ponto -> {:.1f}x; equivalência {}", t_sweep, t_points, t_points / max(t_sweep, 1e-9), "OK" if ok else "FALHOU")
+    return ok
+
+
+def bench_incremental(engine: str) -> bool:
+    """Geração completa x incremental após simular entradas alteradas/novas (em diretórios temporários).
+
+    Parte de uma geração completa, marca no manifesto o último arquivo de cada pasta como
+    alterado (ou inexistente) e remove dos CSVs as linhas dos dias desses arquivos; a
+    geração incremental precisa reconstruir exatamente os mesmos bytes.
+    """
+    combos = [(s, m, r) for s in ["top3", "forecast"] for m in ["win", "place"] for r in ["lider_volume_total", "terceiro_queda50"]]
+    with tempfile.TemporaryDirectory() as tmp:
+        full_dir, inc_dir = Path(tmp) / "full", Path(tmp) / "inc"
+        _, t_full = _timed("geração completa", lambda: generate_signals_incremental(combos, engine=engine, full_rebuild=True, out_dir=full_dir), 1)
+        shutil.copytree(full_dir, inc_dir)
+
+        manifest_path = inc_dir / "manifest.json"
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        for name, entry in manifest["outputs"].items():
+            inputs = entry["inputs"]
+            stale: set = set()
+            for folder in ["Result/dwbfgreyhoundwin", "Result/dwbfgreyhoundplace", "timeform_top3/", "TimeformForecast/"]:
+                rels = sorted(rel for rel in inputs if rel.startswith(folder))
+                if not rels:
+                    continue
+                stale.update(inputs[rels[-1]]["dates"])
+                if folder.startswith("timeform"):
+                    del inputs[rels[-1]]  # arquivo "novo"
+                else:
+                    inputs[rels[-1]].update(mtime_ns=0, sha1="alterado")
+            out_path = inc_dir / name
+            df = pd.read_csv(out_path, dtype=str, keep_default_na=False, encoding=settings.CSV_ENCODING)
+            if "date" in df.columns:
+                df[~df["date"].isin(stale)].to_csv(out_path, index=False, encoding=settings.CSV_ENCODING)
+            entry["output"] = _fingerprint(out_path)
+        manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+        _, t_inc = _timed("geração incremental", lambda: generate_signals_incremental(combos, engine=engine, out_dir=inc_dir), 1)
+        ok = True
+        for path in sorted(full_dir.glob("signals_*.csv")):
+            same = path.read_bytes() == (inc_dir / path.name).read_bytes()
+            ok &= same
+            if not same:
+                logger.error("Incremental diverge da geração completa: {}", path.name)
+        _, t_noop = _timed("geração incremental sem mudanças", lambda: generate_signals_incremental(combos, engine=engine, out_dir=inc_dir), 1)
+        ok &= all(path.read_bytes() == (inc_dir / path.name).read_bytes() for path in full_dir.glob("signals_*.csv"))
+    logger.info("Incremental: {:.3f}s (sem mudanças {:.3f}s) x completa {:.3f}s; idêntico: {}", t_inc, t_noop, t_full, ok)
+    return ok
+
+
+def bench_join(source: str, tolerance: int, repeat: int) -> bool:
+    """Chave exata x junção com tolerância de horário; desloca 1 de cada 10 corridas casadas e confere a recuperação."""
+    bf_win = load_betfair_win()
+    tf = load_timeform_forecast_frame() if source == "forecast" else load_timeform_top3_frame()
+    tracks = tf["track_key"].to_numpy(dtype=object)
+    isos = tf["race_iso"].to_numpy(dtype=object)
+
+    exact, t_exact = _timed(f"chave exata ({len(tf)} linhas)", lambda: bf_win.positions(tracks, isos), repeat)
+    (positions, recovered), t_asof = _timed(f"tolerância de {tolerance} min", lambda: bf_win.positions_within(tracks, isos, tolerance), repeat)
+    logger.info("Histórico completo: {} casadas pela chave exata, {} recuperadas com tolerância", int((exact >= 0).sum()), recovered)
+    ok = bool((positions[exact >= 0] == exact[exact >= 0]).all())
+
+    # Desloca o horário de parte das linhas casadas; a junção tolerante deve devolvê-las à corrida original
+    shifted = np.flatnonzero(exact >= 0)[::10]
+    moved = pd.to_datetime(pd.Series(isos[shifted]), format="%Y-%m-%dT%H:%M") + pd.Timedelta(minutes=tolerance)
+    isos_moved = isos.copy()
+    isos_moved[shifted] = moved.dt.strftime("%Y-%m-%dT%H:%M").to_numpy(dtype=object)
+    lost = np.flatnonzero(bf_win.positions(tracks[shifted], isos_moved[shifted]) < 0)
+    positions_moved, _ = bf_win.positions_within(tracks, isos_moved, tolerance)
+    back = int((positions_moved[shifted[lost]] == exact[shifted[lost]]).sum())
+    ok &= back == len(lost)
+    logger.info(
+        "Junção: {:.3f}s x exata {:.3f}s; {} de {} linhas deslocadas em {} min voltaram à corrida original; {}",
+        t_asof, t_exact, back, len(lost), tolerance, "OK" if ok else "FALHOU",
+    )
+    return ok
+
+
+def bench_idjoin(source: str, repeat: int) -> bool:
+    """Junção de corredores por nome x por selection_id (tabela de identidade aprendida na hora)."""
+    bf_win = load_betfair_win()
+    tf = load_timeform_forecast_frame() if source == "forecast" else load_timeform_top3_frame()
+    identity = SelectionIdentity(path=Path(tempfile.gettempdir()) / "selection_ids_bench.parquet")
+    identity.learn(matched_pairs(tf, bf_win))
+    tracks = tf["track_key"].to_numpy(dtype=object)
+    races = bf_win.positions(tracks, tf["race_iso"].to_numpy(dtype=object))
+    names = [tf[f"name_{j}"].to_numpy(dtype=object) for j in range(1, 4)]
+    ids = [identity.lookup(tracks, n) for n in names]
+
+    by_name, t_name = _timed(f"por nome ({len(tf)} x 3)", lambda: [bf_win.runner_positions(races, n) for n in names], repeat)
+    bf_win.runner_positions_by_id(races[:1], ids[0][:1])  # monta o índice inteiro fora da medição
+    by_id, t_id = _timed(f"por selection_id ({len(tf)} x 3)", lambda: [bf_win.runner_positions_by_id(races, i) for i in ids], repeat)
+    ok = all(np.array_equal(a[i >= 0], b[i >= 0]) for a, b, i in zip(by_name, by_id, ids))
+    covered = sum(int((i >= 0).sum()) for i in ids) / max(1, 3 * len(tf))
+    logger.info("Junção por id: {:.3f}s x nome {:.3f}s; {:.1%} dos nomes com id; equivalência {}", t_id, t_name, covered, "OK" if ok else "FALHOU")
+    return ok
+
+
+def bench_raceid(source: str, repeat: int) -> bool:
+    """Junções por chave texto (pista, horário) x por id inteiro da corrida (RaceIndex).
+
+    Mede a junção Timeform -> PLACE do motor vetorizado e o enriquecimento do dashboard
+    (num_runners por corrida), conferindo que os dois caminhos dão o mesmo resultado.
+    """
+    races = RaceIndex()
+    bf_win = load_betfair_results("win", races=races)
+    bf_place = load_betfair_results("place", races=races)
+    tf = load_timeform_forecast_frame() if source == "forecast" else load_timeform_top3_frame()
+    tracks = tf["track_key"].to_numpy(dtype=object)
+    isos = tf["race_iso"].to_numpy(dtype=object)
+    race_id, t_resolve = _timed(f"resolução texto -> id ({len(tf)} linhas)", lambda: races.resolve(tracks, isos), repeat)
+
+    by_key, t_key = _timed("PLACE por (pista, horário)", lambda: bf_place.positions(tracks, isos), repeat)
+    by_id, t_id = _timed("PLACE por race_id", lambda: bf_place.positions_by_race_id(race_id), repeat)
+    ok = np.array_equal(by_key, by_id)
+
+    # Dashboard: dicionário de tuplas (formato anterior) x vetor indexado pelo id
+    counts = bf_win.num_runners
+    as_dict = {key: int(n) for key, n in zip(bf_win.keys(), counts.tolist())}
+    by_race = np.full(len(races), -1, dtype=np.int64)
+    by_race[bf_win.race_id] = counts
+    old, t_dict = _timed("num_runners via dict de tuplas", lambda: np.array([as_dict.get(k, -1) for k in zip(tracks.tolist(), isos.tolist())], dtype=np.int64), repeat)
+    new, t_vec = _timed("num_runners via race_id", lambda: np.where(race_id >= 0, by_race[np.maximum(race_id, 0)] if len(by_race) else -1, -1), repeat)
+    ok &= np.array_equal(old, new)
+    logger.info(
+        "{} corridas ({} event_id); PLACE {:.4f}s -> {:.4f}s (+{:.4f}s de resolução); num_runners {:.4f}s -> {:.4f}s; equivalência {}",
+        len(races), len(races.event_ids), t_key, t_id, t_resolve, t_dict, t_vec, "OK" if ok else "FALHOU",
+    )
+    return ok
+
+
+def bench_features(source: str, repeat: int) -> bool:
+    """Feature store x recálculo: tabela de corridas do dashboard e race_features do motor vetorizado.
+
+    O recálculo relê data/Result (cache Parquet) e monta a RunnerTable, como o dashboard fazia a
+    cada interação; a leitura do store só confere os fingerprints e lê o Parquet.
+    """
+    def _scan_races() -> pd.DataFrame:
+        results = load_normalized_results("win")
+        return race_table(results, RunnerTable.from_frame(results))
+
+    load_race_table(_scan_races)  # garante o store atualizado fora da medição
+    scanned, t_scan = _timed("corridas: relendo data/Result", _scan_races, repeat)
+    stored, t_store = _timed("corridas: feature store", load_race_table, repeat)
+    ok = _frames_equal(scanned, stored)
+
+    ctx = SignalContext(fuzzy_names=False, id_join=False)
+    tf = ctx.timeform(source, "vectorized")
+    computed, t_calc = _timed(f"race_features {source}: recálculo", lambda: race_features(tf, ctx.betfair("win"), ctx.betfair("place"), market="place"), repeat)
+    ctx.features(source, "place")
+    options = {"time_tolerance": ctx.time_tolerance, "tf_rows": len(tf), "code": code_digest(FEATURES_CODE)}
+    cached, t_read = _timed(f"race_features {source}: feature store", lambda: load_or_build(f"{source}_place", _input_paths(source, "place"), options, lambda: pd.DataFrame()), repeat)
+    ok &= _frames_equal(computed, cached)
+    logger.info(
+        "Feature store: corridas {:.3f}s -> {:.3f}s; race_features {:.3f}s -> {:.3f}s; equivalência {}",
+        t_scan, t_store, t_calc, t_read, "OK" if ok else "FALHOU",
+    )
+    return ok
+
+
+def bench_pushdown(engine: str, leader_share_min: float) -> bool:
+    """Carga Betfair inteira x semi-junção com o Timeform (tempo, pico de memória, corredores) e sinais iguais.
+
+    Na semi-junção a medição inclui os atributos WIN usados para escolher as corridas do PLACE.
+    """
+    combos = [(s, m, r) for s in ["top3", "forecast"] for m in ["win", "place"] for r in ["lider_volume_total", "terceiro_queda50"]]
+    load_normalized_results("win")
+    load_normalized_results("place")  # aquece o cache Parquet fora da medição
+
+    def _load(ctx: SignalContext) -> Dict[str, RunnerTable]:
+        tables = {"win": ctx.betfair("win")}
+        for source in ("top3", "forecast"):
+            tables[f"place:{source}"] = ctx.betfair("place", source)
+        return tables
+
+    contexts = {}
+    for pushdown in (False, True):
+        label = "semi-junção" if pushdown else "inteiro"
+        ctx = SignalContext(pushdown=pushdown, fuzzy_names=False, id_join=False)
+        for source in ("top3", "forecast"):
+            ctx._timeform_frame(source)  # CSVs Timeform lidos fora da medição
+        tables, elapsed = _timed(f"Betfair {label}", lambda: _load(ctx), 1)
+        # Memória pelos próprios objetos (buffers Arrow lidos do Parquet não aparecem no tracemalloc)
+        frame_mb = sum(f.memory_usage(deep=True).sum() for f in ctx._results.values()) / 1024 / 1024
+        table_mb = sum(t.nbytes() for t in {id(t): t for t in tables.values()}.values()) / 1024 / 1024
+        runners = {k: int(t.offsets[-1]) if len(t) else 0 for k, t in tables.items()}
+        logger.info(
+            "Betfair {}: {:.3f}s; linhas normalizadas {:.1f} MB, RunnerTables {:.1f} MB; corridas WIN {}, corredores {}",
+            label, elapsed, frame_mb, table_mb, len(tables["win"]), runners,
+        )
+        contexts[pushdown] = ctx
+
+    ok = True
+    for source, market, rule in combos:
+        a = generate_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, engine=engine, context=contexts[False])
+        b = generate_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, engine=engine, context=contexts[True])
+        ok &= _frames_equal(a, b)
+    logger.info("Semi-junção ({}): sinais das 8 combinações {}", engine, "idênticos" if ok else "DIFERENTES")
+    return ok
+
+
+def bench_stream(engine: str, leader_share_min: float, batch_rows: int) -> bool:
+    """Gravação completa (DataFrame inteiro) x streaming por dia: pico de memória dos sinais e bytes iguais.
+
+    As entradas são carregadas antes das medições; o pico reflete só cálculo + gravação.
+    """
+    combos = [(s, m, r) for s in ["top3", "forecast"] for m in ["win", "place"] for r in ["lider_volume_total", "terceiro_queda50"]]
+    ctx = SignalContext(fuzzy_names=False, id_join=False)
+    for source, market, rule in combos:  # entradas e atributos lidos fora da medição
+        ctx.betfair(market, source)
+        ctx.timeform(source, engine)
+        if engine == "vectorized":
+            ctx.features(source, market)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        full_dir, stream_dir = Path(tmp) / "full", Path(tmp) / "stream"
+
+        def _full() -> None:
+            for source, market, rule in combos:
+                df = generate_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, engine=engine, context=ctx)
+                write_signals_csv(df, source, market, rule, out_dir=full_dir)
+
+        def _stream() -> None:
+            for source, market, rule in combos:
+                parts = iter_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, engine=engine, context=ctx)
+                write_signals_stream(parts, source, market, rule, out_dir=stream_dir, batch_rows=batch_rows)
+
+        _traced(f"8 combinações gravação completa ({engine})", _full)
+        _traced(f"8 combinações streaming, lotes de {batch_rows} ({engine})", _stream)
+        for path in sorted(full_dir.glob("signals_*.csv")):
+            same = path.read_bytes() == (stream_dir / path.name).read_bytes()
+            ok &= same
+            if not same:
+                logger.error("Streaming diverge da gravação completa: {}", path.name)
+    logger.info("Streaming ({}): CSVs {}", engine, "idênticos" if ok else "DIFERENTES")
+    return ok
+
+
+def bench_normalized(repeat: int) -> bool:
+    """CSV largo x tabelas normalizadas (corridas + entradas): tamanho em disco e carga do dashboard.
+
+    Converte cópias dos CSVs de data/signals e confere que a visão larga é igual ao pd.read_csv.
+    Informa também o saldo em disco de manter as tabelas junto do CSV.
+    """
+    paths = sorted((settings.DATA_DIR / "signals").glob("signals_*.csv"))
+    if not paths:
+        logger.warning("Sem CSVs de sinais em {}", settings.DATA_DIR / "signals")
+        return True
+    ok = True
+    csv_bytes = norm_bytes = 0
+    t_csv = t_norm = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        for src in paths:
+            path = Path(tmp) / src.name
+            shutil.copyfile(src, path)
+            write_normalized_signals(path)
+            csv_bytes += path.stat().st_size
+            norm_bytes += sum(p.stat().st_size for p in normalized_paths(path))
+            wide, t_a = _timed(f"{path.name} CSV", lambda: pd.read_csv(path, encoding=settings.CSV_ENCODING), repeat)
+            joined, t_b = _timed(f"{path.name} normalizado", lambda: load_normalized_signals(path), repeat)
+            t_csv += t_a
+            t_norm += t_b
+            same = joined is not None and list(joined.columns) == list(wide.columns) and joined.equals(wide)
+            ok &= same
+            if not same:
+                logger.error("Visão larga diverge do CSV: {}", path.name)
+    # As tabelas são gravadas ao lado do CSV (que continua sendo o formato armazenado): o saldo
+    # real em disco é o acréscimo das tabelas, não a razão entre os dois formatos
+    logger.info(
+        "Sinais ({} arquivos): disco {:.1f} KB CSV x {:.1f} KB normalizado ({:.0%} do CSV); "
+        "CSV + tabelas {:.1f} KB (saldo {:+.1f} KB, {:+.0%}); carga {:.3f}s x {:.3f}s; idêntico: {}",
+        len(paths), csv_bytes / 1024, norm_bytes / 1024, norm_bytes / max(csv_bytes, 1),
+        (csv_bytes + norm_bytes) / 1024, norm_bytes / 1024, norm_bytes / max(csv_bytes, 1), t_csv, t_norm, ok,
+    )
+    return ok
+
+
+def _synthetic_history(src: Path, days: int) -> pd.DataFrame:
+    """Sinais de ``src`` repetidos com as datas deslocadas até cobrir ``days`` dias (ordem do CSV)."""
+    base = pd.read_csv(src, dtype=str, keep_default_na=False, encoding=settings.CSV_ENCODING)
+    base_dates = pd.to_datetime(base["date"])
+    span = int((base_dates.max() - base_dates.min()).days) + 1
+    parts = []
+    for k in range(max(1, math.ceil(days / span))):
+        part = base.copy()
+        shifted = base_dates + pd.Timedelta(days=k * span)
+        part["date"] = shifted.dt.strftime("%Y-%m-%d")
+        part["race_time_iso"] = part["date"] + part["race_time_iso"].str[10:]
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def bench_dataset(days: int, repeat: int) -> bool:
+    """Primeira tela do dashboard: CSV inteiro + filtro x dataset por data (dias e colunas na leitura).
+
+    Usa o maior CSV de data/signals replicado até ``days`` dias de histórico; a primeira tela
+    mostra os últimos settings.DASHBOARD_DEFAULT_DAYS dias.
+    """
+    paths = sorted((settings.DATA_DIR / "signals").glob("signals_*.csv"), key=lambda p: p.stat().st_size)
+    if not paths:
+        logger.warning("Sem CSVs de sinais em {}", settings.DATA_DIR / "signals")
+        return True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / paths[-1].name
+        _synthetic_history(paths[-1], days).to_csv(path, index=False, encoding=settings.CSV_ENCODING)
+        _, t_write = _timed("gravação do dataset", lambda: write_signals_dataset(path), 1)
+        all_dates = signals_dataset_dates(path) or []
+        window = all_dates[-settings.DASHBOARD_DEFAULT_DAYS:]
+
+        def _before() -> pd.DataFrame:
+            df = pd.read_csv(path, encoding=settings.CSV_ENCODING)
+            return df[df["date"].isin(window)].reset_index(drop=True)
+
+        def _after() -> pd.DataFrame:
+            return load_signals_dataset(path, dates=signals_dataset_dates(path)[-settings.DASHBOARD_DEFAULT_DAYS:], columns=DASHBOARD_SIGNAL_COLUMNS)
+
+        before, t_before = _timed(f"CSV inteiro ({len(all_dates)} dias) + filtro", _before, repeat)
+        after, t_after = _timed(f"dataset, {len(window)} dias e {len(DASHBOARD_SIGNAL_COLUMNS)} colunas", _after, repeat)
+        cols = [c for c in before.columns if c in DASHBOARD_SIGNAL_COLUMNS]
+        ok = after is not None and after.equals(before[cols])
+        logger.info(
+            "Primeira tela ({} linhas no histórico, {} exibidas): {:.3f}s CSV x {:.3f}s dataset -> {:.1f}x; gravação {:.3f}s; idêntico: {}",
+            sum(1 for _ in open(path, encoding=settings.CSV_ENCODING)) - 1, len(before), t_before, t_after, t_before / max(t_after, 1e-9), t_write, ok,
+        )
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Benchmarks (e checagens de equivalência) do pipeline de sinais")
+    parser.add_argument("target", choices=["loader", "names", "ingest", "chunked", "memory", "engine", "batch", "sweep", "incremental", "join", "idjoin", "raceid", "features", "pushdown", "stream", "normalized", "dataset", "sqlite"], help="Etapa a medir")
+    parser.add_argument("--market", choices=["win", "place", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições (reporta o melhor tempo)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8], help="Quantidades de processos a medir (ingest); a primeira é usada no sqlite")
+    parser.add_argument("--chunk_rows", type=int, default=5000, help="Linhas por bloco (chunked) / por lote gravado (stream)")
+    parser.add_argument("--leader_share_min", type=float, default=0.5, help="Limite da regra lider_volume_total (engine/batch)")
+    parser.add_argument("--engine", choices=["loop", "vectorized"], default="vectorized", help="Motor de sinais usado no batch/pushdown/stream")
+    parser.add_argument("--grid", default="0.05:0.95:0.025", help="Grade de limiares do líder (sweep)")
+    parser.add_argument("--source", choices=["top3", "forecast"], default="top3", help="Fonte Timeform (sweep/join/idjoin/raceid/features)")
+    parser.add_argument("--time_tolerance", type=int, default=2, help="Tolerância em minutos (join)")
+    parser.add_argument("--days", type=int, default=730, help="Dias de histórico sintético (dataset)")
+    args = parser.parse_args(argv)
+
+    markets = [args.market] if args.market != "both" else ["win", "place"]
+    ok = True
+    if args.target == "loader":
+        for m in markets:
+            ok &= bench_loader(m, args.repeat)
+    elif args.target == "names":
+        for m in markets:
+            ok &= bench_names(m, args.repeat)
+    elif args.target == "ingest":
+        for m in markets:
+            ok &= bench_ingest(m, args.repeat, args.workers)
+    elif args.target == "chunked":
+        for m in markets:
+            ok &= bench_chunked(m, args.chunk_rows)
+    elif args.target == "memory":
+        for m in markets:
+            ok &= bench_memory(m)
+    elif args.target == "engine":
+        ok &= bench_engine(args.repeat, float(args.leader_share_min))
+    elif args.target == "batch":
+        ok &= bench_batch(args.repeat, float(args.leader_share_min), args.engine)
+    elif args.target == "incremental":
+        ok &= bench_incremental(args.engine)
+    elif args.target == "pushdown":
+        ok &= bench_pushdown(args.engine, float(args.leader_share_min))
+    elif args.target == "dataset":
+        ok &= bench_dataset(max(1, int(args.days)), args.repeat)
+    elif args.target == "sqlite":
+        ok &= bench_sqlite(args.repeat, max(1, int(args.workers[0])))
+    elif args.target == "normalized":
+        ok &= bench_normalized(args.repeat)
+    elif args.target == "stream":
+        ok &= bench_stream(args.engine, float(args.leader_share_min), max(1, int(args.chunk_rows)))
+    elif args.target == "features":
+        ok &= bench_features(args.source, args.repeat)
+    elif args.target == "raceid":
+        ok &= bench_raceid(args.source, args.repeat)
+    elif args.target == "idjoin":
+        ok &= bench_idjoin(args.source, args.repeat)
+    elif args.target == "join":
+        ok &= bench_join(args.source, max(1, int(args.time_tolerance)), args.repeat)
+    elif args.target == "sweep":
+        for m in markets:
+            ok &= bench_sweep(args.grid, args.source, m)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,49 @@
+import sys
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.analysis.feature_store import feature_store_dir
+from src.analysis.signals import _new_context
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Atualiza o feature store por corrida (data/cache/features) lido pelos sinais e pelo dashboard")
+    parser.add_argument("--source", choices=["top3", "forecast", "both"], default="both")
+    parser.add_argument("--market", choices=["win", "place", "both"], default="both")
+    parser.add_argument("--time_tolerance", type=int, default=None, help="Tolerância (min) ao casar horário Timeform x Betfair; padrão settings.RACE_TIME_TOLERANCE_MIN")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para ler/normalizar os CSVs de data/Result (1 = sequencial)")
+    parser.add_argument("--rebuild", action="store_true", help="Descarta as tabelas gravadas e recalcula tudo")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    store = feature_store_dir()
+    if args.rebuild and store.exists():
+        shutil.rmtree(store)
+    # Aliases e identidade aprendidos não entram no feature store (ver SignalContext.features)
+    ctx = _new_context(max(1, int(args.workers)), time_tolerance=args.time_tolerance, fuzzy_names=False, id_join=False)
+    races = ctx.race_table()
+    logger.info("Corridas: {}", len(races))
+    sources = [args.source] if args.source != "both" else ["top3", "forecast"]
+    markets = [args.market] if args.market != "both" else ["win", "place"]
+    for source in sources:
+        for market in markets:
+            logger.info("Atributos {} {}: {} corridas", source, market, len(ctx.features(source, market)))
+    logger.info("Feature store atualizado em {:.2f}s", time.perf_counter() - t0)
+    print(str(store))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 import pandas as pd
 from loguru import logger
@@ -31,9 +35,15 @@ TARGET_COLUMNS = [
 ]
 
 
+# Colunas de texto onde aparecem os marcadores (AUS)/(NZL) de pista/corredor
+BANNED_COLUMNS = ["menu_hint", "event_name", "selection_name"]
+
 _BSP_TWO_DEC_REGEX = re.compile(r"^\d+\.\d{2}$")
 _BANNED_REGEX = re.compile(r"\((?:AUS|NZL)\)")
 
+# Manifesto dos arquivos já limpos (tamanho/mtime após a limpeza); mudar a versão quando as regras mudarem
+_MANIFEST_VERSION = 1
+
 
 def is_already_clean(df: pd.DataFrame) -> bool:
 	"""Verifica se o DataFrame já está no formato desejado."""
@@ -41,9 +51,8 @@ def is_already_clean(df: pd.DataFrame) -> bool:
 		return False
 	if "bsp" not in df.columns:
 		return False
-	# Verifica se há linhas contendo (AUS) ou (NZL) em qualquer coluna
-	df_as_str = df.astype(str, copy=False)
-	if df_as_str.apply(lambda col: col.str.contains(_BANNED_REGEX, na=False)).any(axis=1).any():
+	# Verifica se há linhas contendo (AUS) ou (NZL) nas colunas de texto
+	if banned_rows_mask(df).any():
 		return False
 	series = df["bsp"]
 	if len(series) == 0:
@@ -56,6 +65,15 @@ def is_already_clean(df: pd.DataFrame) -> bool:
 	return _BSP_TWO_DEC_REGEX.fullmatch("0.00") is not None and bsp_as_str[mask_notna].map(lambda s: bool(_BSP_TWO_DEC_REGEX.fullmatch(s))).all()
 
 
+def banned_rows_mask(df: pd.DataFrame) -> pd.Series:
+	"""Linhas com (AUS)/(NZL) em alguma das BANNED_COLUMNS presentes no DataFrame."""
+	mask = pd.Series(False, index=df.index)
+	for col in BANNED_COLUMNS:
+		if col in df.columns:
+			mask |= df[col].astype(str).str.contains(_BANNED_REGEX, na=False)
+	return mask
+
+
 def format_bsp_to_two_decimals(value) -> str:
 	"""Formata o BSP como string com duas casas decimais; vazio se inválido."""
 	if pd.isna(value):
@@ -77,8 +95,8 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
 			out[col] = ""
 	# Mantém apenas as colunas desejadas e na ordem correta
 	out = out[TARGET_COLUMNS]
-	# Remove linhas contendo (AUS) ou (NZL) em qualquer coluna
-	mask_banned = out.astype(str).apply(lambda col: col.str.contains(_BANNED_REGEX, na=False)).any(axis=1)
+	# Remove linhas contendo (AUS) ou (NZL) nas colunas de texto
+	mask_banned = banned_rows_mask(out)
 	if mask_banned.any():
 		out = out.loc[~mask_banned].reset_index(drop=True)
 	# Formata bsp
@@ -86,28 +104,94 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
 	return out
 
 
-def clean_results_dir(result_dir: Path, force: bool = False) -> int:
-	"""Limpa todos os CSVs em result_dir. Retorna quantidade de arquivos alterados."""
-	changed = 0
-	for csv_path in sorted(result_dir.glob("*.csv")):
-		try:
-			df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
-		except Exception as e:
-			logger.error("Falha ao ler {}: {}", csv_path.name, e)
-			continue
+def manifest_path() -> Path:
+	return settings.DATA_DIR / "cache" / "clean_results.json"
 
-		if not force and is_already_clean(df):
-			logger.debug("Pulado (já limpo): {}", csv_path.name)
+
+def _file_stamp(csv_path: Path) -> Dict[str, int]:
+	st = csv_path.stat()
+	return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _load_manifest(path: Path, result_dir: Path) -> Dict[str, Dict[str, int]]:
+	"""Arquivos já limpos {nome: {size, mtime_ns}}; vazio se o manifesto não existe ou é de outra versão/pasta."""
+	try:
+		with open(path, "r", encoding="utf-8") as fh:
+			data = json.load(fh)
+	except (OSError, ValueError):
+		return {}
+	if data.get("version") != _MANIFEST_VERSION or data.get("result_dir") != str(result_dir.resolve()):
+		return {}
+	return data.get("files", {})
+
+
+def _save_manifest(path: Path, result_dir: Path, files: Dict[str, Dict[str, int]]) -> None:
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_suffix(path.suffix + ".tmp")
+	with open(tmp, "w", encoding="utf-8") as fh:
+		json.dump({"version": _MANIFEST_VERSION, "result_dir": str(result_dir.resolve()), "files": files}, fh, indent=1, sort_keys=True)
+	os.replace(tmp, path)
+
+
+def clean_file(csv_path: Path, force: bool = False) -> Tuple[str, Optional[int], Optional[str]]:
+	"""Lê, verifica e (se preciso) limpa um CSV; retorna (status, linhas gravadas, erro).
+
+	status: "clean" (já estava limpo), "changed" (regravado) ou "error". Roda nos processos
+	do pool de clean_results_dir, por isso não registra log.
+	"""
+	try:
+		df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+	except Exception as e:
+		return "error", None, f"Falha ao ler {csv_path.name}: {e}"
+	if not force and is_already_clean(df):
+		return "clean", None, None
+	clean_df = clean_dataframe(df)
+	try:
+		clean_df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+	except Exception as e:
+		return "error", None, f"Falha ao escrever {csv_path.name}: {e}"
+	return "changed", len(clean_df), None
+
+
+def clean_results_dir(result_dir: Path, force: bool = False, workers: int = 1, manifest: Optional[Path] = None) -> int:
+	"""Limpa todos os CSVs em result_dir. Retorna quantidade de arquivos alterados.
+
+	Arquivos com o mesmo tamanho/mtime registrados no manifesto (data/cache/clean_results.json)
+	são pulados sem serem lidos; os demais são verificados/limpos em um pool de ``workers``
+	processos. ``force`` ignora o manifesto e reformata todos.
+	"""
+	manifest = manifest or manifest_path()
+	known = {} if force else _load_manifest(manifest, result_dir)
+	paths = sorted(result_dir.glob("*.csv"))
+	files: Dict[str, Dict[str, int]] = {}
+	pending = []
+	for csv_path in paths:
+		stamp = _file_stamp(csv_path)
+		if known.get(csv_path.name) == stamp:
+			files[csv_path.name] = stamp
 			continue
+		pending.append(csv_path)
+	logger.debug("Pulados pelo manifesto (já limpos): {}", len(paths) - len(pending))
 
-		clean_df = clean_dataframe(df)
-		try:
-			clean_df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-			changed += 1
-			logger.info("Arquivo limpo: {} ({} linhas)", csv_path.name, len(clean_df))
-		except Exception as e:
-			logger.error("Falha ao escrever {}: {}", csv_path.name, e)
+	if workers > 1 and len(pending) > 1:
+		n = min(workers, len(pending))
+		with ProcessPoolExecutor(max_workers=n) as pool:
+			results = list(pool.map(clean_file, pending, [force] * len(pending), chunksize=max(1, len(pending) // (n * 4))))
+	else:
+		results = [clean_file(p, force) for p in pending]
 
+	changed = 0
+	for csv_path, (status, rows, error) in zip(pending, results):
+		if status == "error":
+			logger.error(error)
+			continue
+		if status == "changed":
+			changed += 1
+			logger.info("Arquivo limpo: {} ({} linhas)", csv_path.name, rows)
+		else:
+			logger.debug("Pulado (já limpo): {}", csv_path.name)
+		files[csv_path.name] = _file_stamp(csv_path)
+	_save_manifest(manifest, result_dir, files)
 	return changed
 
 
@@ -116,6 +200,9 @@ def main(argv: list[str] | None = None) -> int:
 	force = False
 	if "--force" in argv:
 		force = True
+	workers = 1
+	if "--workers" in argv:
+		workers = max(1, int(argv[argv.index("--workers") + 1]))
 
 	logger.remove()
 	logger.add(sys.stderr, level=settings.LOG_LEVEL)
@@ -125,8 +212,8 @@ def main(argv: list[str] | None = None) -> int:
 		logger.error("Diretório não encontrado: {}", result_dir)
 		return 1
 
-	logger.info("Limpando CSVs em: {} (force={})", result_dir, force)
-	changed = clean_results_dir(result_dir, force=force)
+	logger.info("Limpando CSVs em: {} (force={}, workers={})", result_dir, force, workers)
+	changed = clean_results_dir(result_dir, force=force, workers=workers)
 	logger.info("Concluído. Arquivos alterados: {}", changed)
 	return 0
 
@@ -0,0 +1,41 @@
+import sys
+import argparse
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.utils.files import condense_day_folders
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Condensa os CSVs por corrida (data/AAAA-MM-DD/<pista>/*.csv) em uma linha cada")
+    parser.add_argument("dates", nargs="*", help="Dias AAAA-MM-DD (padrão: todas as pastas de dia em data/)")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para condensar os arquivos (1 = sequencial)")
+    args = parser.parse_args(argv)
+
+    if args.dates:
+        day_dirs = [settings.DATA_DIR / d for d in args.dates]
+        missing = [d for d in day_dirs if not d.is_dir()]
+        for d in missing:
+            logger.warning("Pasta de dia não encontrada: {}", d)
+        day_dirs = [d for d in day_dirs if d.is_dir()]
+    else:
+        day_dirs = sorted(p for p in settings.DATA_DIR.glob("????-??-??") if p.is_dir())
+
+    t0 = time.perf_counter()
+    n = condense_day_folders(day_dirs, workers=max(1, int(args.workers)))
+    logger.info("{} CSVs condensados em {} pastas de dia em {:.2f}s", n, len(day_dirs), time.perf_counter() - t0)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,6 @@
 import sys
 import argparse
+import time
 from pathlib import Path
 
 import pandas as pd
@@ -11,7 +12,9 @@ sys.path.append(str(PROJECT_ROOT))
 
 from src.config import settings
 from src.config import RULE_LABELS
-from src.analysis.signals import generate_signals, write_signals_csv
+from src.analysis.incremental import generate_signals_incremental
+from src.analysis.rules import rule_names
+from src.analysis.signals import generate_signals, generate_signals_batch, generate_signals_stream, write_signals_csv
 
 
 def main(argv: list[str] | None = None) -> int:
@@ -21,18 +24,29 @@ def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Gerar sinais por regra (com entradas back e lay)")
     parser.add_argument("--source", choices=["top3", "forecast", "both"], default="both")
     parser.add_argument("--market", choices=["win", "place", "both"], default="both")
-    parser.add_argument("--rule", choices=["lider_volume_total", "terceiro_queda50", "both"], default="both")
+    parser.add_argument("--rule", choices=[*rule_names(), "both", "all"], default="both", help="Regra do registro (src/analysis/rules.py); both/all = todas as registradas")
     parser.add_argument("--entry_type", choices=["back", "lay", "both"], default="both")
     parser.add_argument("--leader_share_min", type=float, default=0.5, help="Participação mínima do líder (0-1) para a regra líder_volume_total")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para ler/normalizar os CSVs de data/Result (1 = sequencial)")
+    parser.add_argument("--batch", action="store_true", help="Lê Betfair/Timeform uma única vez para todas as combinações e grava os CSVs ao final")
+    parser.add_argument("--stream", action="store_true", help="Como --batch, mas grava cada CSV dia a dia em lotes (memória dos sinais limitada a um dia; ver settings.SIGNALS_WRITE_BATCH_ROWS)")
+    parser.add_argument("--incremental", action="store_true", help="Recalcula só os dias afetados por arquivos novos/alterados (manifesto em data/signals/manifest.json)")
+    parser.add_argument("--full-rebuild", dest="full_rebuild", action="store_true", help="Com --incremental: refaz todos os CSVs do zero e regrava o manifesto")
+    parser.add_argument("--fuzzy_names", action=argparse.BooleanOptionalAction, default=None, help="Casa nomes Timeform sem par exato com o nome Betfair mais parecido da corrida; padrão settings.NAME_MATCH_ENABLED")
+    parser.add_argument("--id_join", action=argparse.BooleanOptionalAction, default=None, help="Junta corredores por selection_id aprendido (motor vetorizado); padrão settings.SELECTION_ID_JOIN")
+    parser.add_argument("--pushdown", action=argparse.BooleanOptionalAction, default=None, help="Carrega do Betfair só as corridas citadas pelo Timeform (PLACE: só as candidatas a sinal); padrão settings.BETFAIR_PUSHDOWN")
+    parser.add_argument("--time_tolerance", type=int, default=None, help="Tolerância (min) ao casar horário Timeform x Betfair; padrão settings.RACE_TIME_TOLERANCE_MIN (0 = exato)")
+    parser.add_argument("--engine", choices=["loop", "vectorized"], default="vectorized", help="Todas as corridas de uma vez, com os atributos do feature store (vectorized), ou cálculo por corrida (loop); mesma saída")
     args = parser.parse_args(argv)
     source = args.source
     market = args.market
     rule = args.rule
     entry_type = args.entry_type
     leader_share_min = float(args.leader_share_min)
+    workers = max(1, int(args.workers))
+    engine = args.engine
 
-    def _run_for(source_val: str, market_val: str, rule_val: str) -> None:
-        df = generate_signals(source=source_val, market=market_val, rule=rule_val, leader_share_min=leader_share_min, entry_type=entry_type)
+    def _report(source_val: str, market_val: str, rule_val: str, df: pd.DataFrame) -> None:
         path = write_signals_csv(df, source=source_val, market=market_val, rule=rule_val)
         rule_label = RULE_LABELS.get(rule_val, rule_val)
         logger.info("Concluído {} ({} - {} ). Sinais: {}", source_val, market_val, rule_label, len(df))
@@ -40,12 +54,29 @@ def main(argv: list[str] | None = None) -> int:
 
     sources = [source] if source != "both" else ["top3", "forecast"]
     markets = [market] if market != "both" else ["win", "place"]
-    rules = [rule] if rule != "both" else ["lider_volume_total", "terceiro_queda50"]
+    rules = [rule] if rule not in ("both", "all") else rule_names()
+    combos = [(s, m, r) for s in sources for m in markets for r in rules]
 
-    for s in sources:
-        for m in markets:
-            for r in rules:
-                _run_for(s, m, r)
+    incremental = args.incremental or args.full_rebuild
+    mode = "incremental" if incremental else "streaming" if args.stream else "batch" if args.batch else "recarregando por combinação"
+    t0 = time.perf_counter()
+    if incremental:
+        paths = generate_signals_incremental(combos, leader_share_min=leader_share_min, entry_type=entry_type, workers=workers, engine=engine, full_rebuild=args.full_rebuild, time_tolerance=args.time_tolerance, fuzzy_names=args.fuzzy_names, id_join=args.id_join, pushdown=args.pushdown)
+        for path in paths.values():
+            print(str(path))
+    elif args.stream:
+        paths = generate_signals_stream(combos, leader_share_min=leader_share_min, entry_type=entry_type, workers=workers, engine=engine, time_tolerance=args.time_tolerance, fuzzy_names=args.fuzzy_names, id_join=args.id_join, pushdown=args.pushdown)
+        for path in paths.values():
+            print(str(path))
+    elif args.batch:
+        results = generate_signals_batch(combos, leader_share_min=leader_share_min, entry_type=entry_type, workers=workers, engine=engine, time_tolerance=args.time_tolerance, fuzzy_names=args.fuzzy_names, id_join=args.id_join, pushdown=args.pushdown)
+        for (s, m, r), df in results.items():
+            _report(s, m, r, df)
+    else:
+        for s, m, r in combos:
+            df = generate_signals(source=s, market=m, rule=r, leader_share_min=leader_share_min, entry_type=entry_type, workers=workers, engine=engine, time_tolerance=args.time_tolerance, fuzzy_names=args.fuzzy_names, id_join=args.id_join, pushdown=args.pushdown)
+            _report(s, m, r, df)
+    logger.info("Tempo total ({} combinações, {}): {:.2f}s", len(combos), mode, time.perf_counter() - t0)
     return 0
 
 
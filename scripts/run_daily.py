@@ -20,6 +20,7 @@ def main() -> None:
 	steps = [
 		[sys.executable, "scripts/scrape_betfair_index.py"],
 		[sys.executable, "scripts/scrape_timeform_update.py"],
+		[sys.executable, "scripts/build_features.py"],
 	]
 
 	for step in steps:
@@ -11,6 +11,7 @@ from src.config import settings
 from src.utils.dates import ensure_day_folder
 from src.utils.files import sanitize_name, ensure_dir, write_links_csv
 from src.scrapers.betfair_index import scrape_betfair_index
+from src.analysis.sqlite_store import open_store, upsert_race_links
 
 
 def main() -> None:
@@ -32,6 +33,11 @@ def main() -> None:
 	csv_path = write_links_csv(day_dir, rows)
 	logger.info("race_links.csv salvo em: {}", csv_path)
 
+	if settings.SQLITE_STORE:
+		with open_store() as conn:
+			n = upsert_race_links(conn, day_dir.name, rows, csv_path)
+		logger.info("Banco SQLite: {} corridas em race_links ({})", n, day_dir.name)
+
 
 if __name__ == "__main__":
 	main()
@@ -10,6 +10,7 @@ sys.path.append(str(PROJECT_ROOT))
 from src.config import settings
 from src.utils.dates import ensure_day_folder
 from src.scrapers.timeform import scrape_timeform_for_races
+from src.analysis.sqlite_store import open_store, upsert_timeform_picks
 
 
 def _ensure_output_dir(name: str) -> Path:
@@ -62,9 +63,10 @@ def main() -> None:
 	forecast_dir = _ensure_output_dir("TimeformForecast")
 	forecast_path = forecast_dir / f"TimeformForecast_{date_str}.csv"
 	if forecast_rows:
-		pd.DataFrame(forecast_rows).to_csv(forecast_path, index=False, encoding=settings.CSV_ENCODING)
+		df_forecast = pd.DataFrame(forecast_rows)
 	else:
-		pd.DataFrame([], columns=["track_name", "race_time_iso", "TimeformForecast"]).to_csv(forecast_path, index=False, encoding=settings.CSV_ENCODING)
+		df_forecast = pd.DataFrame([], columns=["track_name", "race_time_iso", "TimeformForecast"])
+	df_forecast.to_csv(forecast_path, index=False, encoding=settings.CSV_ENCODING)
 	logger.info("Arquivo consolidado salvo: {}", forecast_path)
 
 	top3_dir = _ensure_output_dir("timeform_top3")
@@ -75,11 +77,17 @@ def main() -> None:
 			if col not in df_top.columns:
 				df_top[col] = pd.NA
 		df_top = df_top[["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3"]]
-		df_top.to_csv(top3_path, index=False, encoding=settings.CSV_ENCODING)
 	else:
-		pd.DataFrame([], columns=["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3"]).to_csv(top3_path, index=False, encoding=settings.CSV_ENCODING)
+		df_top = pd.DataFrame([], columns=["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3"])
+	df_top.to_csv(top3_path, index=False, encoding=settings.CSV_ENCODING)
 	logger.info("Arquivo consolidado salvo: {}", top3_path)
 
+	if settings.SQLITE_STORE:
+		with open_store() as conn:
+			upsert_timeform_picks(conn, "forecast", forecast_path.name, df_forecast, forecast_path)
+			upsert_timeform_picks(conn, "top3", top3_path.name, df_top, top3_path)
+		logger.info("Banco SQLite: Timeform do dia {} atualizado", date_str)
+
 
 if __name__ == "__main__":
 	main()
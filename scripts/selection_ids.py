@@ -0,0 +1,61 @@
+import sys
+import argparse
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.analysis.identity import SelectionIdentity, identity_path, matched_pairs
+from src.analysis.signals import SignalContext
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Tabela de identidade nome Timeform -> selection_id Betfair (data/cache/selection_ids.parquet)")
+    parser.add_argument("action", choices=["rebuild", "repair", "stats"], help="rebuild: reaprende do histórico completo; repair: remove ids que sumiram dos arquivos Betfair; stats: resumo")
+    parser.add_argument("--source", choices=["top3", "forecast", "both"], default="both", help="Fontes Timeform usadas no rebuild")
+    parser.add_argument("--fuzzy_names", action=argparse.BooleanOptionalAction, default=None, help="Aprende também os pares do casamento aproximado de nomes (rebuild)")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para ler/normalizar os CSVs de data/Result (1 = sequencial)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    path = identity_path()
+    if args.action == "stats":
+        identity = SelectionIdentity.load(path)
+        pairs = identity.pairs
+        conflicts = int(pairs.duplicated(["track_key", "tf_name"]).sum())
+        logger.info("{}: {} pares, {} chaves pista+nome, {} pares em conflito", path, len(pairs), len(identity), conflicts)
+        return 0
+
+    # WIN completo: o repair com a semi-junção tomaria ids fora do recorte como sumidos
+    options = {"workers": max(1, int(args.workers)), "id_join": False, "pushdown": False}
+    if args.fuzzy_names is not None:
+        options["fuzzy_names"] = args.fuzzy_names
+    ctx = SignalContext(**options)
+    if args.action == "rebuild":
+        identity = SelectionIdentity(path=path)
+        sources = [args.source] if args.source != "both" else ["top3", "forecast"]
+        for source in sources:
+            tf = ctx.timeform(source, "vectorized")
+            through = tf["race_iso"].astype(str).str.split("T", n=1).str[0].max() if not tf.empty else None
+            new = identity.learn(matched_pairs(tf, ctx.betfair("win")), source=source, through=through)
+            logger.info("Timeform {}: {} pares novos", source, new)
+    else:
+        identity = SelectionIdentity.load(path)
+        report = identity.repair(ctx.betfair("win"))
+        logger.info("Reparo: {}", report)
+    identity.save(force=args.action == "rebuild")
+    logger.info("{}: {} pares, {} chaves pista+nome em {:.2f}s", path, len(identity.pairs), len(identity), time.perf_counter() - t0)
+    print(str(path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+import sys
+import argparse
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.analysis.sqlite_store import export_csvs, open_store, store_path, store_stats, sync_store
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Banco SQLite com Result, Timeform, race_links e sinais (data/greyhounds.sqlite)")
+    parser.add_argument("action", choices=["sync", "export", "stats"], help="sync: importa CSVs novos/alterados; export: regrava CSVs a partir do banco; stats: linhas por tabela")
+    parser.add_argument("--db", type=str, default=None, help="Caminho do banco (padrão data/greyhounds.sqlite)")
+    parser.add_argument("--out", type=str, default=None, help="Pasta de saída do export (padrão data/export)")
+    parser.add_argument("--kind", choices=["signals", "timeform", "race_links", "all"], default="all", help="O que exportar")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para ler/normalizar os CSVs de data/Result no sync (1 = sequencial)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    path = Path(args.db) if args.db else store_path()
+    with open_store(path) as conn:
+        if args.action == "sync":
+            changed = sync_store(conn, workers=max(1, int(args.workers)))
+            logger.info("Arquivos sincronizados: {}", changed)
+        elif args.action == "export":
+            out_dir = Path(args.out) if args.out else settings.DATA_DIR / "export"
+            kinds = ["signals", "timeform", "race_links"] if args.kind == "all" else [args.kind]
+            written = export_csvs(conn, out_dir, kinds)
+            logger.info("{} CSVs exportados em {}", len(written), out_dir)
+        stats = store_stats(conn)
+    for table, rows in stats.items():
+        logger.info("{}: {} linhas", table, rows)
+    logger.info("{} em {:.2f}s", path, time.perf_counter() - t0)
+    print(str(path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,10 @@
 import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import re
-from dateutil import parser as date_parser
 import altair as alt
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -12,86 +12,77 @@ sys.path.append(str(PROJECT_ROOT))
 
 from src.config import settings
 from src.config import RULE_LABELS, RULE_LABELS_INV, ENTRY_TYPE_LABELS
-from src.utils.text import normalize_track_name
+from src.utils.text import normalize_track_names
+from src.analysis.feature_store import load_race_table, race_table_fingerprint
+from src.analysis.races import RaceIndex
+from src.analysis.rules import RULES, rule_names
+from src.analysis.signal_store import DASHBOARD_SIGNAL_COLUMNS, load_normalized_signals, load_signals_dataset, signals_dataset_dates
+from src.analysis.sqlite_store import open_store, parse_signals_name, read_signals, signal_dates, sync_signals_csv
 
 
-def _extract_track_from_menu_hint(menu_hint: str) -> str:
-    text = menu_hint or ""
-    m = re.match(r"^([A-Za-z\s]+?)(?:\s*\d|$)", text)
-    base = m.group(1) if m else text
-    return normalize_track_name(base)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _cached_race_index(data_dir: str, fingerprint: tuple) -> tuple[RaceIndex, pd.DataFrame]:
+    # Chave: pasta de dados + fingerprint das entradas do feature store; o índice é só lido depois
+    table = load_race_table()
+    races = RaceIndex()
+    races.extend(table)
+    return races, table
 
 
-def _to_iso_yyyy_mm_dd_thh_mm(value: str) -> str:
-    try:
-        dt = date_parser.parse(value, dayfirst=True)
-        return dt.strftime("%Y-%m-%dT%H:%M")
-    except Exception:
-        return ""
-
-
-def _extract_category_letter(event_name: str) -> str:
-    txt = str(event_name or "").strip()
-    m = re.match(r"^([A-Za-z]+)", txt)
-    token = m.group(1).upper() if m else ""
-    return token[:1] if token else ""
-
-
-def _extract_category_token(event_name: str) -> str:
-    txt = str(event_name or "").strip()
-    m = re.match(r"^([A-Za-z]+\d*)", txt)
-    return m.group(1).upper() if m else ""
-
-
-def _build_category_index() -> dict[tuple[str, str], dict[str, str]]:
-    result_dir = settings.DATA_DIR / "Result"
-    mapping: dict[tuple[str, str], dict[str, str]] = {}
-    for csv_path in sorted(result_dir.glob("dwbfgreyhoundwin*.csv")):
-        try:
-            df_r = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, usecols=["menu_hint", "event_dt", "event_name"])
-        except Exception:
-            continue
-        df_r = df_r.dropna(subset=["menu_hint", "event_dt", "event_name"], how="any")
-        if df_r.empty:
-            continue
-        df_r["track_key"] = df_r["menu_hint"].astype(str).map(_extract_track_from_menu_hint)
-        df_r["race_iso"] = df_r["event_dt"].astype(str).map(_to_iso_yyyy_mm_dd_thh_mm)
-        df_r["cat_letter"] = df_r["event_name"].astype(str).map(_extract_category_letter)
-        df_r["cat_token"] = df_r["event_name"].astype(str).map(_extract_category_token)
-        for _, r in df_r.iterrows():
-            key = (str(r["track_key"]), str(r["race_iso"]))
-            if not key[0] or not key[1]:
-                continue
-            if key not in mapping:
-                mapping[key] = {"letter": str(r.get("cat_letter", "")), "token": str(r.get("cat_token", ""))}
-    return mapping
-
-
-def _build_num_runners_index() -> dict[tuple[str, str], int]:
-    """Conta corredores por corrida a partir dos CSVs WIN (linhas por evento)."""
-    result_dir = settings.DATA_DIR / "Result"
-    counts: dict[tuple[str, str], int] = {}
-    for csv_path in sorted(result_dir.glob("dwbfgreyhoundwin*.csv")):
-        try:
-            df_r = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, usecols=["menu_hint", "event_dt"], engine="python")
-        except Exception:
-            continue
-        if df_r.empty:
-            continue
-        df_r["track_key"] = df_r["menu_hint"].astype(str).map(_extract_track_from_menu_hint)
-        df_r["race_iso"] = df_r["event_dt"].astype(str).map(_to_iso_yyyy_mm_dd_thh_mm)
-        grp = df_r.groupby(["track_key", "race_iso"], dropna=False).size()
-        for (tk, ri), n in grp.items():
-            if isinstance(tk, str) and tk and isinstance(ri, str) and ri:
-                counts[(tk, ri)] = int(n)
-    return counts
-
-
-def load_signals(source: str = "top3", market: str = "win", rule: str = "terceiro_queda50") -> pd.DataFrame:
-    filename = f"signals_{source}_{market}_{rule}.csv"
-    path = settings.DATA_DIR / "signals" / filename
+def _build_race_index() -> tuple[RaceIndex, pd.DataFrame]:
+    """Tabela de corridas do feature store (data/cache/features/races.parquet) e seus ids inteiros.
+
+    A tabela só é recalculada (relendo data/Result) quando os CSVs WIN mudam; entre reruns do
+    Streamlit o índice fica em memória enquanto o fingerprint dessas entradas não muda.
+    """
+    return _cached_race_index(str(settings.DATA_DIR), race_table_fingerprint())
+
+
+def _signal_race_ids(races: RaceIndex, df: pd.DataFrame) -> np.ndarray:
+    """Id da corrida de cada sinal (track_name normalizado + race_time_iso); -1 se desconhecida."""
+    tracks = normalize_track_names(df["track_name"].astype(str)).to_numpy(dtype=object)
+    return races.resolve(tracks, df["race_time_iso"].astype(str).to_numpy(dtype=object))
+
+
+def _take_by_race(values: np.ndarray, race_id: np.ndarray, missing):
+    """``values[race_id]`` com ``missing`` para ids -1 (corrida fora do índice)."""
+    out = np.full(len(race_id), missing, dtype=object)
+    known = race_id >= 0
+    out[known] = values[race_id[known]]
+    return out
+
+
+def signals_path(source: str = "top3", market: str = "win", rule: str = "terceiro_queda50") -> Path:
+    return settings.DATA_DIR / "signals" / f"signals_{source}_{market}_{rule}.csv"
+
+
+def store_signal_dates(path: Path) -> list[str] | None:
+    """Dias com sinais no banco SQLite (settings.SQLITE_STORE), reimportando o CSV se ele mudou; None sem o banco."""
+    if not settings.SQLITE_STORE or not path.exists():
+        return None
+    with open_store() as conn:
+        sync_signals_csv(conn, path)
+        return signal_dates(conn, *parse_signals_name(path.name))
+
+
+def load_signals(source: str = "top3", market: str = "win", rule: str = "terceiro_queda50", dates: list[str] | None = None) -> pd.DataFrame:
+    """Sinais da combinação; com ``dates`` e um banco/dataset por data em dia, lê só esses dias e as colunas do dashboard."""
+    path = signals_path(source, market, rule)
     if not path.exists():
         return pd.DataFrame()
+    if dates is not None and settings.SQLITE_STORE:
+        with open_store() as conn:
+            partial = read_signals(conn, source, market, rule, dates=dates or None, columns=DASHBOARD_SIGNAL_COLUMNS)
+        if partial is not None:
+            return partial
+    if dates is not None:
+        partial = load_signals_dataset(path, dates=dates or None, columns=DASHBOARD_SIGNAL_COLUMNS)
+        if partial is not None:
+            return partial
+    # Tabelas normalizadas (settings.SIGNALS_NORMALIZED), se estão em dia com o CSV
+    normalized = load_normalized_signals(path)
+    if normalized is not None:
+        return normalized
     try:
         return pd.read_csv(path, encoding=settings.CSV_ENCODING)
     except Exception:
@@ -115,9 +106,9 @@ def main() -> None:
     with col_mkt:
         market = st.selectbox("Mercado", ["win", "place"], index=0)
     with col_rule:
-        rule_labels = [RULE_LABELS["terceiro_queda50"], RULE_LABELS["lider_volume_total"]]
+        rule_labels = [RULES[name].label for name in rule_names()]
         selected_rule_label = st.selectbox("Regra de seleção", rule_labels, index=0)
-        rule = RULE_LABELS_INV.get(selected_rule_label, "terceiro_queda50")
+        rule = RULE_LABELS_INV.get(selected_rule_label, rule_names()[0])
     with col_entry:
         entry_opt_labels = ["ambos", ENTRY_TYPE_LABELS["back"], ENTRY_TYPE_LABELS["lay"]]
         entry_label = st.selectbox("Tipo de entrada", entry_opt_labels, index=0)
@@ -126,7 +117,14 @@ def main() -> None:
         else:
             entry_type = "back" if entry_label == ENTRY_TYPE_LABELS["back"] else "lay"
 
-    df = load_signals(source=source, market=market, rule=rule)
+    # Com o banco SQLite (settings.SQLITE_STORE) ou o dataset por data (settings.SIGNALS_DATASET) a lista
+    # de dias vem do índice/metadados e só os dias selecionados são lidos; sem eles, o CSV inteiro é
+    # carregado e filtrado em memória
+    path = signals_path(source, market, rule)
+    dataset_dates = store_signal_dates(path)
+    if dataset_dates is None and path.exists():
+        dataset_dates = signals_dataset_dates(path)
+    df = load_signals(source=source, market=market, rule=rule) if dataset_dates is None else pd.DataFrame({"date": dataset_dates})
     if df.empty:
         st.info("Nenhum sinal encontrado para a seleção. Gere antes com: python scripts/generate_signals.py --source {src} --market {mkt} --rule {rule} --entry_type both".format(src=source, mkt=market, rule=rule))
         return
@@ -148,8 +146,10 @@ def main() -> None:
                 key="dates_none",
                 on_click=lambda: st.session_state.update({"dates_ms": []}),
             )
-        default_dates = st.session_state.get("dates_ms", dates)
+        default_dates = st.session_state.get("dates_ms", dates if dataset_dates is None else dates[-settings.DASHBOARD_DEFAULT_DAYS:])
         sel_dates = st.multiselect("Datas", dates, default=default_dates, key="dates_ms")
+    if dataset_dates is not None:
+        df = load_signals(source=source, market=market, rule=rule, dates=sel_dates)
     with col_f2:
         tracks = sorted(df["track_name"].dropna().unique().tolist())
         tb1, tb2, _ = st.columns([1, 1, 2])
@@ -255,12 +255,10 @@ def main() -> None:
         # (campo movido para a frente do cabeçalho de Stake)
 
     # Enriquecimento: num_runners (fallback se ausente)
+    races, race_table = _build_race_index()
     if "num_runners" not in df.columns:
-        num_index = _build_num_runners_index()
         if not df.empty:
-            df["_key_track"] = df["track_name"].astype(str).map(normalize_track_name)
-            df["_key_race"] = df["race_time_iso"].astype(str)
-            df["num_runners"] = df.apply(lambda r: num_index.get((str(r["_key_track"]), str(r["_key_race"])), pd.NA), axis=1)
+            df["num_runners"] = pd.array(_take_by_race(race_table["file_runners"].to_numpy(), _signal_race_ids(races, df), pd.NA), dtype="Int64")
 
     filt = df.copy()
     # Filtro adicional: participação do líder (somente para regra líder_volume_total)
@@ -277,12 +275,10 @@ def main() -> None:
             )
         filt = filt[filt["leader_volume_share_pct"].fillna(0) >= float(leader_min)]
     # Enriquecimento: categoria por corrida (A/B/D etc.)
-    cat_index = _build_category_index()
     if not filt.empty:
-        filt["_key_track"] = filt["track_name"].astype(str).map(normalize_track_name)
-        filt["_key_race"] = filt["race_time_iso"].astype(str)
-        filt["category"] = filt.apply(lambda r: (cat_index.get((r["_key_track"], r["_key_race"]), {}) or {}).get("letter", ""), axis=1)
-        filt["category_token"] = filt.apply(lambda r: (cat_index.get((r["_key_track"], r["_key_race"]), {}) or {}).get("token", ""), axis=1)
+        race_id = _signal_race_ids(races, filt)
+        filt["category"] = _take_by_race(race_table["category_letter"].to_numpy(dtype=object), race_id, "")
+        filt["category_token"] = _take_by_race(race_table["category_token"].to_numpy(dtype=object), race_id, "")
         # Ordena letras (facilita UI)
         cat_letters = sorted([c for c in filt["category"].dropna().unique().tolist() if isinstance(c, str) and c])
     else:
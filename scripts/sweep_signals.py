@@ -0,0 +1,91 @@
+import sys
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+# Ajuste de path para permitir "python scripts/..." executar imports de src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.config import settings
+from src.analysis.signal_engine import race_features
+from src.analysis.rules import RULES, threshold_params
+from src.analysis.signals import SignalContext
+from src.analysis.sweep import parse_bands, parse_grid, sweep_thresholds
+
+
+def _parse_grid_options(items: list[str]) -> dict[str, list[float]]:
+    """Opções "--grid parâmetro=grade" (repetíveis) em {parâmetro: valores}."""
+    grids: dict[str, list[float]] = {}
+    for item in items:
+        param, sep, spec = item.partition("=")
+        if not sep or not param.strip():
+            raise ValueError(f"Grade inválida (esperado parâmetro=grade): {item}")
+        grids[param.strip()] = parse_grid(spec)
+    return grids
+
+
+def main(argv: list[str] | None = None) -> int:
+    logger.remove()
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(description="Varredura de limiares das regras (ROI/assertividade/PnL por ponto da grade)")
+    parser.add_argument("--source", choices=["top3", "forecast", "both"], default="both")
+    parser.add_argument("--market", choices=["win", "place", "both"], default="both")
+    # Uma opção --<parâmetro> por limiar declarado no registro (RuleThreshold.param)
+    for param in threshold_params():
+        rules = [name for name, rule in RULES.items() if rule.threshold is not None and rule.threshold.param == param]
+        parser.add_argument(f"--{param}", default=None, help=f"Grade de {param} ({', '.join(rules)}); início:fim:passo ou lista; padrão: valor da regra")
+    parser.add_argument("--grid", action="append", default=[], metavar="PARAM=GRADE", help="Grade de um parâmetro de limiar qualquer, ex.: --grid share_min=0.3:0.6:0.05 (repetível)")
+    parser.add_argument("--bsp_bands", default="", help="Faixas de BSP do alvo, ex.: 1.01-3,3-6,6-1000 (vazio = todas)")
+    parser.add_argument("--entry_type", choices=["back", "lay", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para ler/normalizar os CSVs de data/Result (1 = sequencial)")
+    parser.add_argument("--fuzzy_names", action=argparse.BooleanOptionalAction, default=None, help="Casa nomes Timeform sem par exato com o nome Betfair mais parecido da corrida; padrão settings.NAME_MATCH_ENABLED")
+    parser.add_argument("--id_join", action=argparse.BooleanOptionalAction, default=None, help="Junta corredores por selection_id aprendido; padrão settings.SELECTION_ID_JOIN")
+    parser.add_argument("--time_tolerance", type=int, default=settings.RACE_TIME_TOLERANCE_MIN, help="Tolerância (min) ao casar horário Timeform x Betfair (0 = exato)")
+    parser.add_argument("--top", type=int, default=10, help="Quantos pontos (por ROI) listar no log")
+    parser.add_argument("--min_count", type=int, default=30, help="Mínimo de sinais para um ponto entrar no ranking do log")
+    args = parser.parse_args(argv)
+
+    grids = {param: parse_grid(getattr(args, param)) for param in threshold_params() if getattr(args, param) is not None}
+    grids.update(_parse_grid_options(args.grid))
+    bands = parse_bands(args.bsp_bands)
+    entry_types = ["back", "lay"] if args.entry_type == "both" else [args.entry_type]
+    sources = [args.source] if args.source != "both" else ["top3", "forecast"]
+    markets = [args.market] if args.market != "both" else ["win", "place"]
+
+    out_dir = settings.DATA_DIR / "sweeps"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ctx = SignalContext(
+        workers=max(1, int(args.workers)),
+        time_tolerance=max(0, int(args.time_tolerance)),
+        fuzzy_names=settings.NAME_MATCH_ENABLED if args.fuzzy_names is None else args.fuzzy_names,
+        id_join=settings.SELECTION_ID_JOIN if args.id_join is None else args.id_join,
+    )
+    for source in sources:
+        for market in markets:
+            t0 = time.perf_counter()
+            features = race_features(ctx.timeform(source, "vectorized"), ctx.betfair("win"), ctx.betfair("place") if market == "place" else None, market=market)
+            t_feats = time.perf_counter() - t0
+            table = sweep_thresholds(features, grids, bands, entry_types)
+            elapsed = time.perf_counter() - t0
+            n_points = len(table) // max(1, len(entry_types))
+            logger.info(
+                "Varredura {} {}: {} corridas, {} pontos x {} entradas em {:.2f}s (atributos {:.2f}s)",
+                source, market, len(features), n_points, len(entry_types), elapsed, t_feats,
+            )
+            out_path = out_dir / f"sweep_{source}_{market}.csv"
+            table.to_csv(out_path, index=False, encoding=settings.CSV_ENCODING)
+            best = table[table["count"] >= args.min_count].sort_values("roi_stake_fixed_10", ascending=False).head(args.top)
+            if not best.empty:
+                with pd.option_context("display.width", 200, "display.max_columns", None):
+                    logger.info("Melhores pontos ({} {}):\n{}", source, market, best.to_string(index=False))
+            print(str(out_path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
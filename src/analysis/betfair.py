@@ -0,0 +1,767 @@
+from __future__ import annotations
+
+import re
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+from ..utils.dates import EVENT_DT_FORMAT, event_dt_parse_stats, event_dt_series_to_iso
+from ..utils.dates import event_dt_to_iso as _to_iso_yyyy_mm_dd_thh_mm
+from ..utils.text import clean_horse_name_cached, map_unique, normalize_track_name_cached
+from .races import RaceIndex
+from .result_cache import load_frames
+
+
+_TRAP_PREFIX_RE = re.compile(r"^\s*\d+\.\s*")
+
+# Prefixo dos arquivos consolidados Betfair em data/Result por mercado
+RESULT_FILE_PREFIX: Dict[str, str] = {
+    "win": "dwbfgreyhoundwin",
+    "place": "dwbfgreyhoundplace",
+}
+
+_RESULT_COLUMNS = ["event_id", "menu_hint", "event_dt", "event_name", "selection_id", "selection_name", "pptradedvol", "bsp", "win_lose"]
+
+# Colunas de texto lidas sempre como str, para que a leitura em blocos infira os mesmos tipos
+_RESULT_TEXT_COLUMNS = {"menu_hint": str, "event_dt": str, "event_name": str, "selection_name": str}
+
+# Versão do formato produzido por normalize_result_frame (invalida o cache em data/cache ao mudar)
+NORMALIZED_SCHEMA_VERSION = 4
+
+# Expansão aproximada de 1 byte de CSV em memória no DataFrame bruto (colunas de texto como objetos)
+_CSV_MEMORY_EXPANSION = 10
+
+
+def _strip_trap_prefix(name: str) -> str:
+    return _TRAP_PREFIX_RE.sub("", name or "").strip()
+
+
+def _extract_track_from_menu_hint(menu_hint: str) -> str:
+    # Pega trecho inicial até o primeiro dígito (ex.: "Romford 19th Sep" -> "Romford")
+    text = menu_hint or ""
+    m = re.match(r"^([A-Za-z\s]+?)(?:\s*\d|$)", text)
+    base = m.group(1) if m else text
+    return normalize_track_name_cached(base)
+
+
+def _clean_selection_name(raw_name: str) -> str:
+    return clean_horse_name_cached(_strip_trap_prefix(raw_name))
+
+
+def _iso_minutes(isos: np.ndarray) -> np.ndarray:
+    """YYYY-MM-DDTHH:MM -> minutos desde a época (int64); -1 se inválido."""
+    if len(isos) == 0:
+        return np.empty(0, dtype=np.int64)
+    parsed = pd.to_datetime(pd.Series(isos, dtype=object), format="%Y-%m-%dT%H:%M", errors="coerce")
+    minutes = parsed.to_numpy(dtype="datetime64[m]").astype(np.int64)
+    return np.where(parsed.isna().to_numpy(), -1, minutes)
+
+
+@dataclass(frozen=True)
+class RaceFilter:
+    """Semi-junção aplicada na carga de data/Result: só as corridas (e corredores) pedidos.
+
+    ``tracks``/``isos`` são as chaves (track_key, race_iso) de interesse; com ``tolerance_min``
+    > 0 valem também as corridas da mesma pista até essa distância em minutos. Com ``names``
+    (n x k nomes limpos, alinhado às chaves; só sem tolerância) apenas esses corredores de
+    cada corrida são mantidos.
+    """
+
+    tracks: np.ndarray
+    isos: np.ndarray
+    tolerance_min: int = 0
+    names: Optional[np.ndarray] = None
+
+    def parquet_filters(self) -> list:
+        """Filtro (superconjunto) para pd.read_parquet; o recorte exato é select()."""
+        filters = [("track_key", "in", sorted(set(np.asarray(self.tracks, dtype=object).tolist())))]
+        if self.tolerance_min <= 0:
+            filters.append(("race_iso", "in", sorted(set(np.asarray(self.isos, dtype=object).tolist()))))
+        return filters
+
+    def select(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Linhas de ``frame`` (normalize_result_frame) das corridas/corredores pedidos, na ordem original."""
+        if frame.empty:
+            return frame
+        tracks = np.asarray(self.tracks, dtype=object)
+        frame_tracks = frame["track_key"].to_numpy(dtype=object)
+        if self.tolerance_min > 0:
+            # Cada corrida pedida cobre os minutos [t - tolerância, t + tolerância] da mesma pista
+            minutes = _iso_minutes(np.asarray(self.isos, dtype=object))
+            ok = minutes >= 0
+            shifts = np.arange(-self.tolerance_min, self.tolerance_min + 1, dtype=np.int64)
+            wanted = pd.MultiIndex.from_arrays([np.repeat(tracks[ok], len(shifts)), (minutes[ok][:, None] + shifts[None, :]).ravel()])
+            keep = pd.MultiIndex.from_arrays([frame_tracks, _iso_minutes(frame["race_iso"].to_numpy(dtype=object))]).isin(wanted)
+        elif self.names is not None:
+            k = self.names.shape[1]
+            wanted = pd.MultiIndex.from_arrays([
+                np.repeat(tracks, k), np.repeat(np.asarray(self.isos, dtype=object), k), self.names.ravel(),
+            ])
+            keep = pd.MultiIndex.from_arrays([
+                frame_tracks, frame["race_iso"].to_numpy(dtype=object), frame["selection_name_clean"].to_numpy(dtype=object),
+            ]).isin(wanted)
+        else:
+            wanted = pd.MultiIndex.from_arrays([tracks, np.asarray(self.isos, dtype=object)])
+            keep = pd.MultiIndex.from_arrays([frame_tracks, frame["race_iso"].to_numpy(dtype=object)]).isin(wanted)
+        return frame[keep].reset_index(drop=True)
+
+
+@dataclass(slots=True)
+class RunnerBF:
+    selection_name_raw: str
+    selection_name_clean: str
+    pptradedvol: float
+    bsp: float
+    win_lose: int
+
+
+class RaceRunners(Mapping):
+    """Visão (nome limpo -> RunnerBF) sobre o bloco de uma corrida na RunnerTable."""
+
+    __slots__ = ("_table", "_start", "_stop")
+
+    def __init__(self, table: "RunnerTable", start: int, stop: int) -> None:
+        self._table = table
+        self._start = start
+        self._stop = stop
+
+    def _position(self, name: str) -> int:
+        code = self._table._name_index.get(name)
+        if code is None:
+            return -1
+        hits = np.flatnonzero(self._table.name_codes[self._start:self._stop] == code)
+        return self._start + int(hits[0]) if len(hits) else -1
+
+    def _runner_at(self, i: int) -> RunnerBF:
+        t = self._table
+        return RunnerBF(
+            selection_name_raw=t.raw_pool[t.raw_codes[i]],
+            selection_name_clean=t.name_pool[t.name_codes[i]],
+            pptradedvol=float(t.pptradedvol[i]),
+            bsp=float(t.bsp[i]),
+            win_lose=int(t.win_lose[i]),
+        )
+
+    def __getitem__(self, name: str) -> RunnerBF:
+        i = self._position(name)
+        if i < 0:
+            raise KeyError(name)
+        return self._runner_at(i)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._position(name) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        t = self._table
+        return iter(t.name_pool[t.name_codes[self._start:self._stop]].tolist())
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+
+@dataclass
+class RunnerTable(Mapping):
+    """Corredores Betfair em formato colunar, indexados por (track_key, race_iso).
+
+    Os arrays por corredor ficam em blocos contíguos: os corredores da corrida k
+    ocupam ``offsets[k]:offsets[k + 1]`` (na ordem da primeira ocorrência do nome, com
+    os valores da última, como no índice dict-de-dicts antigo). Textos repetidos são
+    guardados uma vez em *_pool e referenciados por códigos inteiros; a chave da corrida
+    k é ``(track_pool[race_track[k]], iso_pool[race_iso[k]])``.
+    """
+
+    track_pool: np.ndarray
+    iso_pool: np.ndarray
+    race_track: np.ndarray
+    race_iso: np.ndarray
+    offsets: np.ndarray
+    name_pool: np.ndarray
+    name_codes: np.ndarray
+    raw_pool: np.ndarray
+    raw_codes: np.ndarray
+    pptradedvol: np.ndarray
+    bsp: np.ndarray
+    win_lose: np.ndarray
+    selection_id: np.ndarray
+    _positions: Dict[str, Dict[str, int]] = field(init=False, repr=False)
+    _id_keys: Optional[Tuple[np.ndarray, np.ndarray, int]] = field(init=False, default=None, repr=False)
+    # Id denso de cada corrida numa RaceIndex compartilhada (bind_races) e o caminho inverso
+    race_id: Optional[np.ndarray] = field(init=False, default=None, repr=False)
+    _race_by_id: Optional[np.ndarray] = field(init=False, default=None, repr=False)
+    _name_index: Dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        positions: Dict[str, Dict[str, int]] = {}
+        tracks = self.track_pool[self.race_track].tolist()
+        isos = self.iso_pool[self.race_iso].tolist()
+        for k, (track, iso) in enumerate(zip(tracks, isos)):
+            positions.setdefault(track, {})[iso] = k
+        self._positions = positions
+        self._name_index = {name: code for code, name in enumerate(self.name_pool.tolist())}
+
+    def position(self, key: Tuple[str, str]) -> int:
+        """Índice da corrida (track_key, race_iso) ou -1."""
+        races = self._positions.get(key[0]) if isinstance(key, tuple) and len(key) == 2 else None
+        return races.get(key[1], -1) if races else -1
+
+    def positions(self, tracks: Sequence[str], isos: Sequence[str]) -> np.ndarray:
+        """Versão vetorizada de position(): índice de cada (track, iso) ou -1."""
+        keys = pd.MultiIndex.from_arrays([self.track_pool[self.race_track], self.iso_pool[self.race_iso]])
+        if len(keys) == 0 or len(tracks) == 0:
+            return np.full(len(tracks), -1, dtype=np.int64)
+        wanted = pd.MultiIndex.from_arrays([np.asarray(tracks, dtype=object), np.asarray(isos, dtype=object)])
+        return keys.get_indexer(wanted).astype(np.int64)
+
+    def positions_within(self, tracks: Sequence[str], isos: Sequence[str], tolerance_min: int = 0) -> Tuple[np.ndarray, int]:
+        """positions() com tolerância de horário: (índices, quantas corridas foram recuperadas).
+
+        Primeiro a chave exata; as linhas sem corrida são casadas, por pista, com a corrida
+        de horário mais próximo dentro de ``tolerance_min`` minutos (merge_asof), uma corrida
+        para no máximo uma linha e nunca uma corrida já casada pela chave exata. Conflitos
+        ficam com o par de menor diferença; quem perde tenta a próxima corrida livre.
+        """
+        exact = self.positions(tracks, isos)
+        missing = np.flatnonzero(exact < 0)
+        if tolerance_min <= 0 or len(missing) == 0 or len(self) == 0:
+            return exact, 0
+
+        tf_minutes = _iso_minutes(np.asarray(isos, dtype=object)[missing])
+        valid = tf_minutes >= 0
+        left = pd.DataFrame({
+            "row": missing[valid],
+            "track": np.asarray(tracks, dtype=object)[missing[valid]],
+            "minute": tf_minutes[valid],
+        }).sort_values("minute", kind="mergesort")
+        bf_right = pd.DataFrame({
+            "race": np.arange(len(self), dtype=np.int64),
+            "track": self.track_pool[self.race_track],
+            "minute": _iso_minutes(self.iso_pool[self.race_iso]),
+        })
+        bf_right = bf_right[bf_right["minute"] >= 0]
+        bf_right["race_minute"] = bf_right["minute"]
+
+        out = exact.copy()
+        taken = np.zeros(len(self), dtype=bool)
+        taken[exact[exact >= 0]] = True
+        recovered = 0
+        while not left.empty:
+            right = bf_right[~taken[bf_right["race"].to_numpy()]].sort_values("minute", kind="mergesort")
+            if right.empty:
+                break
+            cand = pd.merge_asof(left, right, on="minute", by="track", direction="nearest", tolerance=int(tolerance_min))
+            cand = cand.dropna(subset=["race"])
+            if cand.empty:
+                break
+            cand = cand.assign(diff=(cand["minute"] - cand["race_minute"]).abs())
+            cand = cand.sort_values(["diff", "row"], kind="mergesort").drop_duplicates("race", keep="first")
+            rows = cand["row"].to_numpy(dtype=np.int64)
+            races = cand["race"].to_numpy(dtype=np.int64)
+            out[rows] = races
+            taken[races] = True
+            recovered += len(rows)
+            left = left[~left["row"].isin(rows)]
+        return out, recovered
+
+    def runner_positions(self, races: np.ndarray, names: Sequence[str]) -> np.ndarray:
+        """Linha do corredor ``names[i]`` na corrida ``races[i]`` (índices de position()), ou -1."""
+        races = np.asarray(races, dtype=np.int64)
+        codes_u, uniques = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=False)
+        lookup = np.array([self._name_index.get(n, -1) if isinstance(n, str) else -1 for n in uniques], dtype=np.int64)
+        codes = lookup[codes_u] if len(codes_u) else np.empty(0, dtype=np.int64)
+        n_pool = max(1, len(self.name_pool))
+        runner_race = np.repeat(np.arange(len(self), dtype=np.int64), self.num_runners)
+        index = pd.Index(runner_race * n_pool + self.name_codes.astype(np.int64))
+        found = (races >= 0) & (codes >= 0)
+        out = np.full(len(races), -1, dtype=np.int64)
+        if found.any():
+            out[found] = index.get_indexer(races[found] * n_pool + codes[found])
+        return out
+
+    def bind_races(self, races: RaceIndex) -> None:
+        """Registra as corridas da tabela em ``races`` e guarda o id inteiro de cada uma."""
+        keys = pd.DataFrame({"track_key": self.track_pool[self.race_track], "race_iso": self.iso_pool[self.race_iso]})
+        self.race_id = races.extend(keys) if len(self) else np.empty(0, dtype=np.int64)
+        lookup = np.full(len(races), -1, dtype=np.int64)
+        lookup[self.race_id] = np.arange(len(self), dtype=np.int64)
+        self._race_by_id = lookup
+
+    def positions_by_race_id(self, race_ids: np.ndarray) -> np.ndarray:
+        """Índice da corrida de cada id da RaceIndex ligada (bind_races); -1 se a tabela não tem a corrida."""
+        race_ids = np.asarray(race_ids, dtype=np.int64)
+        lookup = self._race_by_id if self._race_by_id is not None else np.empty(0, dtype=np.int64)
+        ok = (race_ids >= 0) & (race_ids < len(lookup))
+        return np.where(ok, lookup[np.where(ok, race_ids, 0)] if len(lookup) else -1, -1)
+
+    def runner_positions_by_id(self, races: np.ndarray, selection_ids: np.ndarray) -> np.ndarray:
+        """Como runner_positions(), mas pela chave inteira (corrida, selection_id); -1 se ausente."""
+        races = np.asarray(races, dtype=np.int64)
+        ids = np.asarray(selection_ids, dtype=np.int64)
+        if self._id_keys is None:
+            stride = int(self.selection_id.max()) + 1 if len(self.selection_id) else 1
+            runner_race = np.repeat(np.arange(len(self), dtype=np.int64), self.num_runners)
+            keys = np.where(self.selection_id >= 0, runner_race * stride + self.selection_id, -1)
+            # Chaves ordenadas (primeira linha de cada chave) para busca binária
+            sorted_keys, first = np.unique(keys, return_index=True)
+            self._id_keys = (sorted_keys, first.astype(np.int64), stride)
+        sorted_keys, first, stride = self._id_keys
+        out = np.full(len(races), -1, dtype=np.int64)
+        ok = (races >= 0) & (ids >= 0) & (ids < stride)
+        if ok.any() and len(sorted_keys):
+            wanted = races[ok] * stride + ids[ok]
+            at = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+            out[ok] = np.where(sorted_keys[at] == wanted, first[at], -1)
+        return out
+
+    def __getitem__(self, key: Tuple[str, str]) -> RaceRunners:
+        k = self.position(key)
+        if k < 0:
+            raise KeyError(key)
+        return RaceRunners(self, int(self.offsets[k]), int(self.offsets[k + 1]))
+
+    def __contains__(self, key: object) -> bool:
+        return self.position(key) >= 0  # type: ignore[arg-type]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self.race_keys)
+
+    def __len__(self) -> int:
+        return len(self.race_track)
+
+    @property
+    def race_keys(self) -> List[Tuple[str, str]]:
+        """Chaves (track_key, race_iso) na ordem das corridas."""
+        return list(zip(self.track_pool[self.race_track].tolist(), self.iso_pool[self.race_iso].tolist()))
+
+    @property
+    def names(self) -> np.ndarray:
+        """Nome limpo por corredor (materializado a partir do pool)."""
+        return self.name_pool[self.name_codes]
+
+    @property
+    def num_runners(self) -> np.ndarray:
+        """Quantidade de corredores por corrida (alinhado a race_keys)."""
+        return np.diff(self.offsets)
+
+    def nbytes(self) -> int:
+        """Memória aproximada ocupada (arrays + textos dos pools + índices de busca)."""
+        arrays = [
+            self.track_pool, self.iso_pool, self.race_track, self.race_iso, self.offsets,
+            self.name_pool, self.name_codes, self.raw_pool, self.raw_codes,
+            self.pptradedvol, self.bsp, self.win_lose, self.selection_id,
+        ]
+        total = sum(a.nbytes for a in arrays)
+        for pool in (self.track_pool, self.iso_pool, self.name_pool, self.raw_pool):
+            total += sum(sys.getsizeof(v) for v in pool.tolist())
+        total += sys.getsizeof(self._positions) + sum(sys.getsizeof(d) for d in self._positions.values())
+        total += sys.getsizeof(self._name_index)
+        return total
+
+    @classmethod
+    def empty(cls) -> "RunnerTable":
+        return cls.from_frame(pd.DataFrame(columns=["track_key", "race_iso", "selection_name_raw", "selection_name_clean", "selection_id", "pptradedvol", "bsp", "win_lose"]))
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "RunnerTable":
+        """Monta a tabela a partir de linhas normalizadas (ver normalize_result_frame).
+
+        Linhas sem pista/horário/nome são descartadas; nomes repetidos na mesma corrida
+        mantêm a posição da primeira ocorrência e os valores da última.
+        """
+        keys = ["track_key", "race_iso", "selection_name_clean"]
+        df = frame.reset_index(drop=True)
+        df = df[(df["track_key"] != "") & (df["race_iso"] != "") & (df["selection_name_clean"] != "")]
+        if not df.empty:
+            df = df.assign(_order=np.arange(len(df), dtype=np.int64))
+            df["_order"] = df.groupby(keys, sort=False)["_order"].transform("min")
+            df = df.drop_duplicates(keys, keep="last")
+            df = df.sort_values(["track_key", "race_iso", "_order"], kind="mergesort")
+
+        track = df["track_key"].to_numpy(dtype=object)
+        race = df["race_iso"].to_numpy(dtype=object)
+        n = len(df)
+        if n:
+            starts = np.flatnonzero(np.r_[True, (track[1:] != track[:-1]) | (race[1:] != race[:-1])])
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        offsets = np.append(starts, n).astype(np.int64)
+        race_track, track_pool = pd.factorize(track[starts])
+        race_iso, iso_pool = pd.factorize(race[starts])
+        name_codes, name_pool = pd.factorize(df["selection_name_clean"].to_numpy(dtype=object))
+        raw_codes, raw_pool = pd.factorize(df["selection_name_raw"].to_numpy(dtype=object))
+        return cls(
+            track_pool=np.asarray(track_pool, dtype=object),
+            iso_pool=np.asarray(iso_pool, dtype=object),
+            race_track=race_track.astype(np.int32),
+            race_iso=race_iso.astype(np.int32),
+            offsets=offsets,
+            name_pool=np.asarray(name_pool, dtype=object),
+            name_codes=name_codes.astype(np.int32),
+            raw_pool=np.asarray(raw_pool, dtype=object),
+            raw_codes=raw_codes.astype(np.int32),
+            pptradedvol=df["pptradedvol"].to_numpy(dtype=np.float64),
+            bsp=df["bsp"].to_numpy(dtype=np.float64),
+            win_lose=df["win_lose"].to_numpy(dtype=np.int8),
+            selection_id=df["selection_id"].to_numpy(dtype=np.int64) if "selection_id" in df.columns else np.full(n, -1, dtype=np.int64),
+        )
+
+
+# Arrays compactos por corredor usados por RunnerTableBuilder (códigos nos pools + valores + ordem de leitura)
+_BUILDER_FIELDS = ("race", "name", "raw", "selection_id", "pptradedvol", "bsp", "win_lose", "order")
+
+
+def _take(part: Dict[str, np.ndarray], idx: np.ndarray) -> Dict[str, np.ndarray]:
+    return {f: part[f][idx] for f in _BUILDER_FIELDS}
+
+
+def _concat_parts(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {f: np.concatenate([p[f] for p in parts]) for f in _BUILDER_FIELDS}
+
+
+def _dedupe_runners(part: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Uma linha por (corrida, nome): valores da última ocorrência, ordem da primeira (como from_frame).
+
+    ``part`` precisa estar em ordem de leitura (``order`` crescente).
+    """
+    n = len(part["race"])
+    if n == 0:
+        return part
+    codes, _ = pd.factorize((part["race"].astype(np.int64) << 32) | part["name"].astype(np.int64))
+    _, first = np.unique(codes, return_index=True)
+    _, last_rev = np.unique(codes[::-1], return_index=True)
+    out = _take(part, n - 1 - last_rev)
+    out["order"] = part["order"][first]
+    return out
+
+
+class RunnerTableBuilder:
+    """Monta uma RunnerTable bloco a bloco (linhas de normalize_result_frame), sem concatenar o histórico.
+
+    Cada bloco vira códigos inteiros em pools que crescem a cada bloco (pista, horário, nomes)
+    e valores numéricos. As corridas que terminam no bloco são fechadas (uma linha por
+    corredor); a corrida da última linha fica aberta e é somada ao bloco seguinte, de modo
+    que uma corrida dividida na fronteira é deduplicada inteira. Se uma corrida já fechada
+    reaparece adiante (arquivo fora de ordem), build() refaz a deduplicação sobre os arrays
+    compactos. ``build()`` é igual a ``RunnerTable.from_frame`` das linhas concatenadas.
+    """
+
+    def __init__(self) -> None:
+        self._pools: Dict[str, Dict[str, int]] = {"track": {}, "iso": {}, "name": {}, "raw": {}}
+        self._race_codes: Dict[Tuple[int, int], int] = {}
+        self._race_track: List[int] = []
+        self._race_iso: List[int] = []
+        self._closed_parts: List[Dict[str, np.ndarray]] = []
+        self._closed = np.zeros(0, dtype=bool)
+        self._reopened = False
+        self._open: Optional[Dict[str, np.ndarray]] = None
+        self._rows = 0
+        self._events: List[pd.DataFrame] = []
+
+    def _encode(self, pool: str, values: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        table = self._pools[pool]
+        lookup = np.array([table.setdefault(u, len(table)) for u in uniques.tolist()], dtype=np.int64)
+        return lookup[codes] if len(codes) else np.empty(0, dtype=np.int64)
+
+    def _encode_races(self, track: np.ndarray, iso: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize((track << 32) | iso)
+        lookup = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques.tolist()):
+            pair = (key >> 32, key & 0xFFFFFFFF)
+            if pair not in self._race_codes:
+                self._race_codes[pair] = len(self._race_codes)
+                self._race_track.append(pair[0])
+                self._race_iso.append(pair[1])
+            lookup[i] = self._race_codes[pair]
+        return lookup[codes] if len(codes) else np.empty(0, dtype=np.int64)
+
+    def _close(self, part: Dict[str, np.ndarray]) -> None:
+        if len(part["race"]) == 0:
+            return
+        part = _dedupe_runners(part)
+        races = np.unique(part["race"])
+        if len(self._closed) < len(self._race_codes):
+            self._closed = np.r_[self._closed, np.zeros(len(self._race_codes) - len(self._closed), dtype=bool)]
+        self._reopened |= bool(self._closed[races].any())
+        self._closed[races] = True
+        self._closed_parts.append(part)
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """Acrescenta um bloco de linhas normalizadas (na ordem do arquivo)."""
+        if "event_id" in frame.columns and not frame.empty:
+            self._events.append(frame[["track_key", "race_iso", "event_id"]].drop_duplicates())
+        keep = ((frame["track_key"] != "") & (frame["race_iso"] != "") & (frame["selection_name_clean"] != "")).to_numpy()
+        rows = np.flatnonzero(keep)
+        df = frame.iloc[rows]
+        part = {
+            "race": self._encode_races(
+                self._encode("track", df["track_key"].to_numpy(dtype=object)),
+                self._encode("iso", df["race_iso"].to_numpy(dtype=object)),
+            ),
+            "name": self._encode("name", df["selection_name_clean"].to_numpy(dtype=object)),
+            "raw": self._encode("raw", df["selection_name_raw"].to_numpy(dtype=object)),
+            "selection_id": df["selection_id"].to_numpy(dtype=np.int64) if "selection_id" in df.columns else np.full(len(df), -1, dtype=np.int64),
+            "pptradedvol": df["pptradedvol"].to_numpy(dtype=np.float64),
+            "bsp": df["bsp"].to_numpy(dtype=np.float64),
+            "win_lose": df["win_lose"].to_numpy(dtype=np.int8),
+            "order": self._rows + rows.astype(np.int64),
+        }
+        self._rows += len(frame)
+        if len(rows) == 0:
+            return
+        merged = _concat_parts([self._open, part]) if self._open is not None else part
+        # A corrida da última linha pode continuar no próximo bloco: fica aberta
+        still_open = merged["race"] == part["race"][-1]
+        self._close(_take(merged, np.flatnonzero(~still_open)))
+        self._open = _take(merged, np.flatnonzero(still_open))
+
+    def events(self) -> pd.DataFrame:
+        """(track_key, race_iso, event_id) distintos, como frame[...].drop_duplicates() no caminho inteiro."""
+        if not self._events:
+            return pd.DataFrame(columns=["track_key", "race_iso", "event_id"])
+        return pd.concat(self._events, ignore_index=True).drop_duplicates()
+
+    def build(self) -> RunnerTable:
+        if self._open is not None:
+            self._close(self._open)
+            self._open = None
+        if not self._closed_parts:
+            return RunnerTable.empty()
+        rows = _concat_parts(self._closed_parts)
+        if self._reopened:
+            rows = _dedupe_runners(_take(rows, np.argsort(rows["order"], kind="stable")))
+        pools = {name: np.array(list(table), dtype=object) for name, table in self._pools.items()}
+        race_track = np.asarray(self._race_track, dtype=np.int64)
+        race_iso = np.asarray(self._race_iso, dtype=np.int64)
+        # Mesma ordem de from_frame: pista, horário (texto) e primeira ocorrência do nome
+        track_rank = np.argsort(np.argsort(pools["track"], kind="stable"), kind="stable")
+        iso_rank = np.argsort(np.argsort(pools["iso"], kind="stable"), kind="stable")
+        idx = np.lexsort((rows["order"], iso_rank[race_iso[rows["race"]]], track_rank[race_track[rows["race"]]]))
+        rows = _take(rows, idx)
+        race = rows["race"]
+        starts = np.flatnonzero(np.r_[True, race[1:] != race[:-1]])
+        out_track, track_uniques = pd.factorize(race_track[race[starts]])
+        out_iso, iso_uniques = pd.factorize(race_iso[race[starts]])
+        name_codes, name_uniques = pd.factorize(rows["name"])
+        raw_codes, raw_uniques = pd.factorize(rows["raw"])
+        return RunnerTable(
+            track_pool=pools["track"][track_uniques],
+            iso_pool=pools["iso"][iso_uniques],
+            race_track=out_track.astype(np.int32),
+            race_iso=out_iso.astype(np.int32),
+            offsets=np.append(starts, len(race)).astype(np.int64),
+            name_pool=pools["name"][name_uniques],
+            name_codes=name_codes.astype(np.int32),
+            raw_pool=pools["raw"][raw_uniques],
+            raw_codes=raw_codes.astype(np.int32),
+            pptradedvol=rows["pptradedvol"],
+            bsp=rows["bsp"],
+            win_lose=rows["win_lose"],
+            selection_id=rows["selection_id"],
+        )
+
+
+def _shared_strings(values: pd.Series) -> pd.Series:
+    # Linhas com o mesmo texto passam a referenciar um único objeto str
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return pd.Series(np.asarray(uniques, dtype=object)[codes], index=values.index, dtype=object)
+
+
+def normalize_result_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza um CSV Betfair bruto nas colunas usadas pelo índice de corredores.
+
+    ``event_name`` é mantido como texto (nulo quando ausente) para o índice de categorias.
+    """
+    for col in _RESULT_COLUMNS:
+        if col not in df.columns:
+            df[col] = pd.NA if col == "event_name" else ""
+    names_raw = _shared_strings(df["selection_name"].astype(str))
+    event_name = df["event_name"]
+    return pd.DataFrame({
+        "track_key": map_unique(df["menu_hint"].astype(str), _extract_track_from_menu_hint),
+        "race_iso": event_dt_series_to_iso(df["event_dt"].astype(str)),
+        "event_id": pd.to_numeric(df["event_id"], errors="coerce").fillna(-1).astype(np.int64),
+        "event_name": _shared_strings(event_name.astype(str).where(event_name.notna(), None)),
+        "selection_name_raw": names_raw,
+        "selection_name_clean": map_unique(names_raw, _clean_selection_name),
+        "selection_id": pd.to_numeric(df["selection_id"], errors="coerce").fillna(-1).astype(np.int64),
+        "pptradedvol": pd.to_numeric(df["pptradedvol"], errors="coerce").fillna(0.0).astype(float),
+        "bsp": pd.to_numeric(df["bsp"], errors="coerce").astype(float),
+        "win_lose": pd.to_numeric(df["win_lose"], errors="coerce").fillna(0).astype(int),
+    })
+
+
+def chunk_rows_for(csv_path: Path, memory_mb: Optional[int] = None) -> Optional[int]:
+    """Linhas por bloco para ler csv_path dentro de ``memory_mb`` (None = cabe inteiro).
+
+    O custo por linha é estimado a partir do tamanho médio das primeiras linhas do arquivo.
+    """
+    budget = float(memory_mb if memory_mb is not None else settings.RESULT_READ_MEMORY_MB) * 1024 * 1024
+    size = csv_path.stat().st_size
+    if size * _CSV_MEMORY_EXPANSION <= budget:
+        return None
+    with open(csv_path, "rb") as fh:
+        sample = fh.read(1 << 16)
+    bytes_per_row = max(1.0, len(sample) / max(1, sample.count(b"\n"))) * _CSV_MEMORY_EXPANSION
+    return max(1000, int(budget // bytes_per_row))
+
+
+def _result_read_kwargs(csv_path: Path) -> dict:
+    header = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, nrows=0).columns
+    return {
+        "encoding": settings.CSV_ENCODING,
+        "usecols": [c for c in header if c in _RESULT_COLUMNS],
+        "dtype": {c: t for c, t in _RESULT_TEXT_COLUMNS.items() if c in header},
+    }
+
+
+def iter_result_chunks(csv_path: Path, memory_mb: Optional[int] = None, chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Blocos normalizados (normalize_result_frame) de um CSV de data/Result.
+
+    Arquivos acima do teto de memória (RESULT_READ_MEMORY_MB ou ``memory_mb``) são lidos em
+    blocos de ``chunk_rows`` linhas; os demais saem em um único bloco.
+    """
+    read_kwargs = _result_read_kwargs(csv_path)
+    if chunk_rows is None:
+        chunk_rows = chunk_rows_for(csv_path, memory_mb)
+    if chunk_rows is None:
+        yield normalize_result_frame(pd.read_csv(csv_path, **read_kwargs))
+        return
+    n = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, **read_kwargs):
+        n += 1
+        yield normalize_result_frame(chunk)
+    if n == 0:
+        yield normalize_result_frame(pd.DataFrame(columns=read_kwargs["usecols"]))
+    logger.debug("{}: lido em {} blocos de até {} linhas", csv_path.name, n, chunk_rows)
+
+
+def _warn_event_dt_fallback(csv_path: Path, before: dict, rows: int) -> None:
+    after = event_dt_parse_stats()
+    fallback = after["fallback_rows"] - before["fallback_rows"]
+    if fallback:
+        logger.warning(
+            "{}: event_dt fora do formato {} em {} de {} linhas (parser genérico; {} sem data)",
+            csv_path.name, EVENT_DT_FORMAT, fallback, rows, after["failed_rows"] - before["failed_rows"],
+        )
+
+
+def _read_result_csv(csv_path: Path, memory_mb: Optional[int] = None, chunk_rows: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """Lê e normaliza um CSV de data/Result (um DataFrame por arquivo, para o cache).
+
+    Arquivos maiores que o teto de memória são lidos em blocos (iter_result_chunks): o
+    DataFrame bruto nunca fica inteiro em memória, mas o normalizado do arquivo sim. O
+    caminho com memória limitada ao histórico compacto é stream_betfair_results.
+    """
+    before = event_dt_parse_stats()
+    try:
+        parts = list(iter_result_chunks(csv_path, memory_mb, chunk_rows))
+        out = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+    except Exception as e:
+        logger.error("Falha ao ler {}: {}", csv_path.name, e)
+        return None
+    _warn_event_dt_fallback(csv_path, before, len(out))
+    return out
+
+
+def stream_betfair_results(
+    market: str = "win",
+    memory_mb: Optional[int] = None,
+    chunk_rows: Optional[int] = None,
+    races: Optional[RaceIndex] = None,
+    race_filter: Optional[RaceFilter] = None,
+) -> RunnerTable:
+    """RunnerTable do mercado lendo cada CSV de data/Result em blocos (RunnerTableBuilder).
+
+    Em memória ficam só um bloco bruto e os arrays compactos da tabela; nem o DataFrame
+    normalizado de um arquivo nem o do histórico são montados. Mesmo resultado de
+    load_betfair_results sem cache (``races``/``race_filter`` como lá). Um arquivo que falha
+    no meio da leitura mantém os blocos já lidos.
+    """
+    builder = RunnerTableBuilder()
+    for csv_path in sorted((settings.DATA_DIR / "Result").glob(f"{RESULT_FILE_PREFIX[market]}*.csv")):
+        before = event_dt_parse_stats()
+        rows = 0
+        try:
+            for chunk in iter_result_chunks(csv_path, memory_mb, chunk_rows):
+                rows += len(chunk)
+                builder.add(race_filter.select(chunk) if race_filter is not None else chunk)
+        except Exception as e:
+            logger.error("Falha ao ler {}: {}", csv_path.name, e)
+            continue
+        _warn_event_dt_fallback(csv_path, before, rows)
+    table = builder.build()
+    if races is not None:
+        events = builder.events()
+        if not events.empty:
+            races.extend(events)
+        table.bind_races(races)
+    logger.info("Betfair {} index criado em blocos: {} corridas", market.upper(), len(table))
+    return table
+
+
+def load_normalized_results(
+    market: str = "win",
+    use_cache: Optional[bool] = None,
+    workers: int = 1,
+    memory_mb: Optional[int] = None,
+    race_filter: Optional[RaceFilter] = None,
+) -> pd.DataFrame:
+    """Linhas normalizadas de todos os CSVs do mercado (win/place) em data/Result.
+
+    Usa o cache Parquet em data/cache/Result (RESULT_CACHE_ENABLED) para reler do CSV
+    apenas os arquivos novos ou alterados; com ``workers`` > 1 esses arquivos são
+    lidos e normalizados em paralelo (processos), com o mesmo resultado. ``memory_mb``
+    sobrepõe RESULT_READ_MEMORY_MB (teto por arquivo antes de ler em blocos).
+    Com ``race_filter`` só voltam as linhas das corridas/corredores pedidos; com o cache
+    consolidado em dia o filtro é aplicado já na leitura do Parquet.
+    """
+    prefix = RESULT_FILE_PREFIX[market]
+    paths = sorted((settings.DATA_DIR / "Result").glob(f"{prefix}*.csv"))
+    if use_cache is None:
+        use_cache = settings.RESULT_CACHE_ENABLED
+    parse = partial(_read_result_csv, memory_mb=memory_mb)
+    filters = race_filter.parquet_filters() if race_filter is not None else None
+    out = load_frames(paths, parse, key=market, version=NORMALIZED_SCHEMA_VERSION, use_cache=use_cache, workers=workers, filters=filters)
+    return race_filter.select(out) if race_filter is not None else out
+
+
+def load_betfair_results(
+    market: str = "win",
+    use_cache: Optional[bool] = None,
+    workers: int = 1,
+    frame: Optional[pd.DataFrame] = None,
+    races: Optional[RaceIndex] = None,
+    race_filter: Optional[RaceFilter] = None,
+) -> RunnerTable:
+    """Carrega todos os CSVs do mercado (win/place) em data/Result como RunnerTable.
+
+    ``frame`` reaproveita um resultado de load_normalized_results já carregado. Com ``races``
+    as corridas (e seus event_id) são registradas na RaceIndex e a tabela passa a aceitar
+    junções por id inteiro (positions_by_race_id). Com ``race_filter`` a tabela só tem as
+    corridas/corredores pedidos (ver RaceFilter). Sem ``frame``, sem cache e sem workers
+    a tabela é montada em blocos (stream_betfair_results).
+    """
+    if use_cache is None:
+        use_cache = settings.RESULT_CACHE_ENABLED
+    if frame is None and not use_cache and workers <= 1:
+        # Sem cache não há por que montar o DataFrame normalizado do histórico
+        return stream_betfair_results(market, races=races, race_filter=race_filter)
+    if frame is None:
+        frame = load_normalized_results(market, use_cache=use_cache, workers=workers, race_filter=race_filter)
+    elif race_filter is not None:
+        frame = race_filter.select(frame)
+    table = RunnerTable.from_frame(frame) if not frame.empty else RunnerTable.empty()
+    if races is not None:
+        if not frame.empty and "event_id" in frame.columns:
+            races.extend(frame[["track_key", "race_iso", "event_id"]].drop_duplicates())
+        table.bind_races(races)
+    logger.info("Betfair {} index criado: {} corridas", market.upper(), len(table))
+    return table
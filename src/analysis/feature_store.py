@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+from .betfair import RESULT_FILE_PREFIX, RunnerTable, load_normalized_results
+from .races import RaceIndex
+from .result_cache import _atomic_write_json, _atomic_write_parquet, file_sha1
+from .signal_engine import _sequential_race_totals
+
+
+# Feature store por corrida: tabelas tipadas em Parquet (data/cache/features) gravadas uma vez
+# por atualização dos dados e lidas pelo motor de sinais e pelo dashboard. Cada tabela guarda
+# no manifesto o fingerprint das entradas (mtime, tamanho, SHA-1) e as opções com que foi
+# montada; qualquer diferença faz a tabela ser recalculada e regravada na próxima leitura.
+#   races            fatos Betfair WIN por corrida (corredores, volume total, categoria)
+#   {source}_{market} race_features do motor vetorizado (ranks de volume do top 3 Timeform etc.)
+
+FEATURE_STORE_VERSION = 1
+_MANIFEST_NAME = "manifest.json"
+
+# Módulos cujo código monta cada tabela; o SHA-1 do código entra nas opções do manifesto, então
+# mudar a definição (ex.: race_features) invalida o Parquet sem depender de FEATURE_STORE_VERSION
+RACES_CODE = ("..utils.dates", "..utils.text", ".result_cache", ".betfair", ".races", ".signal_engine", ".feature_store")
+FEATURES_CODE = RACES_CODE + (".rules", ".name_match", ".identity", ".signals")
+
+_TIMEFORM_INPUTS = {
+    "top3": ("timeform_top3", "timeform_top3_*.csv"),
+    "forecast": ("TimeformForecast", "TimeformForecast_*.csv"),
+}
+
+RACE_COLUMNS = [
+    "track_key", "race_iso", "num_runners", "file_runners", "total_volume", "category_letter", "category_token",
+]
+
+
+def feature_store_dir() -> Path:
+    return settings.DATA_DIR / "cache" / "features"
+
+
+def _fingerprint(path: Path, previous: Optional[dict] = None) -> dict:
+    """(mtime, tamanho, sha1); o hash só é recalculado se mtime ou tamanho mudaram."""
+    st = path.stat()
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns and previous.get("sha1"):
+        return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": previous["sha1"]}
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": file_sha1(path)}
+
+
+def _same_content(a: Optional[dict], b: Optional[dict]) -> bool:
+    return bool(a) and bool(b) and a.get("size") == b.get("size") and a.get("sha1") == b.get("sha1")
+
+
+@lru_cache(maxsize=None)
+def code_digest(modules: Tuple[str, ...]) -> str:
+    """SHA-1 do código-fonte dos módulos (nomes relativos a src.analysis)."""
+    h = hashlib.sha1()
+    for name in modules:
+        module = importlib.import_module(name, __package__)
+        h.update(name.encode("utf-8"))
+        h.update(Path(module.__file__).read_bytes())
+    return h.hexdigest()
+
+
+def _relative(paths: list) -> Dict[str, Path]:
+    return {p.relative_to(settings.DATA_DIR).as_posix(): p for p in paths}
+
+
+def result_input_paths(market: str = "win") -> Dict[str, Path]:
+    """CSVs de data/Result do mercado, por caminho relativo a DATA_DIR."""
+    return _relative(sorted((settings.DATA_DIR / "Result").glob(f"{RESULT_FILE_PREFIX[market]}*.csv")))
+
+
+def _input_paths(source: str, market: str) -> Dict[str, Path]:
+    """Arquivos que alimentam os sinais/atributos de source/market, por caminho relativo a DATA_DIR."""
+    paths = result_input_paths("win")
+    if market == "place":
+        paths.update(result_input_paths("place"))
+    folder, pattern = _TIMEFORM_INPUTS[source]
+    paths.update(_relative(sorted((settings.DATA_DIR / folder).glob(pattern))))
+    return paths
+
+
+def category_letter(event_name: str) -> str:
+    txt = str(event_name or "").strip()
+    m = re.match(r"^([A-Za-z]+)", txt)
+    token = m.group(1).upper() if m else ""
+    return token[:1] if token else ""
+
+
+def category_token(event_name: str) -> str:
+    txt = str(event_name or "").strip()
+    m = re.match(r"^([A-Za-z]+\d*)", txt)
+    return m.group(1).upper() if m else ""
+
+
+def race_table(results: pd.DataFrame, bf_win: RunnerTable) -> pd.DataFrame:
+    """Uma linha por corrida das linhas WIN normalizadas, na ordem da primeira ocorrência.
+
+    ``num_runners``/``total_volume`` seguem a RunnerTable (como nos sinais; 0 se a corrida não
+    tem corredores com nome); ``file_runners`` conta as linhas da corrida no último arquivo em
+    que ela aparece; a categoria vem do primeiro event_name da corrida.
+    """
+    races = RaceIndex()
+    ids = races.extend(results)
+    tracks, isos = races.keys(np.arange(len(races), dtype=np.int64))
+    n = len(races)
+
+    pos = bf_win.positions(tracks, isos) if n else np.empty(0, dtype=np.int64)
+    found = pos >= 0
+    num_runners = np.zeros(n, dtype=np.int32)
+    num_runners[found] = bf_win.num_runners[pos[found]]
+    total_volume = np.zeros(n, dtype=np.float64)
+    total_volume[found] = _sequential_race_totals(bf_win, pos[found])
+
+    file_runners = np.zeros(n, dtype=np.int32)
+    letters = np.full(n, "", dtype=object)
+    tokens = np.full(n, "", dtype=object)
+    ok = ids >= 0
+    if ok.any():
+        sizes = pd.DataFrame({"source_file": results["source_file"].to_numpy(dtype=object)[ok], "race": ids[ok]})
+        sizes = sizes.groupby(["source_file", "race"]).size().reset_index(name="n")
+        # Se a corrida aparece em mais de um arquivo, vale a contagem do último
+        sizes = sizes.sort_values("source_file", kind="mergesort").drop_duplicates("race", keep="last")
+        file_runners[sizes["race"].to_numpy(dtype=np.int64)] = sizes["n"].to_numpy(dtype=np.int32)
+
+        named = results["event_name"].notna().to_numpy() & ok
+        # Primeira ocorrência de cada corrida com event_name (arquivos em ordem, linhas em ordem)
+        first = pd.Series(ids[named]).drop_duplicates(keep="first")
+        names = results["event_name"].to_numpy(dtype=object)[named][first.index.to_numpy()].astype(str)
+        race = first.to_numpy(dtype=np.int64)
+        letters[race] = [category_letter(x) for x in names]
+        tokens[race] = [category_token(x) for x in names]
+
+    return pd.DataFrame({
+        "track_key": tracks,
+        "race_iso": isos,
+        "num_runners": num_runners,
+        "file_runners": file_runners,
+        "total_volume": total_volume,
+        "category_letter": letters,
+        "category_token": tokens,
+    })[RACE_COLUMNS]
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, dict) and data.get("version") == FEATURE_STORE_VERSION:
+            data.setdefault("tables", {})
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Manifesto do feature store inválido ({}); recriando: {}", path, e)
+    return {"version": FEATURE_STORE_VERSION, "tables": {}}
+
+
+def load_or_build(
+    name: str,
+    inputs: Dict[str, Path],
+    options: dict,
+    build: Callable[[], pd.DataFrame],
+    rebuild: bool = False,
+) -> pd.DataFrame:
+    """Tabela ``name`` do feature store; recalculada com ``build`` se entradas/opções mudaram.
+
+    ``inputs`` são os arquivos de que a tabela depende (caminho relativo -> Path) e
+    ``options`` os parâmetros (JSON) que mudam o conteúdo.
+    """
+    base = feature_store_dir()
+    manifest_path = base / _MANIFEST_NAME
+    table_path = base / f"{name}.parquet"
+    manifest = _load_manifest(manifest_path)
+    previous = manifest["tables"].get(name) or {}
+    prev_inputs: Dict[str, dict] = previous.get("inputs", {})
+    fingerprints = {rel: _fingerprint(p, prev_inputs.get(rel)) for rel, p in inputs.items()}
+
+    fresh = (
+        not rebuild
+        and previous.get("options") == options
+        and set(prev_inputs) == set(fingerprints)
+        and all(_same_content(fingerprints[rel], prev_inputs[rel]) for rel in fingerprints)
+        and table_path.exists()
+    )
+    if fresh:
+        try:
+            out = pd.read_parquet(table_path)
+            if fingerprints != prev_inputs:
+                previous["inputs"] = fingerprints
+                _atomic_write_json(manifest_path, manifest)
+            logger.debug("Feature store {}: {} linhas (em cache)", name, len(out))
+            return out
+        except Exception as e:
+            logger.warning("Falha ao ler {} do feature store: {}", table_path.name, e)
+
+    out = build()
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        _atomic_write_parquet(out, table_path)
+        manifest["tables"][name] = {"options": options, "inputs": fingerprints, "rows": len(out)}
+        _atomic_write_json(manifest_path, manifest)
+        logger.info("Feature store {}: {} linhas gravadas ({} entradas)", name, len(out), len(fingerprints))
+    except Exception as e:
+        logger.warning("Falha ao gravar {} no feature store: {}", table_path.name, e)
+    return out
+
+
+def race_table_fingerprint() -> Tuple[Tuple[str, int, int], ...]:
+    """(caminho, mtime, tamanho) das entradas da tabela ``races``: chave barata para caches em memória
+    (ex.: dashboard); muda sempre que load_race_table puder devolver outra tabela."""
+    out = []
+    for rel, path in result_input_paths("win").items():
+        st = path.stat()
+        out.append((rel, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def load_race_table(build: Optional[Callable[[], pd.DataFrame]] = None, rebuild: bool = False) -> pd.DataFrame:
+    """Tabela ``races`` (RACE_COLUMNS); só relê data/Result quando os CSVs WIN mudaram.
+
+    ``build`` permite montar a tabela a partir de entradas já carregadas (ex.: SignalContext).
+    """
+    def _build() -> pd.DataFrame:
+        results = load_normalized_results("win")
+        return race_table(results, RunnerTable.from_frame(results) if not results.empty else RunnerTable.empty())
+
+    return load_or_build("races", result_input_paths("win"), {"code": code_digest(RACES_CODE)}, build or _build, rebuild=rebuild)
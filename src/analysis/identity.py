@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+from .betfair import RunnerTable
+from .result_cache import _atomic_write_json, _atomic_write_parquet
+
+
+# Tabela de identidade Timeform -> Betfair: (track_key, nome Timeform limpo) -> selection_id,
+# aprendida dos casamentos por nome de execuções anteriores. Cada par guarda quantas vezes foi
+# visto (somando as execuções; cada uma só aprende, por fonte Timeform, os dias posteriores ao
+# último já aprendido, guardado em selection_ids.learned.json) e o último dia; quando a mesma chave aponta para ids diferentes (cães homônimos na mesma
+# pista), vale o mais frequente (empate: o mais recente). Persistida em Parquet em data/cache.
+
+IDENTITY_COLUMNS = ["track_key", "tf_name", "selection_id", "matches", "last_seen"]
+
+
+def identity_path() -> Path:
+    return settings.DATA_DIR / "cache" / "selection_ids.parquet"
+
+
+def _learned_path(path: Path) -> Path:
+    return path.with_suffix(".learned.json")
+
+
+def _empty_pairs() -> pd.DataFrame:
+    return pd.DataFrame({
+        "track_key": pd.Series(dtype=object),
+        "tf_name": pd.Series(dtype=object),
+        "selection_id": pd.Series(dtype=np.int64),
+        "matches": pd.Series(dtype=np.int64),
+        "last_seen": pd.Series(dtype=object),
+    })
+
+
+def matched_pairs(tf: pd.DataFrame, bf_win: RunnerTable) -> pd.DataFrame:
+    """Pares (pista, nome Timeform, selection_id, dia) casados pelo nome em ``tf`` (frame vetorizado).
+
+    O nome Timeform é o original (tf_name_1..3, quando o casamento aproximado trocou name_1..3).
+    """
+    if tf.empty or len(bf_win) == 0:
+        return _empty_pairs()
+    tracks = tf["track_key"].to_numpy(dtype=object)
+    races = bf_win.positions(tracks, tf["race_iso"].to_numpy(dtype=object))
+    days = tf["race_iso"].astype(str).str.split("T", n=1).str[0].to_numpy(dtype=object)
+    parts = []
+    for j in range(1, 4):
+        original = f"tf_name_{j}" if f"tf_name_{j}" in tf.columns else f"name_{j}"
+        runner = bf_win.runner_positions(races, tf[f"name_{j}"].to_numpy(dtype=object))
+        ok = runner >= 0
+        ids = bf_win.selection_id[runner[ok]]
+        parts.append(pd.DataFrame({
+            "track_key": tracks[ok],
+            "tf_name": tf[original].to_numpy(dtype=object)[ok],
+            "selection_id": ids,
+            "last_seen": days[ok],
+        })[ids >= 0])
+    pairs = pd.concat(parts, ignore_index=True)
+    if pairs.empty:
+        return _empty_pairs()
+    return (
+        pairs.groupby(["track_key", "tf_name", "selection_id"], sort=False)
+        .agg(matches=("last_seen", "size"), last_seen=("last_seen", "max"))
+        .reset_index()[IDENTITY_COLUMNS]
+    )
+
+
+@dataclass
+class SelectionIdentity:
+    """Pares aprendidos e a visão resolvida (um selection_id por pista+nome) usada nas junções."""
+
+    pairs: pd.DataFrame = field(default_factory=_empty_pairs)
+    path: Optional[Path] = None
+    # Último dia aprendido por fonte Timeform (top3/forecast)
+    learned: Dict[str, str] = field(default_factory=dict)
+    _lookup: Optional[pd.Series] = field(default=None, repr=False)
+    _dirty: bool = field(default=False, repr=False)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "SelectionIdentity":
+        path = path or identity_path()
+        try:
+            pairs = pd.read_parquet(path)
+            if list(pairs.columns) != IDENTITY_COLUMNS:
+                raise ValueError(f"colunas inesperadas: {list(pairs.columns)}")
+            pairs["track_key"] = pairs["track_key"].astype(object)
+            pairs["tf_name"] = pairs["tf_name"].astype(object)
+            pairs["last_seen"] = pairs["last_seen"].astype(object)
+        except FileNotFoundError:
+            pairs = _empty_pairs()
+        except Exception as e:
+            logger.warning("Tabela de identidade inválida ({}); recriando: {}", path, e)
+            pairs = _empty_pairs()
+        learned: Dict[str, str] = {}
+        if len(pairs):
+            try:
+                with open(_learned_path(path), "r", encoding="utf-8") as fh:
+                    learned = {str(k): str(v) for k, v in json.load(fh).items()}
+            except Exception:
+                # Tabela sem o registro por fonte: trata o histórico todo como aprendido
+                last = str(pairs["last_seen"].max())
+                learned = {"top3": last, "forecast": last}
+        return cls(pairs=pairs, path=path, learned=learned)
+
+    def __len__(self) -> int:
+        return len(self.resolved())
+
+    def snapshot(self) -> "SelectionIdentity":
+        """Cópia para consulta dos pares atuais (learn/repair posteriores não a alteram)."""
+        return SelectionIdentity(pairs=self.pairs, learned=dict(self.learned))
+
+    def learned_through(self, source: str) -> str:
+        """Último dia (YYYY-MM-DD) já aprendido da fonte; "" se nenhum."""
+        return self.learned.get(source, "")
+
+    def resolved(self) -> pd.Series:
+        """selection_id por (track_key, tf_name): o par mais visto; empate, o mais recente."""
+        if self._lookup is None:
+            best = self.pairs.sort_values(["matches", "last_seen", "selection_id"], ascending=[False, False, True], kind="mergesort")
+            best = best.drop_duplicates(["track_key", "tf_name"], keep="first")
+            self._lookup = pd.Series(
+                best["selection_id"].to_numpy(dtype=np.int64),
+                index=pd.MultiIndex.from_arrays([best["track_key"].to_numpy(dtype=object), best["tf_name"].to_numpy(dtype=object)]),
+            )
+        return self._lookup
+
+    def lookup(self, tracks: Sequence[str], names: Sequence[str]) -> np.ndarray:
+        """selection_id de cada (pista, nome Timeform); -1 quando o par nunca foi visto."""
+        lookup = self.resolved()
+        if len(lookup) == 0 or len(tracks) == 0:
+            return np.full(len(tracks), -1, dtype=np.int64)
+        wanted = pd.MultiIndex.from_arrays([np.asarray(tracks, dtype=object), np.asarray(names, dtype=object)])
+        at = lookup.index.get_indexer(wanted)
+        return np.where(at >= 0, lookup.to_numpy()[np.maximum(at, 0)], -1).astype(np.int64)
+
+    def learn(self, pairs: pd.DataFrame, source: Optional[str] = None, through: Optional[str] = None) -> int:
+        """Junta casamentos aos pares conhecidos; retorna quantos pares eram inéditos.
+
+        As contagens somam: ``pairs`` deve trazer só observações ainda não aprendidas (ver
+        learned_through), senão reaprender o mesmo histórico infla os pares já conhecidos.
+        ``source``/``through`` registram até que dia a fonte foi aprendida.
+        """
+        if source and through and through > self.learned.get(source, ""):
+            self.learned[source] = through
+            self._dirty = True
+        if pairs.empty:
+            return 0
+        keys = ["track_key", "tf_name", "selection_id"]
+        known = pd.MultiIndex.from_frame(self.pairs[keys]) if len(self.pairs) else None
+        new = len(pairs) if known is None else int((known.get_indexer(pd.MultiIndex.from_frame(pairs[keys])) < 0).sum())
+        previous = self.pairs
+        merged = pd.concat([previous, pairs], ignore_index=True)
+        self.pairs = (
+            merged.groupby(keys, sort=False)
+            .agg(matches=("matches", "sum"), last_seen=("last_seen", "max"))
+            .reset_index()[IDENTITY_COLUMNS]
+        )
+        self._lookup = None
+        self._dirty = self._dirty or not self.pairs.reset_index(drop=True).equals(previous.reset_index(drop=True))
+        return new
+
+    def repair(self, bf_win: RunnerTable) -> Dict[str, int]:
+        """Remove pares com selection_id que não existe mais nos arquivos Betfair e recompõe a visão.
+
+        ``bf_win`` precisa ser o WIN completo (sem semi-junção/RaceFilter): um id fora do
+        recorte seria tomado como sumido.
+        """
+        alive = np.isin(self.pairs["selection_id"].to_numpy(dtype=np.int64), bf_win.selection_id[bf_win.selection_id >= 0])
+        before_keys = len(self.resolved())
+        dropped = int((~alive).sum())
+        self.pairs = self.pairs[alive].reset_index(drop=True)
+        self._lookup = None
+        self._dirty = True
+        conflicts = int(self.pairs.duplicated(["track_key", "tf_name"]).sum())
+        return {"dropped_pairs": dropped, "keys_before": before_keys, "keys_after": len(self.resolved()), "conflicting_pairs": conflicts}
+
+    def save(self, force: bool = False) -> None:
+        """Grava os pares se mudaram (ou sempre, com ``force``, como no rebuild)."""
+        if not self._dirty and not force:
+            return
+        self.path = self.path or identity_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Registro por fonte antes dos pares: uma falha no meio deixa de aprender, mas não conta duas vezes
+        _atomic_write_json(_learned_path(self.path), self.learned)
+        _atomic_write_parquet(self.pairs, self.path)
+        self._dirty = False
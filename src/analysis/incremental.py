@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+from .feature_store import _TIMEFORM_INPUTS, _fingerprint, _input_paths, _same_content
+from .identity import identity_path
+from .name_match import alias_cache_path
+from .result_cache import _atomic_write_json, file_sha1
+from .rules import get_rule
+from .signals import SignalContext, _new_context, generate_signals, merge_signals_csv, signals_csv_path, write_signals_csv
+
+
+# Manifesto da geração incremental: para cada CSV de sinais, as entradas (com fingerprint)
+# que o produziram, os dias de corrida presentes em cada entrada e o fingerprint do próprio CSV.
+# Uma entrada nova/alterada/removida faz recalcular apenas os dias que ela contém (ou continha).
+
+MANIFEST_VERSION = 1
+_MANIFEST_NAME = "manifest.json"
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            data.setdefault("outputs", {})
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Manifesto de sinais inválido ({}); recriando: {}", path, e)
+    return {"version": MANIFEST_VERSION, "outputs": {}}
+
+
+def _rule_digest(rule: str) -> str:
+    """sha1 da definição registrada da regra (expressão, alvo, parâmetros padrão...)."""
+    return hashlib.sha1(json.dumps(asdict(get_rule(rule)), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _table_digest(path: Path) -> Optional[str]:
+    return file_sha1(path) if path.exists() else None
+
+
+def _run_params(ctx: SignalContext, leader_share_min: float, entry_type: str) -> dict:
+    """Tudo, além das entradas, que muda o conteúdo dos CSVs de sinais (sem a regra)."""
+    params = {"leader_share_min": float(leader_share_min), "entry_type": entry_type}
+    if ctx.time_tolerance:
+        params["time_tolerance"] = ctx.time_tolerance
+    if ctx.fuzzy_names:
+        params["fuzzy_names"] = True
+        params["name_match_min_score"] = float(settings.NAME_MATCH_MIN_SCORE)
+        params["aliases"] = _table_digest(alias_cache_path())
+    if ctx.id_join:
+        params["id_join"] = True
+        params["identity"] = _table_digest(identity_path())
+    if ctx.pushdown:
+        params["pushdown"] = True
+    return params
+
+
+def _dates_by_file(frame: pd.DataFrame, iso_column: str, folder: str) -> Dict[str, List[str]]:
+    if frame.empty or "source_file" not in frame.columns:
+        return {}
+    dates = frame[iso_column].astype(str).str.split("T", n=1).str[0]
+    pairs = pd.DataFrame({"file": frame["source_file"].astype(str), "date": dates}).drop_duplicates()
+    pairs = pairs[pairs["date"] != ""]
+    return {f"{folder}/{name}": sorted(group["date"].tolist()) for name, group in pairs.groupby("file", sort=False)}
+
+
+def _input_dates(ctx: SignalContext, source: str, market: str) -> Dict[str, List[str]]:
+    """Dias de corrida presentes em cada entrada (caminho relativo -> datas YYYY-MM-DD)."""
+    out = _dates_by_file(ctx.results("win"), "race_iso", "Result")
+    if market == "place":
+        out.update(_dates_by_file(ctx.results("place"), "race_iso", "Result"))
+    out.update(_dates_by_file(ctx.timeform(source, "vectorized"), "race_iso", _TIMEFORM_INPUTS[source][0]))
+    return out
+
+
+def generate_signals_incremental(
+    combos: Iterable[Tuple[str, str, str]],
+    leader_share_min: float = 0.5,
+    entry_type: str = "both",
+    workers: int = 1,
+    engine: str = "vectorized",
+    full_rebuild: bool = False,
+    out_dir: Optional[Path] = None,
+    time_tolerance: Optional[int] = None,
+    fuzzy_names: Optional[bool] = None,
+    id_join: Optional[bool] = None,
+    pushdown: Optional[bool] = None,
+) -> Dict[Tuple[str, str, str], Path]:
+    """Atualiza os CSVs de sinais recalculando só os dias afetados por entradas novas/alteradas.
+
+    Cada CSV é refeito por completo quando ``full_rebuild`` é pedido, quando ainda não há
+    manifesto para ele, quando os parâmetros mudaram (leader_share_min, entry_type,
+    tolerância de horário, nomes aproximados e seu score mínimo, junção por id, pushdown,
+    a definição da regra e o conteúdo das tabelas de aliases/identidades em uso no início
+    da execução) ou quando o próprio CSV foi alterado fora deste fluxo. O resultado é o
+    mesmo de uma geração completa.
+    """
+    out_dir = out_dir or settings.DATA_DIR / "signals"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / _MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    ctx = _new_context(workers, time_tolerance=time_tolerance, fuzzy_names=fuzzy_names, id_join=id_join, pushdown=pushdown)
+    run_params = _run_params(ctx, leader_share_min, entry_type)
+    written: Dict[Tuple[str, str, str], Path] = {}
+
+    for source, market, rule in combos:
+        out_path = signals_csv_path(source, market, rule, out_dir)
+        params = {**run_params, "rule": _rule_digest(rule)}
+        previous = manifest["outputs"].get(out_path.name) or {}
+        prev_inputs: Dict[str, dict] = previous.get("inputs", {})
+        paths = _input_paths(source, market)
+        fingerprints = {rel: _fingerprint(p, prev_inputs.get(rel)) for rel, p in paths.items()}
+
+        rebuild = full_rebuild or not previous or previous.get("params") != params or not out_path.exists()
+        if not rebuild and not _same_content(previous.get("output"), _fingerprint(out_path, previous.get("output"))):
+            logger.warning("{} foi alterado fora da geração incremental; refazendo por completo", out_path.name)
+            rebuild = True
+        changed = [rel for rel in fingerprints if not _same_content(fingerprints[rel], prev_inputs.get(rel))]
+        removed = [rel for rel in prev_inputs if rel not in fingerprints]
+
+        if not rebuild and not changed and not removed:
+            logger.info("Sem mudanças nas entradas de {}", out_path.name)
+            previous["inputs"] = {rel: {**fingerprints[rel], "dates": prev_inputs[rel].get("dates", [])} for rel in fingerprints}
+            written[(source, market, rule)] = out_path
+            continue
+
+        dates_now = _input_dates(ctx, source, market)
+        if rebuild:
+            df = generate_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, entry_type=entry_type, engine=engine, context=ctx)
+            write_signals_csv(df, source, market, rule, out_dir)
+        else:
+            affected: Set[str] = set()
+            for rel in changed:
+                affected.update(dates_now.get(rel, []))
+                affected.update(prev_inputs.get(rel, {}).get("dates", []))
+            for rel in removed:
+                affected.update(prev_inputs[rel].get("dates", []))
+            logger.info("{}: {} entradas novas/alteradas, {} removidas -> {} dias a recalcular", out_path.name, len(changed), len(removed), len(affected))
+            if affected:
+                df = generate_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, entry_type=entry_type, engine=engine, context=ctx, dates=affected)
+                merge_signals_csv(df, affected, source, market, rule, out_dir)
+
+        manifest["outputs"][out_path.name] = {
+            "params": params,
+            "inputs": {rel: {**fingerprints[rel], "dates": dates_now.get(rel, [])} for rel in fingerprints},
+            "output": _fingerprint(out_path),
+        }
+        written[(source, market, rule)] = out_path
+        _atomic_write_json(manifest_path, manifest)
+
+    _atomic_write_json(manifest_path, manifest)
+    return written
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from ..config import settings
+from .betfair import RunnerTable
+from .result_cache import _atomic_write_json
+
+
+# Casamento aproximado de nomes Timeform x Betfair. Só entra quando o nome limpo não existe
+# na corrida casada: compara o nome apenas com os corredores dessa corrida (bloqueio por
+# corrida) pelo coeficiente de Dice dos bigramas de caracteres. Pares aceitos viram aliases
+# ((pista, nome Timeform) -> nome Betfair) gravados em data/cache/name_aliases.json e, nas
+# execuções seguintes, são resolvidos por consulta direta, sem recalcular similaridade.
+# O alias vale só na pista em que foi aprendido: o mesmo nome escrito errado pode ser outro
+# cão em outra pista.
+
+ALIAS_CACHE_VERSION = 2
+_NGRAM = 2
+# Vantagem mínima do melhor candidato sobre o segundo (evita "Ledy Star" -> "Lady Moon"/"Lady Star")
+_MIN_MARGIN = 0.05
+
+
+def alias_cache_path() -> Path:
+    return settings.DATA_DIR / "cache" / "name_aliases.json"
+
+
+def _ngrams(name: str) -> FrozenSet[str]:
+    text = f" {name.lower()} "
+    return frozenset(text[i:i + _NGRAM] for i in range(max(1, len(text) - _NGRAM + 1)))
+
+
+def _dice(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+@dataclass
+class NameMatcher:
+    """Índice de bigramas do name_pool de uma RunnerTable + aliases aprendidos (persistidos em disco).
+
+    Os bigramas de todos os nomes da tabela são calculados uma vez, ao criar o matcher;
+    os aliases são indexados por (track_key, nome Timeform).
+    """
+
+    table: RunnerTable
+    min_score: float = 0.75
+    path: Optional[Path] = None
+    aliases: Dict[Tuple[str, str], Tuple[str, float]] = field(default_factory=dict)
+    _grams: List[FrozenSet[str]] = field(default_factory=list, repr=False)
+    _dirty: bool = field(default=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.path = self.path or alias_cache_path()
+        self._grams = [_ngrams(str(name)) for name in self.table.name_pool.tolist()]
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            if isinstance(data, dict) and data.get("version") == ALIAS_CACHE_VERSION:
+                self.aliases = {(str(track), str(name)): (str(matched), float(score)) for track, name, matched, score in data.get("aliases", [])}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Cache de aliases de nomes inválido ({}); recriando: {}", self.path, e)
+
+    def _best(self, name: str, race: int, taken: Sequence[int]) -> Tuple[int, float]:
+        """Melhor corredor (linha na tabela) da corrida para ``name``; -1 abaixo do limiar ou sem folga sobre o 2º."""
+        start, stop = int(self.table.offsets[race]), int(self.table.offsets[race + 1])
+        grams = _ngrams(name)
+        best, best_score, runner_up = -1, 0.0, 0.0
+        for i in range(start, stop):
+            if i in taken:
+                continue
+            score = _dice(grams, self._grams[int(self.table.name_codes[i])])
+            if score > best_score:
+                best, best_score, runner_up = i, score, best_score
+            elif score > runner_up:
+                runner_up = score
+        if best_score < self.min_score or best_score - runner_up < _MIN_MARGIN:
+            return -1, best_score
+        return best, best_score
+
+    def resolve(self, races: np.ndarray, names: np.ndarray) -> Tuple[np.ndarray, Dict[str, float]]:
+        """Troca os nomes (n x 3) sem par exato na corrida ``races[i]`` pelo nome Betfair mais parecido.
+
+        Retorna os nomes resolvidos e as estatísticas da execução (taxas e tempo gasto).
+        """
+        t0 = time.perf_counter()
+        races = np.asarray(races, dtype=np.int64)
+        out = names.copy()
+        runner = np.stack([self.table.runner_positions(races, names[:, j]) for j in range(names.shape[1])], axis=1) if len(names) else np.empty((0, names.shape[1]), dtype=np.int64)
+        has_name = np.vectorize(lambda v: isinstance(v, str) and v != "", otypes=[bool])(names) if names.size else np.zeros(names.shape, dtype=bool)
+        pending = (races[:, None] >= 0) & has_name & (runner < 0)
+        stats = {"names": int(((races[:, None] >= 0) & has_name).sum()), "exact": int(((runner >= 0) & has_name).sum()), "alias": 0, "fuzzy": 0, "unmatched": 0}
+
+        pend_i, pend_j = np.nonzero(pending)
+        tracks = self.table.track_pool[self.table.race_track[races[pend_i]]].tolist() if len(pend_i) else []
+        # Aliases conhecidos na pista: uma única busca vetorizada para todos os pendentes
+        known = [self.aliases.get(key) for key in zip(tracks, names[pend_i, pend_j].tolist())]
+        alias_names = [a[0] if a is not None and a[1] >= self.min_score else "" for a in known]
+        alias_hits = self.table.runner_positions(races[pend_i], alias_names) if len(pend_i) else np.empty(0, dtype=np.int64)
+
+        for i, j, track, alias, hit in zip(pend_i.tolist(), pend_j.tolist(), tracks, alias_names, alias_hits.tolist()):
+            name = names[i, j]
+            taken = [int(r) for r in runner[i] if r >= 0]
+            if hit >= 0 and hit not in taken:
+                out[i, j] = alias
+                runner[i, j] = hit
+                stats["alias"] += 1
+                continue
+            hit, score = self._best(name, int(races[i]), taken)
+            if hit < 0:
+                stats["unmatched"] += 1
+                continue
+            matched = str(self.table.name_pool[self.table.name_codes[hit]])
+            out[i, j] = matched
+            runner[i, j] = hit
+            self.aliases[(track, name)] = (matched, round(score, 4))
+            self._dirty = True
+            stats["fuzzy"] += 1
+
+        total = max(1, stats["names"])
+        stats["match_rate_exact"] = stats["exact"] / total
+        stats["match_rate"] = (stats["exact"] + stats["alias"] + stats["fuzzy"]) / total
+        stats["seconds"] = time.perf_counter() - t0
+        return out, stats
+
+    def save(self) -> None:
+        """Grava os aliases se houve aprendizado nesta execução."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        aliases = [[track, name, matched, score] for (track, name), (matched, score) in self.aliases.items()]
+        _atomic_write_json(self.path, {"version": ALIAS_CACHE_VERSION, "aliases": aliases})
+        self._dirty = False
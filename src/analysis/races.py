@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Tabela de resolução de corridas: cada corrida recebe um id inteiro denso (0..n-1), estável
+# enquanto a tabela existir. A corrida é a chave (track_key, race_iso) derivada de menu_hint e
+# event_dt; os event_id dos arquivos Betfair (diferentes entre WIN e PLACE para a mesma corrida)
+# apontam para ela. Índices e junções internas usam o id; o texto fica só para exibição.
+
+
+@dataclass
+class RaceIndex:
+    track_pool: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    iso_pool: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    race_track: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    race_iso: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    event_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    event_race: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    _keys: Optional[pd.MultiIndex] = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.race_track)
+
+    def _key_index(self) -> pd.MultiIndex:
+        if self._keys is None:
+            self._keys = pd.MultiIndex.from_arrays([self.track_pool[self.race_track], self.iso_pool[self.race_iso]])
+        return self._keys
+
+    def resolve(self, tracks: Sequence[str], isos: Sequence[str]) -> np.ndarray:
+        """Id de cada (track_key, race_iso); -1 para corridas desconhecidas."""
+        if len(self) == 0 or len(tracks) == 0:
+            return np.full(len(tracks), -1, dtype=np.int64)
+        wanted = pd.MultiIndex.from_arrays([np.asarray(tracks, dtype=object), np.asarray(isos, dtype=object)])
+        return self._key_index().get_indexer(wanted).astype(np.int64)
+
+    def by_event(self, event_ids: Sequence[int]) -> np.ndarray:
+        """Id da corrida de cada event_id Betfair (WIN ou PLACE); -1 se desconhecido."""
+        wanted = np.asarray(event_ids, dtype=np.int64)
+        if len(self.event_ids) == 0:
+            return np.full(len(wanted), -1, dtype=np.int64)
+        at = np.minimum(np.searchsorted(self.event_ids, wanted), len(self.event_ids) - 1)
+        return np.where(self.event_ids[at] == wanted, self.event_race[at], -1)
+
+    def keys(self, race_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(track_key, race_iso) de cada id, para exibição; vazio para -1."""
+        race_ids = np.asarray(race_ids, dtype=np.int64)
+        ok = (race_ids >= 0) & (race_ids < len(self))
+        safe = np.where(ok, race_ids, 0)
+        tracks = np.where(ok, self.track_pool[self.race_track[safe]] if len(self) else "", "").astype(object)
+        isos = np.where(ok, self.iso_pool[self.race_iso[safe]] if len(self) else "", "").astype(object)
+        return tracks, isos
+
+    def extend(self, frame: pd.DataFrame) -> np.ndarray:
+        """Registra as corridas de linhas normalizadas (ver normalize_result_frame) e devolve o id de cada linha.
+
+        Corridas novas recebem os próximos ids, na ordem da primeira ocorrência; ids já
+        atribuídos não mudam. Linhas sem pista/horário ficam com -1.
+        """
+        if frame.empty:
+            return np.empty(0, dtype=np.int64)
+        tracks = frame["track_key"].to_numpy(dtype=object)
+        isos = frame["race_iso"].to_numpy(dtype=object)
+        valid = (tracks != "") & (isos != "")
+        ids = self.resolve(tracks, isos)
+        new = valid & (ids < 0)
+        if new.any():
+            fresh = pd.DataFrame({"track": tracks[new], "iso": isos[new]}).drop_duplicates()
+            track_codes, track_pool = pd.factorize(np.concatenate([self.track_pool, fresh["track"].to_numpy(dtype=object)]))
+            iso_codes, iso_pool = pd.factorize(np.concatenate([self.iso_pool, fresh["iso"].to_numpy(dtype=object)]))
+            n_old_t, n_old_i = len(self.track_pool), len(self.iso_pool)
+            self.race_track = np.concatenate([self.race_track, track_codes[n_old_t:]]).astype(np.int32)
+            self.race_iso = np.concatenate([self.race_iso, iso_codes[n_old_i:]]).astype(np.int32)
+            self.track_pool = np.asarray(track_pool, dtype=object)
+            self.iso_pool = np.asarray(iso_pool, dtype=object)
+            self._keys = None
+            ids = self.resolve(tracks, isos)
+        ids = np.where(valid, ids, -1)
+        if "event_id" in frame.columns:
+            events = frame["event_id"].to_numpy(dtype=np.int64)
+            known = (events >= 0) & (ids >= 0)
+            pairs = pd.DataFrame({
+                "event": np.concatenate([self.event_ids, events[known]]),
+                "race": np.concatenate([self.event_race, ids[known]]),
+            }).drop_duplicates("event", keep="first").sort_values("event", kind="mergesort")
+            self.event_ids = pairs["event"].to_numpy(dtype=np.int64)
+            self.event_race = pairs["race"].to_numpy(dtype=np.int64)
+        return ids
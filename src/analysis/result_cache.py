@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+
+
+# Cache em disco de CSVs já normalizados (um Parquet por arquivo-fonte + um consolidado por chave).
+# Cada fonte é validada por (mtime, tamanho); se só o mtime mudou, o hash SHA-1 decide se o
+# conteúdo é o mesmo. Apenas arquivos novos ou alterados são relidos do CSV.
+
+_MANIFEST_NAME = "manifest.json"
+
+
+def cache_dir() -> Path:
+    return settings.DATA_DIR / "cache" / "Result"
+
+
+def file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, dict):
+            data.setdefault("files", {})
+            data.setdefault("consolidated", {})
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Manifesto de cache inválido ({}); recriando: {}", path, e)
+    return {"files": {}, "consolidated": {}}
+
+
+def _tmp_path(path: Path) -> Path:
+    # Um temporário por processo: gravações concorrentes do mesmo arquivo não se atropelam
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def _atomic_write_json(path: Path, data: dict) -> None:
+    tmp = _tmp_path(path)
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _atomic_write_parquet(df: pd.DataFrame, path: Path) -> None:
+    tmp = _tmp_path(path)
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _is_fresh(csv_path: Path, entry: Optional[dict], version: int) -> bool:
+    """Confere a fonte contra o manifesto; atualiza o mtime da entrada se só ele mudou."""
+    if not entry or entry.get("version") != version:
+        return False
+    st = csv_path.stat()
+    if entry.get("size") != st.st_size:
+        return False
+    if entry.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    if entry.get("sha1") == file_sha1(csv_path):
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+    return False
+
+
+def _with_source(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    if not frames:
+        return pd.DataFrame()
+    names = list(frames)
+    out = pd.concat(list(frames.values()), ignore_index=True)
+    codes = np.repeat(np.arange(len(names)), [len(frames[n]) for n in names])
+    out["source_file"] = pd.Categorical.from_codes(codes, categories=names)
+    return out
+
+
+def _parse_with_fingerprint(
+    parse: Callable[[Path], Optional[pd.DataFrame]],
+    path: Path,
+    with_sha1: bool = True,
+) -> Tuple[Optional[pd.DataFrame], dict]:
+    # Fingerprint tirado antes da leitura: se o arquivo mudar durante o parse, a próxima carga o relê
+    st = path.stat()
+    fingerprint = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if with_sha1:
+        fingerprint["sha1"] = file_sha1(path)
+    return parse(path), fingerprint
+
+
+def _parse_many(
+    paths: List[Path],
+    parse: Callable[[Path], Optional[pd.DataFrame]],
+    workers: int,
+    with_sha1: bool = True,
+) -> List[Tuple[Optional[pd.DataFrame], dict]]:
+    """Executa parse em cada arquivo, em paralelo (processos) se workers > 1; preserva a ordem.
+
+    Sem ``with_sha1`` o fingerprint traz só mtime e tamanho (quem não grava cache não paga o hash).
+    """
+    job = partial(_parse_with_fingerprint, parse, with_sha1=with_sha1)
+    if workers <= 1 or len(paths) <= 1:
+        return [job(p) for p in paths]
+    n = min(workers, len(paths))
+    with ProcessPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(job, paths, chunksize=max(1, len(paths) // (n * 4))))
+
+
+def load_frames(
+    paths: List[Path],
+    parse: Callable[[Path], Optional[pd.DataFrame]],
+    key: str,
+    version: int,
+    use_cache: bool = True,
+    workers: int = 1,
+    filters: Optional[list] = None,
+) -> pd.DataFrame:
+    """Concatena parse(path) para cada arquivo (na ordem dada), reaproveitando o cache.
+
+    ``key`` identifica o consolidado (ex.: "win"); ``version`` deve mudar sempre que
+    ``parse`` passar a produzir colunas/valores diferentes. O resultado ganha a coluna
+    categórica ``source_file`` com o nome do arquivo de origem de cada linha.
+    Com ``workers`` > 1 os arquivos a reler são processados em um pool de processos
+    (``parse`` precisa ser uma função de módulo); o resultado não depende de ``workers``.
+    ``filters`` (formato de pd.read_parquet) é aplicado na leitura do consolidado em dia;
+    nos demais caminhos o resultado vem inteiro e o recorte fica com quem chamou.
+    """
+    if not use_cache:
+        parsed_all = _parse_many(paths, parse, workers, with_sha1=False)
+        return _with_source({p.name: df for p, (df, _fp) in zip(paths, parsed_all) if df is not None})
+
+    base = cache_dir()
+    files_dir = base / "files"
+    files_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = base / _MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    entries: Dict[str, dict] = manifest["files"]
+
+    names = [p.name for p in paths]
+    mtimes = {n: (entries.get(n) or {}).get("mtime_ns") for n in names}
+    fresh = {p.name: _is_fresh(p, entries.get(p.name), version) for p in paths}
+    consolidated_path = base / f"{key}.parquet"
+    if all(fresh.values()) and manifest["consolidated"].get(key) == names and consolidated_path.exists():
+        try:
+            out = pd.read_parquet(consolidated_path, filters=filters)
+            # Leitura quente: o manifesto só é regravado se _is_fresh atualizou algum mtime
+            if any(entries[n].get("mtime_ns") != mtimes[n] for n in names):
+                _atomic_write_json(manifest_path, manifest)
+            logger.debug("Cache {}: {} arquivos (consolidado), {} linhas", key, len(names), len(out))
+            return out
+        except Exception as e:
+            logger.warning("Falha ao ler cache consolidado {}: {}", consolidated_path.name, e)
+
+    cached: Dict[str, pd.DataFrame] = {}
+    for p in paths:
+        cached_path = files_dir / f"{p.name}.parquet"
+        if fresh[p.name] and cached_path.exists():
+            try:
+                cached[p.name] = pd.read_parquet(cached_path)
+            except Exception as e:
+                logger.warning("Cache corrompido para {}: {}", p.name, e)
+    pending = [p for p in paths if p.name not in cached]
+    parsed = dict(zip([p.name for p in pending], _parse_many(pending, parse, workers)))
+
+    frames: Dict[str, pd.DataFrame] = {}
+    for p in paths:
+        if p.name in cached:
+            frames[p.name] = cached[p.name]
+            continue
+        df, fingerprint = parsed[p.name]
+        if df is None:
+            entries.pop(p.name, None)
+            continue
+        frames[p.name] = df
+        try:
+            _atomic_write_parquet(df, files_dir / f"{p.name}.parquet")
+            entries[p.name] = {"version": version, **fingerprint}
+        except Exception as e:
+            logger.warning("Falha ao gravar cache de {}: {}", p.name, e)
+            entries.pop(p.name, None)
+
+    out = _with_source(frames)
+    if not out.empty:
+        try:
+            _atomic_write_parquet(out, consolidated_path)
+            manifest["consolidated"][key] = list(frames)
+        except Exception as e:
+            logger.warning("Falha ao gravar cache consolidado {}: {}", consolidated_path.name, e)
+            manifest["consolidated"].pop(key, None)
+    _atomic_write_json(manifest_path, manifest)
+    logger.info("Cache {}: {} arquivos relidos do CSV, {} reaproveitados", key, len(pending), len(cached))
+    return out
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..config import RULE_LABELS, RULE_LABELS_INV
+
+
+# Registro das regras de seleção. Cada regra é uma expressão booleana (sintaxe de
+# DataFrame.eval) sobre as colunas de race_features — por exemplo vol_leader/vol_second/
+# vol_third, leader_share/second_share/third_share, bsp_leader/bsp_second/bsp_third,
+# ratio, pct_diff, total_volume, num_runners — com parâmetros referenciados como @nome.
+# O alvo é o corredor de uma posição no ranking de volume (leader, second ou third).
+
+TARGETS = ("leader", "second", "third")
+
+
+@dataclass(frozen=True)
+class RuleThreshold:
+    """Limiar varrível de uma regra: ``column`` >= @``param`` (ou > com ``strict``).
+
+    ``guard`` é a parte da expressão que não depende do limiar (ex.: "vol_third > 0"); a
+    varredura (src/analysis/sweep.py) aplica a guarda e compara a coluna com cada limiar.
+    """
+
+    param: str
+    column: str
+    strict: bool = False
+    guard: Optional[str] = None
+
+    def guard_mask(self, features: pd.DataFrame) -> np.ndarray:
+        if not self.guard or features.empty:
+            return np.ones(len(features), dtype=bool)
+        return np.asarray(features.eval(self.guard), dtype=bool)
+
+
+@dataclass(frozen=True)
+class SignalRule:
+    name: str
+    label: str
+    target: str
+    expression: str
+    params: Mapping[str, float] = field(default_factory=dict)
+    # Regras antigas que não calculavam a participação do líder gravam 0.0 em leader_volume_share_pct
+    report_leader_share: bool = True
+    # Como varrer o parâmetro principal da regra; None = regra fora da varredura
+    threshold: Optional[RuleThreshold] = None
+
+    def mask(self, features: pd.DataFrame, **params: float) -> np.ndarray:
+        """Corridas que disparam a regra (antes de conferir se o alvo existe no mercado)."""
+        values = {**self.params, **{k: v for k, v in params.items() if k in self.params}}
+        if features.empty:
+            return np.zeros(0, dtype=bool)
+        out = features.eval(self.expression, local_dict={k: float(v) for k, v in values.items()})
+        return np.asarray(out, dtype=bool)
+
+
+RULES: Dict[str, SignalRule] = {}
+
+
+def register_rule(
+    name: str,
+    target: str,
+    expression: str,
+    params: Optional[Mapping[str, float]] = None,
+    label: Optional[str] = None,
+    report_leader_share: bool = True,
+    threshold: Optional[RuleThreshold] = None,
+) -> SignalRule:
+    """Registra (ou substitui) uma regra; CLI e dashboard passam a oferecê-la automaticamente.
+
+    O rótulo vem de ``label`` ou de RULE_LABELS em src/config.py (que tem precedência
+    para as regras já listadas lá). Com ``threshold`` a regra entra na varredura de limiares.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"Alvo inválido para a regra {name}: {target} (use {', '.join(TARGETS)})")
+    if threshold is not None and threshold.param not in (params or {}):
+        raise ValueError(f"Limiar {threshold.param} da regra {name} não está entre os parâmetros")
+    rule = SignalRule(
+        name=name,
+        label=RULE_LABELS.get(name) or label or name,
+        target=target,
+        expression=expression,
+        params=dict(params or {}),
+        report_leader_share=report_leader_share,
+        threshold=threshold,
+    )
+    RULES[name] = rule
+    RULE_LABELS.setdefault(name, rule.label)
+    RULE_LABELS_INV.setdefault(rule.label, name)
+    return rule
+
+
+def get_rule(name: str) -> SignalRule:
+    try:
+        return RULES[name]
+    except KeyError:
+        raise ValueError(f"Regra desconhecida: {name} (registradas: {', '.join(RULES)})") from None
+
+
+def rule_names() -> List[str]:
+    return list(RULES)
+
+
+def sweepable_rules() -> List[str]:
+    """Regras registradas com limiar varrível."""
+    return [name for name, rule in RULES.items() if rule.threshold is not None]
+
+
+def threshold_params() -> List[str]:
+    """Parâmetros de limiar declarados no registro (RuleThreshold.param), na ordem das regras."""
+    params: List[str] = []
+    for rule in RULES.values():
+        if rule.threshold is not None and rule.threshold.param not in params:
+            params.append(rule.threshold.param)
+    return params
+
+
+def evaluate_rules(features: pd.DataFrame, names: Optional[Iterable[str]] = None, **params: float) -> Dict[str, np.ndarray]:
+    """Máscaras de todas as regras pedidas sobre a mesma tabela de atributos por corrida."""
+    return {name: get_rule(name).mask(features, **params) for name in (names if names is not None else RULES)}
+
+
+register_rule(
+    "terceiro_queda50",
+    target="third",
+    expression="vol_third > 0 and pct_diff > @drop_min",
+    params={"drop_min": 0.5},
+    report_leader_share=False,
+    threshold=RuleThreshold("drop_min", "pct_diff", strict=True, guard="vol_third > 0"),
+)
+register_rule(
+    "lider_volume_total",
+    target="leader",
+    expression="leader_share >= @leader_share_min",
+    params={"leader_share_min": 0.5},
+    threshold=RuleThreshold("leader_share_min", "leader_share"),
+)
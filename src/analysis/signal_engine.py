@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.text import clean_horse_names
+from .betfair import RunnerTable
+from .rules import TARGETS, get_rule
+
+
+# Mesmos parâmetros de _calc_signals_for_race
+STAKE_FIX10 = 10.00
+LIABILITY_FIX10 = 10.00
+COMMISSION_RATE = 0.065
+
+_NAME_COLUMNS = ["name_1", "name_2", "name_3"]
+# Nomes originais do Timeform quando name_1..3 foram trocados pelo casamento aproximado
+_TF_NAME_COLUMNS = ["tf_name_1", "tf_name_2", "tf_name_3"]
+# selection_id da tabela de identidade (SignalContext com id_join)
+_ID_COLUMNS = ["sel_id_1", "sel_id_2", "sel_id_3"]
+
+# Alvos possíveis das regras: posição no ranking de volume (0 = líder)
+_TARGET_RANKS = {target: rank for rank, target in enumerate(TARGETS)}
+
+
+def _py_max(values: np.ndarray, floor: float) -> np.ndarray:
+    """max(floor, v) elemento a elemento com a semântica do Python (NaN vira floor)."""
+    return np.where(values > floor, values, floor)
+
+
+def _py_round(values: np.ndarray, ndigits: int) -> np.ndarray:
+    # round() do Python (arredondamento exato do decimal), não np.round, para a saída bater byte a byte
+    return np.array([round(v, ndigits) for v in values.tolist()], dtype=np.float64)
+
+
+# Casas decimais das colunas numéricas do CSV de sinais; arredondadas uma única vez, nas linhas finais
+_ROUNDED_COLUMNS = {
+    "ratio_second_over_third": 2,
+    "pct_diff_second_vs_third": 2,
+    "leader_volume_share_pct": 2,
+    "back_target_bsp": 2,
+    "lay_target_bsp": 2,
+    "liability_from_stake_fixed_10": 2,
+    "stake_for_liability_10": 2,
+    "pnl_stake_fixed_10": 2,
+    "pnl_liability_fixed_10": 2,
+    "roi_row_stake_fixed_10": 4,
+    "roi_row_liability_fixed_10": 4,
+}
+
+
+def _sequential_race_totals(table: RunnerTable, races: np.ndarray) -> np.ndarray:
+    """Soma max(0, pptradedvol) por corrida, somando na ordem dos corredores como o laço original."""
+    starts = table.offsets[races]
+    counts = table.offsets[races + 1] - starts
+    totals = np.zeros(len(races), dtype=np.float64)
+    for j in range(int(counts.max()) if len(counts) else 0):
+        has = counts > j
+        vols = table.pptradedvol[starts[has] + j]
+        totals[has] += _py_max(vols, 0.0)
+    return totals
+
+
+def _vol_for(raw: pd.Series, names: np.ndarray, vols: np.ndarray) -> np.ndarray:
+    """Volume do primeiro trio cujo nome é clean(raw); 0.0 quando raw não é texto ou não casa."""
+    is_text = raw.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    cleaned = clean_horse_names(raw.where(is_text, "").astype(str)).to_numpy(dtype=object)
+    cleaned[~is_text] = ""
+    matches = [names[:, j] == cleaned for j in range(names.shape[1])]
+    return np.select(matches, [vols[:, j] for j in range(vols.shape[1])], default=0.0)
+
+
+def _runner_by_id(bf_win: RunnerTable, race: np.ndarray, ids: np.ndarray, names: np.ndarray) -> np.ndarray:
+    """Linha do corredor pela chave inteira (corrida, selection_id); pelo nome só onde o id não resolve."""
+    runner = bf_win.runner_positions_by_id(race, ids)
+    missing = np.flatnonzero((runner < 0) & (race >= 0))
+    if len(missing):
+        runner[missing] = bf_win.runner_positions(race[missing], names[missing])
+    return runner
+
+
+def _target_outcome(
+    feats: Dict[str, np.ndarray],
+    tf: pd.DataFrame,
+    bf_win: RunnerTable,
+    bf_place: Optional[RunnerTable],
+    market: str,
+    rank: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(encontrado, win_lose, odd) do alvo de posição ``rank`` por volume, no mercado pedido."""
+    n = len(feats["race"])
+    if market == "place" and bf_place is not None:
+        if bf_place.race_id is not None and bf_win.race_id is not None:
+            # Mesma RaceIndex nos dois mercados: junção pelo id inteiro da corrida WIN
+            place_race = bf_place.positions_by_race_id(bf_win.race_id[feats["race"]])
+        else:
+            rows = feats["tf_row"]
+            place_race = bf_place.positions(tf["track_key"].to_numpy(dtype=object)[rows], tf["race_iso"].to_numpy(dtype=object)[rows])
+        if feats["use_ids"]:
+            ids = bf_win.selection_id[feats["runner_s"][:, rank]] if len(bf_win.selection_id) else np.full(n, -1, dtype=np.int64)
+            place_runner = _runner_by_id(bf_place, place_race, ids, feats["names_s"][:, rank])
+        else:
+            place_runner = bf_place.runner_positions(place_race, feats["names_s"][:, rank])
+        found = place_runner >= 0
+        safe = np.where(found, place_runner, 0)
+        win_lose = bf_place.win_lose[safe].astype(np.int64) if len(bf_place.win_lose) else np.zeros(n, dtype=np.int64)
+        odd = bf_place.bsp[safe] if len(bf_place.bsp) else np.full(n, np.nan)
+        return found, win_lose, odd
+    runner = feats["runner_s"][:, rank]
+    return np.ones(n, dtype=bool), bf_win.win_lose[runner].astype(np.int64), feats["bsps_s"][:, rank]
+
+
+def _race_arrays(tf: pd.DataFrame, bf_win: RunnerTable) -> Dict[str, np.ndarray]:
+    # Junta Timeform -> corrida -> corredores do WIN (seleção por volume sempre no WIN)
+    n_tf = len(tf)
+    if n_tf and "race_id" in tf.columns and bf_win.race_id is not None:
+        race = bf_win.positions_by_race_id(tf["race_id"].to_numpy(dtype=np.int64))
+    elif n_tf:
+        race = bf_win.positions(tf["track_key"].to_numpy(dtype=object), tf["race_iso"].to_numpy(dtype=object))
+    else:
+        race = np.empty(0, dtype=np.int64)
+    names = np.stack([tf[c].to_numpy(dtype=object) for c in _NAME_COLUMNS], axis=1) if n_tf else np.empty((0, 3), dtype=object)
+    use_ids = set(_ID_COLUMNS) <= set(tf.columns)
+    if n_tf and use_ids:
+        runner = np.stack([_runner_by_id(bf_win, race, tf[_ID_COLUMNS[j]].to_numpy(dtype=np.int64), names[:, j]) for j in range(3)], axis=1)
+    elif n_tf:
+        runner = np.stack([bf_win.runner_positions(race, names[:, j]) for j in range(3)], axis=1)
+    else:
+        runner = np.empty((0, 3), dtype=np.int64)
+    found = (race >= 0) & (runner >= 0).all(axis=1)
+    found[found] = ~np.isnan(bf_win.bsp[runner[found]]).any(axis=1)
+
+    rows = np.flatnonzero(found)
+    race, names, runner = race[rows], names[rows], runner[rows]
+    vols = _py_max(bf_win.pptradedvol[runner], 0.0)
+
+    # Ordena os três por volume desc (estável: empates mantêm a ordem do Timeform)
+    order = np.argsort(-vols, axis=1, kind="stable")
+    runner_s = np.take_along_axis(runner, order, axis=1)
+    vols_s = np.take_along_axis(vols, order, axis=1)
+    vol2, vol3 = vols_s[:, 1], vols_s[:, 2]
+    totals = _sequential_race_totals(bf_win, race)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_diff = np.where(vol2 > 0, (vol2 - vol3) / np.where(vol2 > 0, vol2, 1.0), np.inf)
+        ratio = np.where(vol3 > 0, vol2 / np.where(vol3 > 0, vol3, 1.0), np.inf)
+        shares = np.where(totals[:, None] > 0, vols_s / np.where(totals > 0, totals, 1.0)[:, None], 0.0)
+    return {
+        "tf_row": rows,
+        "race": race,
+        "names": names,
+        "vols": vols,
+        "names_s": np.take_along_axis(names, order, axis=1),
+        "vols_s": vols_s,
+        "bsps_s": bf_win.bsp[runner_s],
+        "runner_s": runner_s,
+        "ratio": ratio,
+        "pct_diff": pct_diff,
+        "total_volume": totals,
+        "leader_share": shares[:, 0],
+        "shares_s": shares,
+        "use_ids": use_ids,
+    }
+
+
+def race_features(tf: pd.DataFrame, bf_win: RunnerTable, bf_place: Optional[RunnerTable] = None, market: str = "win") -> pd.DataFrame:
+    """Atributos por corrida usados pelas regras, uma linha por linha do Timeform com os 3 nomes no WIN.
+
+    Volumes/BSP vêm sempre do WIN; o resultado (win_lose) e a odd dos alvos possíveis
+    (líder, 2º e 3º por volume) vêm do mercado pedido. ``tf_row`` aponta para a linha de ``tf``.
+    """
+    feats = _race_arrays(tf, bf_win)
+    n = len(feats["race"])
+    out = pd.DataFrame({
+        "tf_row": feats["tf_row"],
+        "race": feats["race"],
+        "vol_1": feats["vols"][:, 0],
+        "vol_2": feats["vols"][:, 1],
+        "vol_3": feats["vols"][:, 2],
+        "leader_name": feats["names_s"][:, 0],
+        "second_name": feats["names_s"][:, 1],
+        "third_name": feats["names_s"][:, 2],
+        "vol_leader": feats["vols_s"][:, 0],
+        "vol_second": feats["vols_s"][:, 1],
+        "vol_third": feats["vols_s"][:, 2],
+        "bsp_leader": feats["bsps_s"][:, 0],
+        "bsp_second": feats["bsps_s"][:, 1],
+        "bsp_third": feats["bsps_s"][:, 2],
+        "ratio": feats["ratio"],
+        "pct_diff": feats["pct_diff"],
+        "total_volume": feats["total_volume"],
+        "leader_share": feats["leader_share"],
+        "second_share": feats["shares_s"][:, 1],
+        "third_share": feats["shares_s"][:, 2],
+        "num_runners": bf_win.num_runners[feats["race"]].astype(np.int64) if n else np.empty(0, dtype=np.int64),
+    })
+    for prefix, rank in _TARGET_RANKS.items():
+        found, win_lose, odd = _target_outcome(feats, tf, bf_win, bf_place, market, rank)
+        out[f"{prefix}_found"] = found
+        out[f"{prefix}_win_lose"] = win_lose
+        out[f"{prefix}_odd"] = odd
+    return out
+
+
+def entry_outcomes(odd: np.ndarray, win_lose: np.ndarray) -> Dict[str, np.ndarray]:
+    """PnL/ROI (sem arredondar) das entradas back e lay sobre um alvo, como em _calc_signals_for_race."""
+    # Stake/liability fixas e comissão sobre ganhos
+    gain = _py_max(odd - 1.0, 0.0)
+    green = win_lose == 1
+    liability_from_stake = STAKE_FIX10 * gain
+    stake_from_liab = LIABILITY_FIX10 / _py_max(odd - 1.0, 0.001)
+    lay_pnl_stake = np.where(green, -liability_from_stake, STAKE_FIX10 * (1.0 - COMMISSION_RATE))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lay_roi_stake = np.where(liability_from_stake > 0, lay_pnl_stake / np.where(liability_from_stake > 0, liability_from_stake, 1.0), 0.0)
+    return {
+        "back_green": green,
+        "back_pnl_stake": np.where(green, (STAKE_FIX10 * gain) * (1.0 - COMMISSION_RATE), -STAKE_FIX10),
+        "lay_green": ~green,
+        "lay_liability_from_stake": liability_from_stake,
+        "lay_stake_from_liability": stake_from_liab,
+        "lay_pnl_stake": lay_pnl_stake,
+        "lay_pnl_liability": np.where(green, -LIABILITY_FIX10, stake_from_liab * (1.0 - COMMISSION_RATE)),
+        "lay_roi_stake": lay_roi_stake,
+    }
+
+
+def compute_signals_frame(
+    tf: pd.DataFrame,
+    bf_win: RunnerTable,
+    bf_place: Optional[RunnerTable] = None,
+    market: str = "win",
+    rule: str = "terceiro_queda50",
+    leader_share_min: float = 0.5,
+    entry_type: str = "both",
+    features: Optional[pd.DataFrame] = None,
+    params: Optional[Mapping[str, float]] = None,
+) -> pd.DataFrame:
+    """Calcula os sinais de todas as corridas de uma vez (equivalente ao laço com _calc_signals_for_race).
+
+    ``tf`` vem de load_timeform_top3_frame/load_timeform_forecast_frame: chaves
+    (track_key, race_iso), nomes limpos name_1..3 e os valores brutos de saída
+    (track_name, TimeformTop1..3). A ordem das linhas (e back antes de lay) é a mesma
+    do laço, então o CSV ordenado em write_signals_csv sai idêntico. ``rule`` é um nome do
+    registro em rules.py; ``leader_share_min`` e ``params`` sobrepõem os parâmetros da regra.
+    ``features`` permite reaproveitar race_features(tf, ...) já calculado para o mesmo mercado.
+    """
+    if tf.empty or len(bf_win) == 0:
+        return pd.DataFrame([])
+    feats = features if features is not None else race_features(tf, bf_win, bf_place, market=market)
+
+    spec = get_rule(rule)
+    target = spec.target
+    keep = spec.mask(feats, leader_share_min=leader_share_min, **(params or {})) & feats[f"{target}_found"].to_numpy()
+
+    sel = feats[keep]
+    if sel.empty:
+        return pd.DataFrame([])
+    rows = sel["tf_row"].to_numpy()
+    names = tf[_TF_NAME_COLUMNS if set(_TF_NAME_COLUMNS) <= set(tf.columns) else _NAME_COLUMNS].to_numpy(dtype=object)[rows]
+    vols = sel[["vol_1", "vol_2", "vol_3"]].to_numpy(dtype=np.float64)
+    names_s = sel[["leader_name", "second_name", "third_name"]].to_numpy(dtype=object)
+    ratio = sel["ratio"].to_numpy()
+    pct_diff = sel["pct_diff"].to_numpy()
+    leader_share = sel["leader_share"].to_numpy() if spec.report_leader_share else np.zeros(len(sel), dtype=np.float64)
+    target_name = sel[f"{target}_name"].to_numpy(dtype=object)
+    win_lose = sel[f"{target}_win_lose"].to_numpy()
+    odd = sel[f"{target}_odd"].to_numpy()
+
+    outcome = entry_outcomes(odd, win_lose)
+    green = outcome["back_green"]
+    back_pnl = outcome["back_pnl_stake"]
+    liability_from_stake = outcome["lay_liability_from_stake"]
+    stake_from_liab = outcome["lay_stake_from_liability"]
+    lay_pnl_stake = outcome["lay_pnl_stake"]
+    lay_pnl_liab = outcome["lay_pnl_liability"]
+    lay_roi_stake = outcome["lay_roi_stake"]
+
+    n = len(sel)
+    out_tf = tf.iloc[rows]
+    race_iso = out_tf["race_iso"].astype(str)
+    base: Dict[str, object] = {
+        "date": race_iso.str.split("T", n=1).str[0].to_numpy(dtype=object),
+        "track_name": out_tf["track_name"].to_numpy(dtype=object),
+        "race_time_iso": race_iso.to_numpy(dtype=object),
+        "tf_top1": out_tf["TimeformTop1"].to_numpy(dtype=object),
+        "tf_top2": out_tf["TimeformTop2"].to_numpy(dtype=object),
+        "tf_top3": out_tf["TimeformTop3"].to_numpy(dtype=object),
+        "vol_top1": _vol_for(out_tf["TimeformTop1"], names, vols),
+        "vol_top2": _vol_for(out_tf["TimeformTop2"], names, vols),
+        "vol_top3": _vol_for(out_tf["TimeformTop3"], names, vols),
+        "second_name_by_volume": names_s[:, 1],
+        "third_name_by_volume": names_s[:, 2],
+        "ratio_second_over_third": ratio,
+        "pct_diff_second_vs_third": pct_diff * 100.0,
+        "leader_name_by_volume": names_s[:, 0],
+        "leader_volume_share_pct": leader_share * 100.0,
+        "num_runners": sel["num_runners"].to_numpy(dtype=np.int64),
+        "market": market,
+        "rule": rule,
+        "rule_label": spec.label,
+    }
+    zeros = np.zeros(n, dtype=np.float64)
+    nans = np.full(n, np.nan)
+    blanks = np.full(n, "", dtype=object)
+    back = {
+        "entry_type": "back",
+        "back_target_name": target_name,
+        "back_target_bsp": odd,
+        "lay_target_name": blanks,
+        "lay_target_bsp": nans,
+        "stake_fixed_10": round(STAKE_FIX10, 2),
+        "liability_from_stake_fixed_10": zeros,
+        "stake_for_liability_10": zeros,
+        "liability_fixed_10": zeros,
+        "win_lose": win_lose,
+        "is_green": green,
+        "pnl_stake_fixed_10": back_pnl,
+        "pnl_liability_fixed_10": zeros,
+        "roi_row_stake_fixed_10": back_pnl / STAKE_FIX10,
+        "roi_row_liability_fixed_10": zeros,
+    }
+    lay = {
+        "entry_type": "lay",
+        "back_target_name": blanks,
+        "back_target_bsp": nans,
+        "lay_target_name": target_name,
+        "lay_target_bsp": odd,
+        "stake_fixed_10": round(STAKE_FIX10, 2),
+        "liability_from_stake_fixed_10": liability_from_stake,
+        "stake_for_liability_10": stake_from_liab,
+        "liability_fixed_10": round(LIABILITY_FIX10, 2),
+        "win_lose": win_lose,
+        "is_green": ~green,
+        "pnl_stake_fixed_10": lay_pnl_stake,
+        "pnl_liability_fixed_10": lay_pnl_liab,
+        "roi_row_stake_fixed_10": lay_roi_stake,
+        "roi_row_liability_fixed_10": lay_pnl_liab / LIABILITY_FIX10,
+    }
+
+    parts: List[pd.DataFrame] = []
+    for name, entry in (("back", back), ("lay", lay)):
+        if entry_type in ("both", name):
+            parts.append(pd.DataFrame({**base, **entry}, index=np.arange(n)))
+    # Intercala back/lay por corrida (mesma ordem de linhas do laço)
+    df = pd.concat(parts).sort_index(kind="stable").reset_index(drop=True)
+    for column, ndigits in _ROUNDED_COLUMNS.items():
+        df[column] = _py_round(df[column].to_numpy(dtype=np.float64), ndigits)
+    return df
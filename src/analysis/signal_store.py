@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+from .result_cache import _atomic_write_json, _atomic_write_parquet
+
+
+# Armazenamento normalizado dos CSVs de sinais: cada corrida gera uma linha back e uma lay que
+# repetem as mesmas ~20 colunas (nomes, volumes, razões, participação). Aqui elas ficam uma vez
+# na tabela de corridas e só os campos da entrada (alvo, BSP, stakes, PnL) ficam na de entradas,
+# ligada à corrida por ``race_id``. As duas tabelas ficam em Parquet ao lado do CSV
+# (signals_*.races.parquet / signals_*.entries.parquet) e join_signals remonta a visão larga,
+# com as mesmas colunas e a mesma ordem do CSV. São uma cópia: o CSV continua sendo o formato
+# armazenado, então o disco cresce o tamanho das tabelas (~31% do CSV nos dados de exemplo).
+#
+# Dataset particionado por data: o mesmo CSV em data/signals/dataset/<nome do CSV>/date=AAAA-MM-DD/
+# (Parquet tipado, um arquivo por dia), para que o dashboard leia só os dias e as colunas que
+# exibe. _source.json guarda o tamanho/mtime do CSV de origem, as colunas e os dias gravados.
+
+SIGNAL_ENTRY_COLUMNS = [
+    "entry_type",
+    "back_target_name", "back_target_bsp", "lay_target_name", "lay_target_bsp",
+    "stake_fixed_10", "liability_from_stake_fixed_10", "stake_for_liability_10", "liability_fixed_10",
+    "win_lose", "is_green",
+    "pnl_stake_fixed_10", "pnl_liability_fixed_10", "roi_row_stake_fixed_10", "roi_row_liability_fixed_10",
+]
+
+# Colunas que o dashboard usa (só elas são lidas do dataset por data)
+DASHBOARD_SIGNAL_COLUMNS = [
+    "date", "track_name", "race_time_iso",
+    "tf_top1", "tf_top2", "tf_top3",
+    "vol_top1", "vol_top2", "vol_top3",
+    "second_name_by_volume", "third_name_by_volume",
+    "pct_diff_second_vs_third", "leader_volume_share_pct", "num_runners",
+    "entry_type", "back_target_name", "back_target_bsp", "lay_target_name", "lay_target_bsp",
+    "stake_fixed_10", "liability_from_stake_fixed_10", "stake_for_liability_10", "liability_fixed_10",
+    "win_lose", "is_green", "pnl_stake_fixed_10", "pnl_liability_fixed_10",
+    "roi_row_stake_fixed_10", "roi_row_liability_fixed_10",
+]
+
+
+def normalized_paths(csv_path: Path) -> Tuple[Path, Path]:
+    """(corridas, entradas) do CSV de sinais ``csv_path``."""
+    return csv_path.with_suffix(".races.parquet"), csv_path.with_suffix(".entries.parquet")
+
+
+def _race_starts(races: pd.DataFrame) -> np.ndarray:
+    """Linhas em que começa uma corrida: algum campo de corrida difere da linha anterior (NaN == NaN)."""
+    n = len(races)
+    starts = np.zeros(n, dtype=bool)
+    if n == 0:
+        return starts
+    starts[0] = True
+    for col in races.columns:
+        values = races[col]
+        prev = values.shift(1)
+        starts[1:] |= ((values != prev) & ~(values.isna() & prev.isna())).to_numpy()[1:]
+    return starts
+
+
+def split_signals(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Separa um frame de sinais (largo) em (corridas, entradas).
+
+    Linhas consecutivas com os mesmos campos de corrida (back + lay da mesma corrida) viram
+    uma corrida; a ordem das linhas é preservada. A ordem original das colunas vai em
+    ``attrs["columns"]`` da tabela de corridas.
+    """
+    entry_cols = [c for c in df.columns if c in SIGNAL_ENTRY_COLUMNS]
+    race_cols = [c for c in df.columns if c not in SIGNAL_ENTRY_COLUMNS]
+    starts = _race_starts(df[race_cols])
+    races = df.loc[starts, race_cols].reset_index(drop=True)
+    entries = df[entry_cols].reset_index(drop=True)
+    entries.insert(0, "race_id", (np.cumsum(starts) - 1).astype(np.int32))
+    races.attrs["columns"] = list(df.columns)
+    return races, entries
+
+
+def join_signals(races: pd.DataFrame, entries: pd.DataFrame) -> pd.DataFrame:
+    """Visão larga (uma linha por entrada, colunas do CSV) a partir das duas tabelas."""
+    columns = list(races.attrs.get("columns") or [*races.columns, *entries.columns.drop("race_id")])
+    wide = races.iloc[entries["race_id"].to_numpy(dtype=np.int64)].reset_index(drop=True)
+    wide = pd.concat([wide, entries.drop(columns="race_id")], axis=1)
+    wide.attrs = {}
+    return wide[columns]
+
+
+def write_normalized_signals(csv_path: Path) -> Tuple[Path, Path]:
+    """Grava as tabelas normalizadas do CSV de sinais já gravado em ``csv_path``.
+
+    Parte do próprio CSV (relido como o dashboard o lê) para que a visão larga tenha os
+    mesmos tipos de pd.read_csv.
+    """
+    df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+    races, entries = split_signals(df)
+    races_path, entries_path = normalized_paths(csv_path)
+    _atomic_write_parquet(races, races_path)
+    _atomic_write_parquet(entries, entries_path)
+    logger.debug("Sinais normalizados: {} ({} corridas, {} entradas)", csv_path.name, len(races), len(entries))
+    return races_path, entries_path
+
+
+def load_normalized_signals(csv_path: Path) -> Optional[pd.DataFrame]:
+    """Visão larga das tabelas normalizadas de ``csv_path``; None se faltam ou são mais antigas que o CSV."""
+    races_path, entries_path = normalized_paths(csv_path)
+    try:
+        csv_mtime = csv_path.stat().st_mtime_ns
+        if races_path.stat().st_mtime_ns < csv_mtime or entries_path.stat().st_mtime_ns < csv_mtime:
+            return None
+        return join_signals(pd.read_parquet(races_path), pd.read_parquet(entries_path))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Falha ao ler sinais normalizados de {}: {}", csv_path.name, e)
+        return None
+
+
+_DATASET_SOURCE = "_source.json"
+
+
+def signals_dataset_dir(csv_path: Path) -> Path:
+    return csv_path.parent / "dataset" / csv_path.stem
+
+
+def write_signals_dataset(csv_path: Path) -> Path:
+    """Regrava o dataset por data do CSV de sinais ``csv_path`` (troca o diretório inteiro ao final)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+    out_dir = signals_dataset_dir(csv_path)
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    dates: List[str] = []
+    if not df.empty:
+        # Um único schema para todas as partições (colunas vazias em um dia mantêm o tipo)
+        table = pa.Table.from_pandas(df.drop(columns="date"), preserve_index=False)
+        for date, rows in df.groupby("date", sort=True).indices.items():
+            part_dir = tmp_dir / f"date={date}"
+            part_dir.mkdir()
+            pq.write_table(table.take(pa.array(rows)), part_dir / "part-0.parquet")
+            dates.append(str(date))
+    st = csv_path.stat()
+    _atomic_write_json(tmp_dir / _DATASET_SOURCE, {
+        "csv": {"size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        "columns": list(df.columns),
+        "dates": dates,
+    })
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    if out_dir.exists():
+        shutil.rmtree(old_dir, ignore_errors=True)
+        out_dir.rename(old_dir)
+    tmp_dir.rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.debug("Dataset de sinais: {} ({} dias, {} linhas)", out_dir.name, len(dates), len(df))
+    return out_dir
+
+
+def _dataset_source(csv_path: Path) -> Optional[dict]:
+    """Metadados do dataset de ``csv_path``; None se não existe ou não corresponde ao CSV atual."""
+    try:
+        with open(signals_dataset_dir(csv_path) / _DATASET_SOURCE, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        st = csv_path.stat()
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get("csv") != {"size": st.st_size, "mtime_ns": st.st_mtime_ns}:
+        return None
+    return meta
+
+
+def signals_dataset_dates(csv_path: Path) -> Optional[List[str]]:
+    """Dias (AAAA-MM-DD, em ordem) do dataset em dia com ``csv_path``; None se não há dataset válido."""
+    meta = _dataset_source(csv_path)
+    return None if meta is None else list(meta["dates"])
+
+
+def load_signals_dataset(
+    csv_path: Path,
+    dates: Optional[Iterable[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """Linhas de ``csv_path`` lidas do dataset, só dos dias ``dates`` e das colunas ``columns``.
+
+    Só os arquivos dos dias pedidos são lidos, e deles só as colunas pedidas; o resultado
+    tem a ordem de linhas e colunas do CSV (restrita a ``columns``). None se não há dataset em
+    dia com o CSV.
+    """
+    meta = _dataset_source(csv_path)
+    if meta is None:
+        return None
+    wanted = [c for c in meta["columns"] if columns is None or c in columns]
+    days = list(meta["dates"]) if dates is None else [d for d in meta["dates"] if d in set(dates)]
+    if not days:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in wanted})
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    base = signals_dataset_dir(csv_path)
+    read_cols = [c for c in wanted if c != "date"]
+    try:
+        # Poda das partições pelos metadados: só os arquivos dos dias pedidos são abertos
+        tables = [pq.ParquetFile(base / f"date={day}" / "part-0.parquet").read(columns=read_cols) for day in days]
+        df = pa.concat_tables(tables).to_pandas()
+    except Exception as e:
+        logger.warning("Falha ao ler o dataset de {}: {}", csv_path.name, e)
+        return None
+    if "date" in wanted:
+        df["date"] = np.repeat(np.asarray(days, dtype=object), [t.num_rows for t in tables])
+    return df[wanted]
@@ -1,47 +1,44 @@
 from __future__ import annotations
 
+import io
+import os
 import re
-from dataclasses import dataclass
+import sqlite3
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
 
+import numpy as np
 import pandas as pd
-from dateutil import parser as date_parser
 from loguru import logger
 
 from ..config import settings
 from ..config import RULE_LABELS
-from ..utils.text import clean_horse_name, normalize_track_name
-
-
-_TRAP_PREFIX_RE = re.compile(r"^\s*\d+\.\s*")
+from ..utils.text import clean_horse_name_cached, clean_horse_names, name_cache_stats, normalize_track_name_cached, normalize_track_names
+from .betfair import (
+    RaceFilter,
+    RunnerBF,
+    RunnerTable,
+    _extract_track_from_menu_hint,
+    _strip_trap_prefix,
+    _to_iso_yyyy_mm_dd_thh_mm,
+    load_betfair_results,
+    load_normalized_results,
+)
+from .feature_store import FEATURES_CODE, _input_paths, code_digest, load_or_build, load_race_table, race_table
+from .identity import SelectionIdentity, matched_pairs
+from .races import RaceIndex
+from .name_match import NameMatcher
+from .rules import get_rule
+from .signal_engine import compute_signals_frame, race_features
+from .signal_store import write_normalized_signals, write_signals_dataset
+from . import sqlite_store
 
 
 def _ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def _strip_trap_prefix(name: str) -> str:
-    return _TRAP_PREFIX_RE.sub("", name or "").strip()
-
-
-def _extract_track_from_menu_hint(menu_hint: str) -> str:
-    # Pega trecho inicial até o primeiro dígito (ex.: "Romford 19th Sep" -> "Romford")
-    text = menu_hint or ""
-    m = re.match(r"^([A-Za-z\s]+?)(?:\s*\d|$)", text)
-    base = m.group(1) if m else text
-    return normalize_track_name(base)
-
-
-def _to_iso_yyyy_mm_dd_thh_mm(value: str) -> str:
-    # event_dt exemplo: "19-09-2025 20:01"
-    try:
-        dt = date_parser.parse(value, dayfirst=True)
-        return dt.strftime("%Y-%m-%dT%H:%M")
-    except Exception:
-        return ""
-
-
 def _parse_forecast_top3(text: str) -> List[str]:
     """Extrai apenas os 3 primeiros nomes previstos da string TimeformForecast.
 
@@ -64,7 +61,7 @@ def _parse_forecast_top3(text: str) -> List[str]:
             # remove odds entre parênteses no final (ex.: Nome A (2/1))
             candidate = re.sub(r"\s*\([^\)]*\)\s*$", "", p).strip()
         candidate = _strip_trap_prefix(candidate)
-        cleaned = clean_horse_name(candidate)
+        cleaned = clean_horse_name_cached(candidate)
         if cleaned and cleaned not in names:
             names.append(cleaned)
         if len(names) >= 3:
@@ -72,129 +69,45 @@ def _parse_forecast_top3(text: str) -> List[str]:
     return names
 
 
-@dataclass
-class RunnerBF:
-    selection_name_raw: str
-    selection_name_clean: str
-    pptradedvol: float
-    bsp: float
-    win_lose: int
-
-
-def load_betfair_win() -> Dict[Tuple[str, str], Dict[str, RunnerBF]]:
+def load_betfair_win(workers: int = 1) -> RunnerTable:
     """Carrega todos os CSVs dwbfgreyhoundwin*.csv e indexa por (track_key, race_iso)."""
-    result_dir = settings.DATA_DIR / "Result"
-    all_files = sorted(result_dir.glob("dwbfgreyhoundwin*.csv"))
-    index: Dict[Tuple[str, str], Dict[str, RunnerBF]] = {}
-
-    for csv_path in all_files:
-        try:
-            df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
-        except Exception as e:
-            logger.error("Falha ao ler {}: {}", csv_path.name, e)
-            continue
-
-        # Garante colunas
-        for col in ["menu_hint", "event_dt", "selection_name", "pptradedvol", "bsp", "win_lose"]:
-            if col not in df.columns:
-                df[col] = ""
-
-        # Limpeza e normalização
-        df["track_key"] = df["menu_hint"].astype(str).map(_extract_track_from_menu_hint)
-        df["race_iso"] = df["event_dt"].astype(str).map(_to_iso_yyyy_mm_dd_thh_mm)
-        df["selection_name_raw"] = df["selection_name"].astype(str)
-        df["selection_name_clean"] = df["selection_name_raw"].map(_strip_trap_prefix).map(clean_horse_name)
-        df["pptradedvol"] = pd.to_numeric(df["pptradedvol"], errors="coerce").fillna(0.0)
-        df["bsp"] = pd.to_numeric(df["bsp"], errors="coerce")
-        df["win_lose"] = pd.to_numeric(df["win_lose"], errors="coerce").fillna(0).astype(int)
-
-        for (track_key, race_iso), grp in df.groupby(["track_key", "race_iso" ], dropna=False):
-            if not track_key or not race_iso:
-                continue
-            runners: Dict[str, RunnerBF] = index.setdefault((track_key, race_iso), {})
-            for _, r in grp.iterrows():
-                name_clean = r["selection_name_clean"]
-                if not isinstance(name_clean, str) or not name_clean:
-                    continue
-                runners[name_clean] = RunnerBF(
-                    selection_name_raw=r["selection_name_raw"],
-                    selection_name_clean=name_clean,
-                    pptradedvol=float(r["pptradedvol"]),
-                    bsp=float(r["bsp"]) if pd.notna(r["bsp"]) else float("nan"),
-                    win_lose=int(r["win_lose"]),
-                )
-
-    logger.info("Betfair WIN index criado: {} corridas", len(index))
-    return index
+    return load_betfair_results("win", workers=workers)
 
 
-def load_betfair_place() -> Dict[Tuple[str, str], Dict[str, RunnerBF]]:
+def load_betfair_place(workers: int = 1) -> RunnerTable:
     """Carrega todos os CSVs dwbfgreyhoundplace*.csv e indexa por (track_key, race_iso)."""
-    result_dir = settings.DATA_DIR / "Result"
-    all_files = sorted(result_dir.glob("dwbfgreyhoundplace*.csv"))
-    index: Dict[Tuple[str, str], Dict[str, RunnerBF]] = {}
+    return load_betfair_results("place", workers=workers)
 
-    for csv_path in all_files:
+
+def _iter_timeform_csvs(tf_dir: Path, pattern: str) -> Iterator[Tuple[Path, pd.DataFrame]]:
+    for csv_path in sorted(tf_dir.glob(pattern)):
         try:
-            df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+            # Usa engine=python e on_bad_lines='skip' para tolerar linhas malformadas
+            df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, engine="python", on_bad_lines="skip")
         except Exception as e:
             logger.error("Falha ao ler {}: {}", csv_path.name, e)
             continue
+        yield csv_path, df
 
-        # Garante colunas
-        for col in ["menu_hint", "event_dt", "selection_name", "pptradedvol", "bsp", "win_lose"]:
-            if col not in df.columns:
-                df[col] = ""
-
-        # Limpeza e normalização
-        df["track_key"] = df["menu_hint"].astype(str).map(_extract_track_from_menu_hint)
-        df["race_iso"] = df["event_dt"].astype(str).map(_to_iso_yyyy_mm_dd_thh_mm)
-        df["selection_name_raw"] = df["selection_name"].astype(str)
-        df["selection_name_clean"] = df["selection_name_raw"].map(_strip_trap_prefix).map(clean_horse_name)
-        df["pptradedvol"] = pd.to_numeric(df["pptradedvol"], errors="coerce").fillna(0.0)
-        df["bsp"] = pd.to_numeric(df["bsp"], errors="coerce")
-        df["win_lose"] = pd.to_numeric(df["win_lose"], errors="coerce").fillna(0).astype(int)
-
-        for (track_key, race_iso), grp in df.groupby(["track_key", "race_iso" ], dropna=False):
-            if not track_key or not race_iso:
-                continue
-            runners: Dict[str, RunnerBF] = index.setdefault((track_key, race_iso), {})
-            for _, r in grp.iterrows():
-                name_clean = r["selection_name_clean"]
-                if not isinstance(name_clean, str) or not name_clean:
-                    continue
-                runners[name_clean] = RunnerBF(
-                    selection_name_raw=r["selection_name_raw"],
-                    selection_name_clean=name_clean,
-                    pptradedvol=float(r["pptradedvol"]),
-                    bsp=float(r["bsp"]) if pd.notna(r["bsp"]) else float("nan"),
-                    win_lose=int(r["win_lose"]),
-                )
 
-    logger.info("Betfair PLACE index criado: {} corridas", len(index))
-    return index
+def load_timeform_top3(raw: Optional[pd.DataFrame] = None) -> List[dict]:
+    """Carrega todos os CSVs timeform_top3_*.csv e retorna linhas normalizadas.
 
-def load_timeform_top3() -> List[dict]:
-    """Carrega todos os CSVs timeform_top3_*.csv e retorna linhas normalizadas."""
+    ``raw`` substitui a leitura dos CSVs pelas mesmas linhas vindas de outra origem (ex.: sqlite_store).
+    """
     tf_dir = settings.DATA_DIR / "timeform_top3"
     rows: List[dict] = []
-    for csv_path in sorted(tf_dir.glob("timeform_top3_*.csv")):
-        try:
-            # Usa engine=python e on_bad_lines='skip' para tolerar linhas malformadas
-            df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, engine="python", on_bad_lines="skip")
-        except Exception as e:
-            logger.error("Falha ao ler {}: {}", csv_path.name, e)
-            continue
-
+    frames = _iter_timeform_csvs(tf_dir, "timeform_top3_*.csv") if raw is None else [(None, raw.drop(columns="source_file"))]
+    for _csv_path, df in frames:
         # Esperado: track_name, race_time_iso, TimeformTop1/2/3
         for col in ["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3"]:
             if col not in df.columns:
                 df[col] = pd.NA
 
         for _, r in df.iterrows():
-            track = normalize_track_name(str(r.get("track_name", "")))
+            track = normalize_track_name_cached(str(r.get("track_name", "")))
             race_iso = str(r.get("race_time_iso", ""))
-            names = [clean_horse_name(str(r.get(c, ""))) for c in ["TimeformTop1", "TimeformTop2", "TimeformTop3"]]
+            names = [clean_horse_name_cached(str(r.get(c, ""))) for c in ["TimeformTop1", "TimeformTop2", "TimeformTop3"]]
             if not track or not race_iso or not any(names):
                 continue
             rows.append({
@@ -207,27 +120,22 @@ def load_timeform_top3() -> List[dict]:
     return rows
 
 
-def load_timeform_forecast_top3() -> List[dict]:
+def load_timeform_forecast_top3(raw: Optional[pd.DataFrame] = None) -> List[dict]:
     """Carrega TimeformForecast_*.csv e retorna linhas com apenas os 3 primeiros previstos.
 
     Mantém o mesmo formato de saída de load_timeform_top3, preenchendo
-    os campos TimeformTop1/2/3 com os nomes extraídos.
+    os campos TimeformTop1/2/3 com os nomes extraídos. ``raw`` como em load_timeform_top3.
     """
     tf_dir = settings.DATA_DIR / "TimeformForecast"
     rows: List[dict] = []
-    for csv_path in sorted(tf_dir.glob("TimeformForecast_*.csv")):
-        try:
-            df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING, engine="python", on_bad_lines="skip")
-        except Exception as e:
-            logger.error("Falha ao ler {}: {}", csv_path.name, e)
-            continue
-
+    frames = _iter_timeform_csvs(tf_dir, "TimeformForecast_*.csv") if raw is None else [(None, raw.drop(columns="source_file"))]
+    for _csv_path, df in frames:
         for col in ["track_name", "race_time_iso", "TimeformForecast"]:
             if col not in df.columns:
                 df[col] = pd.NA
 
         for _, r in df.iterrows():
-            track = normalize_track_name(str(r.get("track_name", "")))
+            track = normalize_track_name_cached(str(r.get("track_name", "")))
             race_iso = str(r.get("race_time_iso", ""))
             names = _parse_forecast_top3(str(r.get("TimeformForecast", "")))
             if not track or not race_iso or not names:
@@ -253,10 +161,81 @@ def load_timeform_forecast_top3() -> List[dict]:
     return rows
 
 
+_TIMEFORM_FRAME_COLUMNS = ["track_key", "race_iso", "name_1", "name_2", "name_3", "track_name", "TimeformTop1", "TimeformTop2", "TimeformTop3", "source_file"]
+
+# Ordem de ordenação das linhas nos CSVs de sinais
+_SIGNALS_SORT_KEYS = ["date", "track_name", "race_time_iso", "entry_type"]
+
+
+def _read_timeform_csvs(tf_dir: Path, pattern: str, columns: List[str]) -> pd.DataFrame:
+    frames: List[pd.DataFrame] = []
+    for csv_path, df in _iter_timeform_csvs(tf_dir, pattern):
+        for col in columns:
+            if col not in df.columns:
+                df[col] = pd.NA
+        # object preserva os valores brutos de cada arquivo (como o iterrows das versões por linha)
+        part = df[columns].astype(object)
+        part["source_file"] = csv_path.name
+        frames.append(part)
+    if not frames:
+        return pd.DataFrame({col: pd.Series(dtype=object) for col in columns + ["source_file"]})
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_timeform_top3_frame(raw: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Versão tabular de load_timeform_top3 (mesmas linhas, mesma ordem) para o motor vetorizado.
+
+    Colunas: track_key, race_iso, name_1..3 (nomes limpos), os valores brutos de saída
+    track_name e TimeformTop1..3 e o arquivo de origem (source_file). ``raw`` (colunas do
+    CSV + source_file) substitui a leitura dos CSVs.
+    """
+    df = raw if raw is not None else _read_timeform_csvs(settings.DATA_DIR / "timeform_top3", "timeform_top3_*.csv", ["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3"])
+    out = pd.DataFrame({
+        "track_key": normalize_track_names(df["track_name"].astype(str)),
+        "race_iso": df["race_time_iso"].astype(str).astype(object),
+        "name_1": clean_horse_names(df["TimeformTop1"].astype(str)),
+        "name_2": clean_horse_names(df["TimeformTop2"].astype(str)),
+        "name_3": clean_horse_names(df["TimeformTop3"].astype(str)),
+        "track_name": df["track_name"],
+        "TimeformTop1": df["TimeformTop1"],
+        "TimeformTop2": df["TimeformTop2"],
+        "TimeformTop3": df["TimeformTop3"],
+        "source_file": df["source_file"],
+    }, columns=_TIMEFORM_FRAME_COLUMNS)
+    has_name = (out["name_1"] != "") | (out["name_2"] != "") | (out["name_3"] != "")
+    out = out[(out["track_key"] != "") & (out["race_iso"] != "") & has_name].reset_index(drop=True)
+    logger.info("Timeform Top3 carregado: {} corridas", len(out))
+    return out
+
+
+def load_timeform_forecast_frame(raw: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Versão tabular de load_timeform_forecast_top3 (mesmo formato de load_timeform_top3_frame)."""
+    df = raw if raw is not None else _read_timeform_csvs(settings.DATA_DIR / "TimeformForecast", "TimeformForecast_*.csv", ["track_name", "race_time_iso", "TimeformForecast"])
+    codes, texts = pd.factorize(df["TimeformForecast"].astype(str), use_na_sentinel=False)
+    parsed = [(_parse_forecast_top3(t) + ["", "", ""])[:3] for t in texts]
+    picks = np.array(parsed, dtype=object).reshape(len(parsed), 3)[codes] if len(codes) else np.empty((0, 3), dtype=object)
+    track_key = normalize_track_names(df["track_name"].astype(str))
+    out = pd.DataFrame({
+        "track_key": track_key,
+        "race_iso": df["race_time_iso"].astype(str).astype(object),
+        "name_1": picks[:, 0],
+        "name_2": picks[:, 1],
+        "name_3": picks[:, 2],
+        "track_name": track_key,
+        "TimeformTop1": picks[:, 0],
+        "TimeformTop2": picks[:, 1],
+        "TimeformTop3": picks[:, 2],
+        "source_file": df["source_file"],
+    }, index=df.index, columns=_TIMEFORM_FRAME_COLUMNS)
+    out = out[(out["track_key"] != "") & (out["race_iso"] != "") & (out["name_1"] != "")].reset_index(drop=True)
+    logger.info("Timeform Forecast(Top3) carregado: {} corridas", len(out))
+    return out
+
+
 def _calc_signals_for_race(
     tf_row: dict,
-    bf_win_index: Dict[Tuple[str, str], Dict[str, RunnerBF]],
-    bf_place_index: Dict[Tuple[str, str], Dict[str, RunnerBF]] | None = None,
+    bf_win_index: Mapping[Tuple[str, str], Mapping[str, RunnerBF]],
+    bf_place_index: Mapping[Tuple[str, str], Mapping[str, RunnerBF]] | None = None,
     market: str = "win",
     rule: str = "terceiro_queda50",
     leader_share_min: float = 0.5,
@@ -352,10 +331,12 @@ def _calc_signals_for_race(
         lay_is_green = True
 
     raw = tf_row["raw"]
+    # Nomes como vieram do Timeform (antes do casamento aproximado), alinhados a triples
+    tf_names = [n for n in tf_row.get("tf_names", tf_row["top_names"]) if isinstance(n, str) and n]
     # Helpers seguros para obter volumes dos Top1/2/3
     def _vol_for(name_raw: object) -> float:
-        name = clean_horse_name(str(name_raw)) if isinstance(name_raw, (str,)) else ""
-        return next((v for n, v, _ in triples if n == name), 0.0)
+        name = clean_horse_name_cached(str(name_raw)) if isinstance(name_raw, (str,)) else ""
+        return next((v for n, (_, v, _) in zip(tf_names, triples) if n == name), 0.0)
 
     base = {
         "date": race_iso.split("T")[0],
@@ -422,30 +403,372 @@ def _calc_signals_for_race(
     return [out_back, out_lay]
 
 
-def generate_signals(source: str = "top3", market: str = "win", rule: str = "terceiro_queda50", leader_share_min: float = 0.5, entry_type: str = "both") -> pd.DataFrame:
-    bf_win_index = load_betfair_win()
-    bf_place_index = load_betfair_place() if market == "place" else None
-    if source == "forecast":
-        tf_rows = load_timeform_forecast_top3()
-    else:
-        tf_rows = load_timeform_top3()
-
-    signals_rows: List[dict] = []
-    for row in tf_rows:
-        results = _calc_signals_for_race(row, bf_win_index, bf_place_index, market=market, rule=rule, leader_share_min=leader_share_min)
-        for r in results:
-            if entry_type in ("both", r.get("entry_type")):
-                signals_rows.append(r)
+@dataclass
+class SignalContext:
+    """Entradas carregadas uma única vez e reaproveitadas entre combinações source/market/rule.
+
+    Cada tabela Betfair (por mercado) e cada Timeform (por source e formato do motor)
+    é lida na primeira vez em que é pedida e mantida em memória enquanto o contexto existir.
+    Com ``time_tolerance`` > 0 o race_iso das linhas Timeform é trocado pelo horário da
+    corrida Betfair WIN casada dentro da tolerância (ver RunnerTable.positions_within).
+    Com ``fuzzy_names`` os nomes sem par exato na corrida são trocados pelo nome Betfair
+    mais parecido (ver name_match.NameMatcher); os nomes originais ficam em tf_name_1..3.
+    As linhas Timeform do formato vetorizado levam o id inteiro da corrida (race_id, ver
+    races.RaceIndex), usado nas junções com as tabelas Betfair WIN/PLACE.
+    Com ``id_join`` a tabela de identidade (identity.SelectionIdentity) aprende os pares
+    nome Timeform -> selection_id casados e o motor vetorizado junta os corredores pelas
+    colunas inteiras sel_id_1..3 (resolvidas pela tabela de execuções anteriores), caindo
+    para o nome só onde o id não resolve.
+    Com ``pushdown`` (semi-junção) o WIN carrega só as corridas citadas pelo Timeform e o
+    PLACE de cada fonte só as corridas/corredores que podem gerar sinal (betfair(market, source)).
+    Com ``store`` as linhas Betfair e Timeform vêm do banco SQLite (sqlite_store), sincronizado
+    com os CSVs na primeira leitura, em vez de data/Result e das pastas Timeform.
+    """
 
-    df = pd.DataFrame(signals_rows)
+    workers: int = 1
+    time_tolerance: int = field(default_factory=lambda: settings.RACE_TIME_TOLERANCE_MIN)
+    fuzzy_names: bool = field(default_factory=lambda: settings.NAME_MATCH_ENABLED)
+    id_join: bool = field(default_factory=lambda: settings.SELECTION_ID_JOIN)
+    pushdown: bool = field(default_factory=lambda: settings.BETFAIR_PUSHDOWN)
+    store: bool = field(default_factory=lambda: settings.SQLITE_STORE)
+    _db: Optional[sqlite3.Connection] = field(default=None, repr=False)
+    _results: Dict[str, pd.DataFrame] = field(default_factory=dict, repr=False)
+    _betfair: Dict[str, RunnerTable] = field(default_factory=dict, repr=False)
+    _timeform: Dict[Tuple[str, str], object] = field(default_factory=dict, repr=False)
+    _features: Dict[Tuple[str, str], pd.DataFrame] = field(default_factory=dict, repr=False)
+    _matcher: Optional[NameMatcher] = field(default=None, repr=False)
+    _identity: Optional[SelectionIdentity] = field(default=None, repr=False)
+    _past_identity: Optional[SelectionIdentity] = field(default=None, repr=False)
+    _races: RaceIndex = field(default_factory=RaceIndex, repr=False)
+    _race_table: Optional[pd.DataFrame] = field(default=None, repr=False)
+    _tf_frames: Dict[str, pd.DataFrame] = field(default_factory=dict, repr=False)
+
+    def results(self, market: str) -> pd.DataFrame:
+        """Linhas normalizadas de data/Result do mercado (com source_file).
+
+        Com ``pushdown`` o WIN só traz as corridas citadas pelas fontes Timeform.
+        """
+        if market not in self._results:
+            race_filter = self._win_filter() if self.pushdown and market == "win" else None
+            if self.store:
+                self._results[market] = sqlite_store.read_results(self.db(), market, race_filter=race_filter)
+            else:
+                self._results[market] = load_normalized_results(market, workers=self.workers, race_filter=race_filter)
+        return self._results[market]
+
+    def db(self) -> sqlite3.Connection:
+        """Conexão com o banco SQLite (``store``), sincronizado com os CSVs ao abrir."""
+        if self._db is None:
+            self._db = sqlite_store.connect()
+            changed = sqlite_store.sync_store(self._db, workers=self.workers)
+            logger.info("Banco SQLite {}: arquivos sincronizados {}", sqlite_store.store_path(), changed)
+        return self._db
+
+    def betfair(self, market: str, source: Optional[str] = None) -> RunnerTable:
+        """RunnerTable do mercado; com ``pushdown``, o PLACE de ``source`` só tem as corridas e
+        corredores que podem virar sinal (ver _place_filter)."""
+        key = f"{market}:{source}" if self.pushdown and market == "place" and source else market
+        if key not in self._betfair:
+            if key == market:
+                self._betfair[key] = load_betfair_results(market, frame=self.results(market), races=self._races)
+            else:
+                frame = self._results.get(market)
+                if frame is None and self.store:
+                    frame = sqlite_store.read_results(self.db(), market)
+                self._betfair[key] = load_betfair_results(
+                    market, workers=self.workers, frame=frame, races=self._races, race_filter=self._place_filter(source),
+                )
+        return self._betfair[key]
+
+    def _timeform_frame(self, source: str) -> pd.DataFrame:
+        if source not in self._tf_frames:
+            raw = sqlite_store.read_timeform(self.db(), source) if self.store else None
+            self._tf_frames[source] = load_timeform_forecast_frame(raw) if source == "forecast" else load_timeform_top3_frame(raw)
+        return self._tf_frames[source]
+
+    def _win_filter(self) -> RaceFilter:
+        """Corridas citadas pelo Timeform (top3 e forecast); todos os corredores de cada uma."""
+        frames = [self._timeform_frame(source) for source in ("top3", "forecast")]
+        return RaceFilter(
+            tracks=np.concatenate([f["track_key"].to_numpy(dtype=object) for f in frames]),
+            isos=np.concatenate([f["race_iso"].to_numpy(dtype=object) for f in frames]),
+            tolerance_min=self.time_tolerance,
+        )
+
+    def _place_filter(self, source: str) -> RaceFilter:
+        """Corridas de ``source`` com os três nomes no WIN (únicas que geram sinal) e só esses três corredores.
+
+        Com ``id_join`` o PLACE é consultado primeiro pelo selection_id, então os corredores não são recortados.
+        """
+        feats = self.features(source, "win")
+        tf = self.timeform(source, "vectorized")
+        rows = feats["tf_row"].to_numpy(dtype=np.int64)
+        names = None if self.id_join else feats[["leader_name", "second_name", "third_name"]].to_numpy(dtype=object)
+        race_filter = RaceFilter(
+            tracks=tf["track_key"].to_numpy(dtype=object)[rows],
+            isos=tf["race_iso"].to_numpy(dtype=object)[rows],
+            names=names,
+        )
+        logger.info("Betfair PLACE ({}): semi-junção com {} corridas candidatas a sinal", source, len(rows))
+        return race_filter
+
+    def races(self) -> RaceIndex:
+        """Ids inteiros das corridas dos mercados já carregados (compartilhados entre WIN e PLACE)."""
+        self.betfair("win")
+        return self._races
+
+    def timeform(self, source: str, engine: str = "loop") -> object:
+        """Linhas (engine="loop") ou DataFrame (engine="vectorized") do Timeform da fonte."""
+        key = (source, "frame" if engine == "vectorized" else "rows")
+        if key not in self._timeform:
+            if engine == "vectorized":
+                tf = self._timeform_frame(source)
+                if self.time_tolerance > 0 and not tf.empty:
+                    tf = tf.assign(race_iso=self._aligned_isos(source, tf["track_key"].to_numpy(dtype=object), tf["race_iso"].to_numpy(dtype=object)))
+                if self.fuzzy_names and not tf.empty:
+                    names = tf[["name_1", "name_2", "name_3"]].to_numpy(dtype=object)
+                    resolved = self._resolved_names(source, tf["track_key"].to_numpy(dtype=object), tf["race_iso"].to_numpy(dtype=object), names)
+                    tf = tf.assign(
+                        **{f"tf_name_{j + 1}": names[:, j] for j in range(3)},
+                        **{f"name_{j + 1}": resolved[:, j] for j in range(3)},
+                    )
+                if self.id_join and not tf.empty:
+                    tf = self._with_selection_ids(source, tf)
+                tf = tf.assign(race_id=self.races().resolve(tf["track_key"].to_numpy(dtype=object), tf["race_iso"].to_numpy(dtype=object)))
+            else:
+                raw = sqlite_store.read_timeform(self.db(), source) if self.store else None
+                tf = load_timeform_forecast_top3(raw) if source == "forecast" else load_timeform_top3(raw)
+                if self.time_tolerance > 0 and tf:
+                    isos = self._aligned_isos(source, [r["track_key"] for r in tf], [r["race_iso"] for r in tf])
+                    tf = [{**r, "race_iso": iso} for r, iso in zip(tf, isos.tolist())]
+                if self.fuzzy_names and tf:
+                    names = np.empty((len(tf), 3), dtype=object)
+                    names[:] = [(list(r["top_names"]) + ["", "", ""])[:3] for r in tf]
+                    resolved = self._resolved_names(source, [r["track_key"] for r in tf], [r["race_iso"] for r in tf], names)
+                    tf = [{**r, "top_names": resolved[i].tolist(), "tf_names": list(r["top_names"])} for i, r in enumerate(tf)]
+            self._timeform[key] = tf
+        return self._timeform[key]
+
+    def _aligned_isos(self, source: str, tracks: Sequence[str], isos: Sequence[str]) -> np.ndarray:
+        bf_win = self.betfair("win")
+        positions, recovered = bf_win.positions_within(tracks, isos, self.time_tolerance)
+        race_isos = bf_win.iso_pool[bf_win.race_iso]
+        safe = np.where(positions >= 0, positions, 0)
+        aligned = np.where(positions >= 0, race_isos[safe] if len(race_isos) else "", np.asarray(isos, dtype=object))
+        logger.info(
+            "Junção Timeform {} x Betfair com tolerância de {} min: {} de {} corridas casadas, {} recuperadas fora da chave exata",
+            source, self.time_tolerance, int((positions >= 0).sum()), len(positions), recovered,
+        )
+        return aligned.astype(object)
+
+    def _resolved_names(self, source: str, tracks: Sequence[str], isos: Sequence[str], names: np.ndarray) -> np.ndarray:
+        bf_win = self.betfair("win")
+        if self._matcher is None:
+            self._matcher = NameMatcher(bf_win, min_score=settings.NAME_MATCH_MIN_SCORE)
+        resolved, stats = self._matcher.resolve(bf_win.positions(tracks, isos), names)
+        self._matcher.save()
+        logger.info(
+            "Nomes Timeform {} x Betfair: {} nomes, {} exatos ({:.1%}), {} por alias, {} por similaridade, {} sem par -> {:.1%} casados; +{:.3f}s",
+            source, stats["names"], stats["exact"], stats["match_rate_exact"], stats["alias"], stats["fuzzy"], stats["unmatched"], stats["match_rate"], stats["seconds"],
+        )
+        return resolved
+
+    def identity(self) -> SelectionIdentity:
+        """Tabela de identidade persistida; os casamentos desta execução são aprendidos nela
+        (para as próximas), enquanto as consultas usam a cópia carregada (_past_identity)."""
+        if self._identity is None:
+            self._identity = SelectionIdentity.load()
+            self._past_identity = self._identity.snapshot()
+        return self._identity
+
+    def _with_selection_ids(self, source: str, tf: pd.DataFrame) -> pd.DataFrame:
+        identity = self.identity()
+        past = self._past_identity
+        tracks = tf["track_key"].to_numpy(dtype=object)
+        ids = {
+            f"sel_id_{j}": past.lookup(tracks, tf[f"tf_name_{j}" if f"tf_name_{j}" in tf.columns else f"name_{j}"].to_numpy(dtype=object))
+            for j in range(1, 4)
+        }
+        # Só os dias ainda não aprendidos somam contagem (reexecutar o histórico não infla os pares)
+        days = tf["race_iso"].astype(str).str.split("T", n=1).str[0]
+        unseen = (days > past.learned_through(source)).to_numpy()
+        new = identity.learn(matched_pairs(tf[unseen], self.betfair("win")), source=source, through=days.max())
+        identity.save()
+        known = sum(int((v >= 0).sum()) for v in ids.values())
+        logger.info("Identidade Timeform {} -> selection_id: {} pares aprendidos ({} novos); {} de {} nomes com id", source, len(identity.pairs), new, known, 3 * len(tf))
+        return tf.assign(**ids)
+
+    def features(self, source: str, market: str) -> pd.DataFrame:
+        """race_features da fonte/mercado, compartilhado por todas as regras do registro.
+
+        Lido do feature store (data/cache/features/{source}_{market}.parquet) enquanto as
+        entradas e as opções não mudam. Com ``fuzzy_names``/``id_join`` o resultado depende
+        também dos aliases e da tabela de identidade aprendidos, e é sempre recalculado.
+        """
+        if (source, market) not in self._features:
+            tf = self.timeform(source, "vectorized")
+
+            def _build() -> pd.DataFrame:
+                place = self.betfair("place", source) if market == "place" else None
+                return race_features(tf, self.betfair("win"), place, market=market)
+
+            if self.fuzzy_names or self.id_join:
+                self._features[(source, market)] = _build()
+            else:
+                options = {"time_tolerance": self.time_tolerance, "tf_rows": len(tf), "code": code_digest(FEATURES_CODE)}
+                self._features[(source, market)] = load_or_build(f"{source}_{market}", _input_paths(source, market), options, _build)
+        return self._features[(source, market)]
+
+    def race_table(self) -> pd.DataFrame:
+        """Fatos WIN por corrida do feature store (ver feature_store.race_table)."""
+        if self._race_table is None:
+            # Com pushdown o WIN carregado não tem todas as corridas: a tabela é montada à parte
+            self._race_table = load_race_table(None if self.pushdown else lambda: race_table(self.results("win"), self.betfair("win")))
+        return self._race_table
+
+
+def _new_context(workers: int, **options: object) -> SignalContext:
+    """SignalContext com as opções informadas; None mantém o padrão de settings."""
+    return SignalContext(workers=workers, **{k: v for k, v in options.items() if v is not None})
+
+
+# Regras com implementação por corrida em _calc_signals_for_race
+_LOOP_RULES = ("terceiro_queda50", "lider_volume_total")
+
+
+def generate_signals(
+    source: str = "top3",
+    market: str = "win",
+    rule: str = "terceiro_queda50",
+    leader_share_min: float = 0.5,
+    entry_type: str = "both",
+    workers: int = 1,
+    engine: str = "vectorized",
+    context: Optional[SignalContext] = None,
+    dates: Optional[Set[str]] = None,
+    time_tolerance: Optional[int] = None,
+    fuzzy_names: Optional[bool] = None,
+    id_join: Optional[bool] = None,
+    pushdown: Optional[bool] = None,
+) -> pd.DataFrame:
+    """Gera os sinais de uma combinação source/market/rule.
+
+    ``engine="vectorized"`` (padrão) calcula tudo de uma vez com compute_signals_frame sobre os
+    atributos do feature store (SignalContext.features); ``engine="loop"`` percorre as corridas
+    com _calc_signals_for_race e recalcula os fatos de cada uma (mesma saída). Regras do registro
+    (rules.py) sem versão por corrida usam sempre o motor vetorizado. Sem ``context`` as
+    entradas são lidas a cada chamada; com um SignalContext compartilhado, só uma vez.
+    ``dates`` (YYYY-MM-DD) limita o cálculo às corridas desses dias. ``time_tolerance``
+    (minutos; padrão settings.RACE_TIME_TOLERANCE_MIN), ``fuzzy_names``, ``id_join`` e
+    ``pushdown`` (padrões em settings) só valem quando não há ``context``.
+    """
+    ctx = context if context is not None else _new_context(workers, time_tolerance=time_tolerance, fuzzy_names=fuzzy_names, id_join=id_join, pushdown=pushdown)
+    bf_win_index = ctx.betfair("win")
+    bf_place_index = ctx.betfair("place", source) if market == "place" else None
+    get_rule(rule)
+    if engine == "vectorized" or rule not in _LOOP_RULES:
+        tf = ctx.timeform(source, "vectorized")
+        features = ctx.features(source, market) if dates is None else None
+        if dates is not None:
+            tf = tf[tf["race_iso"].str.split("T", n=1).str[0].isin(dates)]
+        df = compute_signals_frame(tf, bf_win_index, bf_place_index, market=market, rule=rule, leader_share_min=leader_share_min, entry_type=entry_type, features=features)
+    else:
+        tf_rows = ctx.timeform(source, engine)
+        if dates is not None:
+            tf_rows = [row for row in tf_rows if row["race_iso"].split("T")[0] in dates]
+
+        signals_rows: List[dict] = []
+        for row in tf_rows:
+            results = _calc_signals_for_race(row, bf_win_index, bf_place_index, market=market, rule=rule, leader_share_min=leader_share_min)
+            for r in results:
+                if entry_type in ("both", r.get("entry_type")):
+                    signals_rows.append(r)
+
+        df = pd.DataFrame(signals_rows)
+    logger.debug("Normalização de nomes: {}", name_cache_stats())
     logger.info("Sinais encontrados (source={}, market={}, rule={}, leader_share_min={}, entry_type={}): {}", source, market, rule, leader_share_min, entry_type, len(df))
     return df
 
 
-def write_signals_csv(df: pd.DataFrame, source: str = "top3", market: str = "win", rule: str = "terceiro_queda50") -> Path:
-    out_dir = settings.DATA_DIR / "signals"
-    _ensure_dir(out_dir)
-    out_path = out_dir / f"signals_{source}_{market}_{rule}.csv"
+def generate_signals_batch(
+    combos: Iterable[Tuple[str, str, str]],
+    leader_share_min: float = 0.5,
+    entry_type: str = "both",
+    workers: int = 1,
+    engine: str = "vectorized",
+    time_tolerance: Optional[int] = None,
+    fuzzy_names: Optional[bool] = None,
+    id_join: Optional[bool] = None,
+    pushdown: Optional[bool] = None,
+) -> Dict[Tuple[str, str, str], pd.DataFrame]:
+    """Gera várias combinações (source, market, rule) sobre um único SignalContext.
+
+    Betfair WIN/PLACE e as pastas Timeform são lidas uma vez no total, em vez de uma
+    vez por combinação; os DataFrames são devolvidos na ordem de ``combos``.
+    """
+    ctx = _new_context(workers, time_tolerance=time_tolerance, fuzzy_names=fuzzy_names, id_join=id_join, pushdown=pushdown)
+    out: Dict[Tuple[str, str, str], pd.DataFrame] = {}
+    for source, market, rule in combos:
+        out[(source, market, rule)] = generate_signals(
+            source=source, market=market, rule=rule, leader_share_min=leader_share_min,
+            entry_type=entry_type, engine=engine, context=ctx,
+        )
+    return out
+
+
+def iter_signals(
+    source: str = "top3",
+    market: str = "win",
+    rule: str = "terceiro_queda50",
+    leader_share_min: float = 0.5,
+    entry_type: str = "both",
+    engine: str = "vectorized",
+    context: Optional[SignalContext] = None,
+) -> Iterator[pd.DataFrame]:
+    """Sinais da combinação um dia de corrida por vez, em ordem de data.
+
+    Cada bloco já sai ordenado e com as colunas de write_signals_csv, de modo que gravar os
+    blocos em sequência produz o mesmo CSV de uma geração completa sem manter o histórico
+    inteiro de sinais em memória (só as entradas e os sinais de um dia).
+    """
+    ctx = context if context is not None else SignalContext()
+    bf_win_index = ctx.betfair("win")
+    bf_place_index = ctx.betfair("place", source) if market == "place" else None
+    get_rule(rule)
+    if engine == "vectorized" or rule not in _LOOP_RULES:
+        tf = ctx.timeform(source, "vectorized")
+        features = ctx.features(source, market)
+        if tf.empty or features.empty:
+            return
+        days = tf["race_iso"].str.split("T", n=1).str[0].to_numpy(dtype=object)[features["tf_row"].to_numpy()]
+        # Linhas de cada dia na ordem original (ordenação estável), um bloco por dia
+        order = np.argsort(days, kind="stable")
+        bounds = np.flatnonzero(np.r_[True, days[order][1:] != days[order][:-1], True])
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            day_features = features.iloc[order[start:stop]]
+            df = compute_signals_frame(tf, bf_win_index, bf_place_index, market=market, rule=rule, leader_share_min=leader_share_min, entry_type=entry_type, features=day_features)
+            if not df.empty:
+                yield _sorted_signals_frame(df, source, market, rule)
+        return
+
+    by_day: Dict[str, List[dict]] = {}
+    for row in ctx.timeform(source, engine):
+        by_day.setdefault(row["race_iso"].split("T")[0], []).append(row)
+    for day in sorted(by_day):
+        signals_rows: List[dict] = []
+        for row in by_day[day]:
+            for r in _calc_signals_for_race(row, bf_win_index, bf_place_index, market=market, rule=rule, leader_share_min=leader_share_min):
+                if entry_type in ("both", r.get("entry_type")):
+                    signals_rows.append(r)
+        if signals_rows:
+            yield _sorted_signals_frame(pd.DataFrame(signals_rows), source, market, rule)
+
+
+def signals_csv_path(source: str, market: str, rule: str, out_dir: Optional[Path] = None) -> Path:
+    return (out_dir or settings.DATA_DIR / "signals") / f"signals_{source}_{market}_{rule}.csv"
+
+
+def _sorted_signals_frame(df: pd.DataFrame, source: str, market: str, rule: str) -> pd.DataFrame:
     df = df.copy()
     df["source"] = source
     df["market"] = market
@@ -453,7 +776,7 @@ def write_signals_csv(df: pd.DataFrame, source: str = "top3", market: str = "win
     df["rule_label"] = RULE_LABELS.get(rule, rule)
     if df.empty:
         # cria CSV vazio com cabeçalhos padrão
-        df_sorted = pd.DataFrame([], columns=[
+        return pd.DataFrame([], columns=[
             "date","track_name","race_time_iso",
             "tf_top1","tf_top2","tf_top3",
             "vol_top1","vol_top2","vol_top3",
@@ -469,10 +792,118 @@ def write_signals_csv(df: pd.DataFrame, source: str = "top3", market: str = "win
             "roi_row_stake_fixed_10","roi_row_liability_fixed_10",
             "source","market","rule","rule_label","entry_type",
         ])
-    else:
-        df_sorted = df.sort_values(["date", "track_name", "race_time_iso", "entry_type"]).reset_index(drop=True)
+    return df.sort_values(_SIGNALS_SORT_KEYS).reset_index(drop=True)
+
+
+def _write_signal_tables(csv_path: Path) -> None:
+    """Cópias do CSV conforme settings: tabelas normalizadas, dataset por data e banco SQLite."""
+    if settings.SIGNALS_NORMALIZED:
+        write_normalized_signals(csv_path)
+    if settings.SIGNALS_DATASET:
+        write_signals_dataset(csv_path)
+    if settings.SQLITE_STORE and csv_path.parent == settings.DATA_DIR / "signals":
+        parsed = sqlite_store.parse_signals_name(csv_path.name)
+        if parsed is not None:
+            with sqlite_store.open_store() as conn:
+                sqlite_store.upsert_signals_csv(conn, csv_path, *parsed)
+
+
+def write_signals_csv(df: pd.DataFrame, source: str = "top3", market: str = "win", rule: str = "terceiro_queda50", out_dir: Optional[Path] = None) -> Path:
+    out_path = signals_csv_path(source, market, rule, out_dir)
+    _ensure_dir(out_path.parent)
+    df_sorted = _sorted_signals_frame(df, source, market, rule)
     df_sorted.to_csv(out_path, index=False, encoding=settings.CSV_ENCODING)
+    _write_signal_tables(out_path)
     logger.info("Gerado: {} ({} linhas)", out_path, len(df_sorted))
     return out_path
 
 
+def write_signals_stream(
+    parts: Iterable[pd.DataFrame],
+    source: str = "top3",
+    market: str = "win",
+    rule: str = "terceiro_queda50",
+    out_dir: Optional[Path] = None,
+    batch_rows: Optional[int] = None,
+) -> Path:
+    """Grava blocos já ordenados (ver iter_signals) em lotes de até ``batch_rows`` linhas.
+
+    Cada bloco é serializado sozinho e o texto vai para o disco a cada lote; o arquivo é
+    escrito em .tmp e só substitui o CSV ao final. Sem blocos, grava o CSV vazio padrão.
+    """
+    out_path = signals_csv_path(source, market, rule, out_dir)
+    _ensure_dir(out_path.parent)
+    batch_rows = max(1, int(batch_rows or settings.SIGNALS_WRITE_BATCH_ROWS))
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    total = 0
+    header = True
+    buffered: List[str] = []
+    buffered_rows = 0
+    with open(tmp, "w", encoding=settings.CSV_ENCODING, newline="") as fh:
+        for part in parts:
+            buffered.append(part.to_csv(index=False, header=header))
+            header = False
+            buffered_rows += len(part)
+            total += len(part)
+            if buffered_rows >= batch_rows:
+                fh.write("".join(buffered))
+                buffered, buffered_rows = [], 0
+        if header:
+            buffered.append(_sorted_signals_frame(pd.DataFrame([]), source, market, rule).to_csv(index=False))
+        fh.write("".join(buffered))
+    os.replace(tmp, out_path)
+    _write_signal_tables(out_path)
+    logger.info("Gerado: {} ({} linhas)", out_path, total)
+    return out_path
+
+
+def generate_signals_stream(
+    combos: Iterable[Tuple[str, str, str]],
+    leader_share_min: float = 0.5,
+    entry_type: str = "both",
+    workers: int = 1,
+    engine: str = "vectorized",
+    out_dir: Optional[Path] = None,
+    batch_rows: Optional[int] = None,
+    time_tolerance: Optional[int] = None,
+    fuzzy_names: Optional[bool] = None,
+    id_join: Optional[bool] = None,
+    pushdown: Optional[bool] = None,
+) -> Dict[Tuple[str, str, str], Path]:
+    """Como generate_signals_batch + write_signals_csv, mas gravando cada combinação dia a dia.
+
+    A memória dos sinais fica limitada a um dia (mais o lote em ``batch_rows``), qualquer que
+    seja o tamanho do histórico; os CSVs saem idênticos aos da gravação completa.
+    """
+    ctx = _new_context(workers, time_tolerance=time_tolerance, fuzzy_names=fuzzy_names, id_join=id_join, pushdown=pushdown)
+    out: Dict[Tuple[str, str, str], Path] = {}
+    for source, market, rule in combos:
+        parts = iter_signals(source=source, market=market, rule=rule, leader_share_min=leader_share_min, entry_type=entry_type, engine=engine, context=ctx)
+        out[(source, market, rule)] = write_signals_stream(parts, source, market, rule, out_dir=out_dir, batch_rows=batch_rows)
+    return out
+
+
+def merge_signals_csv(df: pd.DataFrame, dates: Set[str], source: str = "top3", market: str = "win", rule: str = "terceiro_queda50", out_dir: Optional[Path] = None) -> Path:
+    """Substitui no CSV existente apenas as linhas dos dias em ``dates`` pelas de ``df``.
+
+    As linhas mantidas são relidas como texto (sem reformatar números/nomes) e o resultado
+    é reordenado como em write_signals_csv, então o arquivo sai igual ao de uma geração completa.
+    """
+    out_path = signals_csv_path(source, market, rule, out_dir)
+    if not out_path.exists():
+        return write_signals_csv(df, source, market, rule, out_dir)
+    old = pd.read_csv(out_path, dtype=str, keep_default_na=False, encoding=settings.CSV_ENCODING)
+    kept = old[~old["date"].isin(dates)] if "date" in old.columns else old.iloc[0:0]
+    fresh_sorted = _sorted_signals_frame(df, source, market, rule)
+    if kept.empty:
+        merged = fresh_sorted
+    elif fresh_sorted.empty:
+        merged = kept.reset_index(drop=True)
+    else:
+        # Mesma serialização da gravação completa, relida como texto para juntar às linhas mantidas
+        fresh = pd.read_csv(io.StringIO(fresh_sorted.to_csv(index=False)), dtype=str, keep_default_na=False)
+        merged = pd.concat([kept[fresh.columns], fresh], ignore_index=True).sort_values(_SIGNALS_SORT_KEYS).reset_index(drop=True)
+    merged.to_csv(out_path, index=False, encoding=settings.CSV_ENCODING)
+    _write_signal_tables(out_path)
+    logger.info("Atualizado: {} ({} dias recalculados, {} linhas novas, {} linhas)", out_path, len(dates), len(fresh_sorted), len(merged))
+    return out_path
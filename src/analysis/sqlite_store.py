@@ -0,0 +1,537 @@
+from __future__ import annotations
+
+import sqlite3
+from contextlib import closing
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from ..config import settings
+from ..utils.text import normalize_track_names
+from .betfair import RESULT_FILE_PREFIX, RaceFilter, _read_result_csv
+from .feature_store import _TIMEFORM_INPUTS, _fingerprint, _same_content, load_race_table
+from .result_cache import _parse_many
+
+
+# Armazenamento opcional em SQLite (biblioteca padrão), em data/greyhounds.sqlite: as mesmas
+# informações espalhadas pelos CSVs (race_links dos dias, data/Result, Timeform e sinais) em
+# tabelas indexadas por corrida (track_key, race_iso), data e pista. Os CSVs continuam sendo
+# a entrada dos scrapers/downloads; sync_store importa só os arquivos novos ou alterados
+# (fingerprint em ``files``) e os scrapers gravam direto aqui quando settings.SQLITE_STORE.
+#   race_links      corridas do índice Betfair por dia (data/AAAA-MM-DD/race_links.csv)
+#   runners         linhas normalizadas de data/Result (mesmas colunas de load_normalized_results)
+#   races           fatos WIN por corrida (tabela ``races`` do feature store)
+#   timeform_picks  linhas brutas dos CSVs Timeform top3/forecast
+#   signals         linhas dos CSVs de sinais (colunas do CSV sem afinidade de tipo; a ordem e
+#                   os tipos de pd.read_csv de cada combinação ficam em signal_columns)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha1 TEXT
+);
+CREATE TABLE IF NOT EXISTS race_links (
+    date TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    track_name TEXT,
+    track_key TEXT,
+    race_time_label TEXT,
+    race_time_iso TEXT,
+    race_url TEXT,
+    PRIMARY KEY (date, row_no)
+);
+CREATE INDEX IF NOT EXISTS race_links_race ON race_links (track_key, race_time_iso);
+CREATE TABLE IF NOT EXISTS runners (
+    market TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    track_key TEXT,
+    race_iso TEXT,
+    date TEXT,
+    event_id INTEGER,
+    event_name TEXT,
+    selection_name_raw TEXT,
+    selection_name_clean TEXT,
+    selection_id INTEGER,
+    pptradedvol REAL,
+    bsp REAL,
+    win_lose INTEGER,
+    PRIMARY KEY (market, source_file, row_no)
+);
+CREATE INDEX IF NOT EXISTS runners_race ON runners (market, track_key, race_iso);
+CREATE INDEX IF NOT EXISTS runners_date ON runners (market, date);
+CREATE TABLE IF NOT EXISTS races (
+    track_key TEXT NOT NULL,
+    race_iso TEXT NOT NULL,
+    date TEXT,
+    num_runners INTEGER,
+    file_runners INTEGER,
+    total_volume REAL,
+    category_letter TEXT,
+    category_token TEXT,
+    PRIMARY KEY (track_key, race_iso)
+);
+CREATE INDEX IF NOT EXISTS races_date ON races (date);
+CREATE TABLE IF NOT EXISTS timeform_picks (
+    source TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    date TEXT,
+    track_key TEXT,
+    track_name TEXT,
+    race_time_iso TEXT,
+    TimeformTop1 TEXT,
+    TimeformTop2 TEXT,
+    TimeformTop3 TEXT,
+    TimeformForecast TEXT,
+    PRIMARY KEY (source, source_file, row_no)
+);
+CREATE INDEX IF NOT EXISTS timeform_race ON timeform_picks (track_key, race_time_iso);
+CREATE INDEX IF NOT EXISTS timeform_date ON timeform_picks (source, date);
+CREATE TABLE IF NOT EXISTS signal_columns (
+    source TEXT NOT NULL,
+    market TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    PRIMARY KEY (source, market, rule, position)
+);
+"""
+
+RUNNER_COLUMNS = [
+    "track_key", "race_iso", "event_id", "event_name", "selection_name_raw", "selection_name_clean",
+    "selection_id", "pptradedvol", "bsp", "win_lose",
+]
+
+# Colunas de cada CSV Timeform (as mesmas que os loaders de signals.py leem)
+TIMEFORM_COLUMNS = {
+    "top3": ["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3"],
+    "forecast": ["track_name", "race_time_iso", "TimeformForecast"],
+}
+
+RACE_LINK_COLUMNS = ["track_name", "race_time_label", "race_time_iso", "race_url"]
+
+
+def store_path() -> Path:
+    return settings.DATA_DIR / "greyhounds.sqlite"
+
+
+def connect(path: Optional[Path] = None) -> sqlite3.Connection:
+    """Abre (e cria, se preciso) o banco; WAL permite leitores durante a gravação dos scrapers."""
+    path = path or store_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _relative(path: Path) -> str:
+    return path.relative_to(settings.DATA_DIR).as_posix()
+
+
+def _nullable(values: pd.Series) -> List[object]:
+    """Valores para o sqlite3: NaN/NA viram NULL e escalares numpy viram tipos Python."""
+    return [None if pd.isna(v) else (v.item() if isinstance(v, np.generic) else v) for v in values.astype(object)]
+
+
+def _insert(conn: sqlite3.Connection, table: str, frame: pd.DataFrame) -> None:
+    if frame.empty:
+        return
+    cols = list(frame.columns)
+    rows = zip(*[_nullable(frame[c]) for c in cols])
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(_quote(c) for c in cols)}) VALUES ({', '.join('?' * len(cols))})",
+        rows,
+    )
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _record_file(conn: sqlite3.Connection, path: Path, kind: str, fingerprint: Optional[dict] = None) -> None:
+    fp = fingerprint or _fingerprint(path)
+    conn.execute(
+        "INSERT OR REPLACE INTO files (path, kind, size, mtime_ns, sha1) VALUES (?, ?, ?, ?, ?)",
+        (_relative(path), kind, fp["size"], fp["mtime_ns"], fp["sha1"]),
+    )
+
+
+def _known_files(conn: sqlite3.Connection, kind: str) -> Dict[str, dict]:
+    rows = conn.execute("SELECT path, size, mtime_ns, sha1 FROM files WHERE kind = ?", (kind,)).fetchall()
+    return {path: {"size": size, "mtime_ns": mtime_ns, "sha1": sha1} for path, size, mtime_ns, sha1 in rows}
+
+
+def _changed(conn: sqlite3.Connection, kind: str, paths: Sequence[Path]) -> tuple:
+    """(arquivos novos/alterados, caminhos relativos que sumiram do disco) de ``kind``."""
+    changed, known = _changed_paths(conn, kind, paths)
+    current = {_relative(p) for p in paths}
+    gone = [rel for rel in known if rel not in current]
+    return changed, gone
+
+
+def _changed_paths(conn: sqlite3.Connection, kind: str, paths: Sequence[Path]) -> tuple:
+    """(arquivos de ``paths`` novos/alterados, impressões digitais conhecidas de ``kind``)."""
+    known = _known_files(conn, kind)
+    changed = [p for p in paths if not _same_content(_fingerprint(p, known.get(_relative(p))), known.get(_relative(p)))]
+    return changed, known
+
+
+# --- Gravação (loaders e scrapers) -------------------------------------------------------------
+
+def upsert_race_links(conn: sqlite3.Connection, day: str, rows: Iterable[Dict[str, object]], path: Optional[Path] = None) -> int:
+    """Substitui as corridas do índice Betfair do dia ``day`` (linhas de race_links.csv)."""
+    frame = pd.DataFrame(list(rows))
+    for col in RACE_LINK_COLUMNS:
+        if col not in frame.columns:
+            frame[col] = None
+    frame = frame[RACE_LINK_COLUMNS]
+    frame.insert(0, "row_no", np.arange(len(frame), dtype=np.int64))
+    frame.insert(0, "date", day)
+    frame["track_key"] = normalize_track_names(frame["track_name"].astype(str)).to_numpy(dtype=object) if len(frame) else []
+    with conn:
+        conn.execute("DELETE FROM race_links WHERE date = ?", (day,))
+        _insert(conn, "race_links", frame)
+        if path is not None and path.exists():
+            _record_file(conn, path, "race_links")
+    return len(frame)
+
+
+def upsert_runners(conn: sqlite3.Connection, market: str, source_file: str, frame: pd.DataFrame, path: Optional[Path] = None, fingerprint: Optional[dict] = None) -> int:
+    """Substitui as linhas normalizadas (normalize_result_frame) do arquivo ``source_file``."""
+    out = frame[RUNNER_COLUMNS].copy()
+    out.insert(0, "row_no", np.arange(len(out), dtype=np.int64))
+    out.insert(0, "source_file", source_file)
+    out.insert(0, "market", market)
+    out["date"] = out["race_iso"].astype(str).str[:10]
+    with conn:
+        conn.execute("DELETE FROM runners WHERE market = ? AND source_file = ?", (market, source_file))
+        _insert(conn, "runners", out)
+        if path is not None:
+            _record_file(conn, path, f"result_{market}", fingerprint)
+    return len(out)
+
+
+def upsert_timeform_picks(conn: sqlite3.Connection, source: str, source_file: str, frame: pd.DataFrame, path: Optional[Path] = None) -> int:
+    """Substitui as linhas do CSV Timeform ``source_file`` (top3 ou forecast)."""
+    out = pd.DataFrame({col: frame[col] if col in frame.columns else None for col in TIMEFORM_COLUMNS[source]}, index=frame.index)
+    out = out.reset_index(drop=True)
+    out.insert(0, "row_no", np.arange(len(out), dtype=np.int64))
+    out.insert(0, "source_file", source_file)
+    out.insert(0, "source", source)
+    out["track_key"] = normalize_track_names(out["track_name"].astype(str)).to_numpy(dtype=object) if len(out) else []
+    out["date"] = out["race_time_iso"].astype(str).str[:10]
+    with conn:
+        conn.execute("DELETE FROM timeform_picks WHERE source = ? AND source_file = ?", (source, source_file))
+        _insert(conn, "timeform_picks", out)
+        if path is not None and path.exists():
+            _record_file(conn, path, f"timeform_{source}")
+    return len(out)
+
+
+def _signal_table_columns(conn: sqlite3.Connection) -> List[str]:
+    return [row[1] for row in conn.execute("PRAGMA table_info(signals)").fetchall()]
+
+
+def _signal_dtypes(conn: sqlite3.Connection, source: str, market: str, rule: str) -> Dict[str, str]:
+    """Colunas (na ordem do CSV) e tipos pandas da combinação; vazio se ela não está no banco."""
+    return dict(conn.execute(
+        "SELECT name, dtype FROM signal_columns WHERE source = ? AND market = ? AND rule = ? ORDER BY position",
+        (source, market, rule),
+    ).fetchall())
+
+
+def _ensure_signal_columns(conn: sqlite3.Connection, columns: Sequence[str]) -> None:
+    """Cria a tabela ``signals`` ou acrescenta as colunas que ainda não existem.
+
+    As colunas não têm tipo declarado: o SQLite guarda cada valor como veio (REAL, INTEGER,
+    TEXT), sem converter texto numérico, e os tipos pandas ficam em signal_columns.
+    """
+    existing = _signal_table_columns(conn)
+    if not existing:
+        conn.execute(
+            "CREATE TABLE signals (source TEXT NOT NULL, market TEXT NOT NULL, rule TEXT NOT NULL, row_no INTEGER NOT NULL, "
+            + "".join(f"{_quote(c)}, " for c in columns if c not in ("source", "market", "rule"))
+            + "PRIMARY KEY (source, market, rule, row_no))"
+        )
+        if "date" in columns:
+            conn.execute("CREATE INDEX IF NOT EXISTS signals_date ON signals (source, market, rule, date)")
+        if "track_name" in columns:
+            conn.execute("CREATE INDEX IF NOT EXISTS signals_track ON signals (track_name, race_time_iso)" if "race_time_iso" in columns else "CREATE INDEX IF NOT EXISTS signals_track ON signals (track_name)")
+        return
+    for c in columns:
+        if c not in existing:
+            conn.execute(f"ALTER TABLE signals ADD COLUMN {_quote(c)}")
+
+
+def upsert_signals_csv(conn: sqlite3.Connection, csv_path: Path, source: str, market: str, rule: str) -> int:
+    """Substitui os sinais da combinação pelas linhas do CSV ``csv_path`` (lido como pd.read_csv)."""
+    df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+    data = df.drop(columns=[c for c in ("source", "market", "rule") if c in df.columns])
+    with conn:
+        _ensure_signal_columns(conn, list(df.columns))
+        conn.execute("DELETE FROM signals WHERE source = ? AND market = ? AND rule = ?", (source, market, rule))
+        conn.execute("DELETE FROM signal_columns WHERE source = ? AND market = ? AND rule = ?", (source, market, rule))
+        conn.executemany(
+            "INSERT INTO signal_columns (source, market, rule, position, name, dtype) VALUES (?, ?, ?, ?, ?, ?)",
+            [(source, market, rule, i, c, str(df[c].dtype)) for i, c in enumerate(df.columns)],
+        )
+        if not data.empty:
+            data.insert(0, "row_no", np.arange(len(data), dtype=np.int64))
+            # source/market/rule do CSV são a chave da combinação (uma por arquivo)
+            data.insert(0, "rule", rule)
+            data.insert(0, "market", market)
+            data.insert(0, "source", source)
+            _insert(conn, "signals", data)
+        _record_file(conn, csv_path, "signals")
+    return len(df)
+
+
+def sync_signals_csv(conn: sqlite3.Connection, csv_path: Path) -> bool:
+    """Reimporta só o CSV de sinais ``csv_path`` se ele mudou desde a última carga; True se reimportou."""
+    combo = parse_signals_name(csv_path.name)
+    if combo is None or not csv_path.exists():
+        return False
+    changed, _ = _changed_paths(conn, "signals", [csv_path])
+    if changed:
+        upsert_signals_csv(conn, csv_path, *combo)
+    return bool(changed)
+
+
+def sync_store(conn: sqlite3.Connection, workers: int = 1) -> Dict[str, int]:
+    """Importa os CSVs novos/alterados (e esquece os removidos); retorna quantos arquivos mudaram por tipo."""
+    counts: Dict[str, int] = {}
+    for market, prefix in RESULT_FILE_PREFIX.items():
+        changed, gone = _changed(conn, f"result_{market}", sorted((settings.DATA_DIR / "Result").glob(f"{prefix}*.csv")))
+        with conn:
+            for rel in gone:
+                conn.execute("DELETE FROM runners WHERE market = ? AND source_file = ?", (market, Path(rel).name))
+                conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+        for path, (frame, fingerprint) in zip(changed, _parse_many(changed, partial(_read_result_csv), workers)):
+            if frame is not None:
+                upsert_runners(conn, market, path.name, frame, path, fingerprint)
+        counts[f"result_{market}"] = len(changed) + len(gone)
+
+    if counts["result_win"]:
+        races = load_race_table()
+        with conn:
+            conn.execute("DELETE FROM races")
+            _insert(conn, "races", races.assign(date=races["race_iso"].astype(str).str[:10]))
+
+    for source, (folder, pattern) in _TIMEFORM_INPUTS.items():
+        changed, gone = _changed(conn, f"timeform_{source}", sorted((settings.DATA_DIR / folder).glob(pattern)))
+        with conn:
+            for rel in gone:
+                conn.execute("DELETE FROM timeform_picks WHERE source = ? AND source_file = ?", (source, Path(rel).name))
+                conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+        for path in changed:
+            try:
+                frame = pd.read_csv(path, encoding=settings.CSV_ENCODING, engine="python", on_bad_lines="skip")
+            except Exception as e:
+                logger.error("Falha ao ler {}: {}", path.name, e)
+                continue
+            upsert_timeform_picks(conn, source, path.name, frame, path)
+        counts[f"timeform_{source}"] = len(changed) + len(gone)
+
+    changed, gone = _changed(conn, "race_links", sorted(settings.DATA_DIR.glob("????-??-??/race_links.csv")))
+    with conn:
+        for rel in gone:
+            conn.execute("DELETE FROM race_links WHERE date = ?", (rel.split("/")[0],))
+            conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+    for path in changed:
+        try:
+            rows = pd.read_csv(path, encoding=settings.CSV_ENCODING).to_dict(orient="records")
+        except pd.errors.EmptyDataError:
+            rows = []
+        upsert_race_links(conn, path.parent.name, rows, path)
+    counts["race_links"] = len(changed) + len(gone)
+
+    changed, gone = _changed(conn, "signals", sorted((settings.DATA_DIR / "signals").glob("signals_*.csv")))
+    for path in changed:
+        combo = parse_signals_name(path.name)
+        if combo is not None:
+            upsert_signals_csv(conn, path, *combo)
+    with conn:
+        for rel in gone:
+            combo = parse_signals_name(Path(rel).name)
+            if combo is not None and _signal_table_columns(conn):
+                conn.execute("DELETE FROM signals WHERE source = ? AND market = ? AND rule = ?", combo)
+                conn.execute("DELETE FROM signal_columns WHERE source = ? AND market = ? AND rule = ?", combo)
+            conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+    counts["signals"] = len(changed) + len(gone)
+    return counts
+
+
+def parse_signals_name(name: str) -> Optional[tuple]:
+    """(source, market, rule) de signals_{source}_{market}_{rule}.csv; None se o nome não segue o padrão."""
+    parts = Path(name).stem.split("_", 3)
+    if len(parts) != 4 or parts[0] != "signals" or parts[2] not in RESULT_FILE_PREFIX:
+        return None
+    return parts[1], parts[2], parts[3]
+
+
+# --- Consultas ---------------------------------------------------------------------------------
+
+def read_results(conn: sqlite3.Connection, market: str, race_filter: Optional[RaceFilter] = None) -> pd.DataFrame:
+    """Mesmo frame de load_normalized_results (linhas na ordem dos arquivos, source_file categórico).
+
+    Com ``race_filter`` a consulta usa o índice (market, track_key, race_iso) e o recorte
+    fino (tolerância, nomes) fica com RaceFilter.select.
+    """
+    where = "market = ?"
+    params: List[object] = [market]
+    if race_filter is not None:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_races (track_key TEXT, race_iso TEXT)")
+        conn.execute("DELETE FROM temp.wanted_races")
+        if race_filter.tolerance_min > 0:
+            conn.executemany("INSERT INTO temp.wanted_races (track_key) VALUES (?)", [(t,) for t in set(race_filter.tracks.tolist())])
+            where += " AND track_key IN (SELECT track_key FROM temp.wanted_races)"
+        else:
+            pairs = set(zip(race_filter.tracks.tolist(), race_filter.isos.tolist()))
+            conn.executemany("INSERT INTO temp.wanted_races (track_key, race_iso) VALUES (?, ?)", list(pairs))
+            where += " AND (track_key, race_iso) IN (SELECT track_key, race_iso FROM temp.wanted_races)"
+    query = f"SELECT source_file, {', '.join(RUNNER_COLUMNS)} FROM runners WHERE {where} ORDER BY source_file, row_no"
+    df = pd.read_sql_query(query, conn, params=params)
+    if df.empty and race_filter is None:
+        return pd.DataFrame()
+    out = pd.DataFrame({
+        "track_key": df["track_key"].astype(object),
+        "race_iso": df["race_iso"].astype(object),
+        "event_id": df["event_id"].astype(np.int64),
+        "event_name": df["event_name"].astype(object),
+        "selection_name_raw": df["selection_name_raw"].astype(object),
+        "selection_name_clean": df["selection_name_clean"].astype(object),
+        "selection_id": df["selection_id"].astype(np.int64),
+        "pptradedvol": df["pptradedvol"].astype(float),
+        "bsp": df["bsp"].astype(float),
+        "win_lose": df["win_lose"].astype(int),
+    })
+    files = [row[0] for row in conn.execute(
+        "SELECT DISTINCT source_file FROM runners WHERE market = ? ORDER BY source_file", (market,),
+    ).fetchall()]
+    out["source_file"] = pd.Categorical(df["source_file"], categories=files)
+    return race_filter.select(out) if race_filter is not None else out
+
+
+def read_timeform(conn: sqlite3.Connection, source: str) -> pd.DataFrame:
+    """Linhas brutas Timeform da fonte (colunas do CSV + source_file, object), na ordem dos arquivos."""
+    columns = TIMEFORM_COLUMNS[source]
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(columns)}, source_file FROM timeform_picks WHERE source = ? ORDER BY source_file, row_no",
+        conn, params=[source],
+    )
+    # NULL volta como NaN, como no pd.read_csv dos CSVs
+    return df.astype(object).where(df.notna(), np.nan)
+
+
+def signal_dates(conn: sqlite3.Connection, source: str, market: str, rule: str) -> Optional[List[str]]:
+    """Dias com sinais da combinação (em ordem); None se a combinação não está no banco."""
+    if not _signal_dtypes(conn, source, market, rule):
+        return None
+    rows = conn.execute(
+        "SELECT DISTINCT date FROM signals WHERE source = ? AND market = ? AND rule = ? ORDER BY date",
+        (source, market, rule),
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def read_signals(
+    conn: sqlite3.Connection,
+    source: str,
+    market: str,
+    rule: str,
+    dates: Optional[Iterable[str]] = None,
+    tracks: Optional[Iterable[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """Sinais da combinação, com as colunas e os tipos de pd.read_csv do CSV; None se ela não está no banco.
+
+    ``dates``/``tracks`` viram cláusulas IN sobre os índices (combinação, date) e (track_name, ...).
+    """
+    dtypes = _signal_dtypes(conn, source, market, rule)
+    if not dtypes:
+        return None
+    wanted = [c for c in dtypes if columns is None or c in columns]
+    where = "source = ? AND market = ? AND rule = ?"
+    params: List[object] = [source, market, rule]
+    for col, values in (("date", dates), ("track_name", tracks)):
+        if values is not None:
+            values = list(values)
+            where += f" AND {col} IN ({', '.join('?' * len(values))})" if values else " AND 0"
+            params.extend(values)
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(_quote(c) for c in wanted)} FROM signals WHERE {where} ORDER BY row_no",
+        conn, params=params,
+    )
+    for c in wanted:
+        dtype = dtypes[c]
+        if dtype == "bool":
+            df[c] = df[c].astype(bool)
+        elif dtype in ("int64", "float64"):
+            df[c] = df[c].astype(dtype)
+        else:
+            df[c] = df[c].astype(object).where(df[c].notna(), np.nan)
+    return df
+
+
+# --- Exportação ---------------------------------------------------------------------------------
+
+def export_csvs(conn: sqlite3.Connection, out_dir: Path, kinds: Sequence[str] = ("signals", "timeform", "race_links")) -> List[Path]:
+    """Regrava, a partir do banco, os CSVs de sinais, Timeform e race_links sob ``out_dir``.
+
+    A estrutura de pastas é a de data/ (signals/, timeform_top3/, TimeformForecast/,
+    AAAA-MM-DD/race_links.csv). data/Result não é exportado: o banco guarda só as colunas
+    normalizadas, não o arquivo Betfair bruto.
+    """
+    written: List[Path] = []
+    if "signals" in kinds:
+        for source, market, rule in conn.execute("SELECT DISTINCT source, market, rule FROM signal_columns ORDER BY 1, 2, 3").fetchall():
+            df = read_signals(conn, source, market, rule)
+            if df is None:
+                continue
+            path = out_dir / "signals" / f"signals_{source}_{market}_{rule}.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_csv(path, index=False, encoding=settings.CSV_ENCODING)
+            written.append(path)
+    if "timeform" in kinds:
+        for source, (folder, _pattern) in _TIMEFORM_INPUTS.items():
+            df = read_timeform(conn, source)
+            files = [p for (p,) in conn.execute("SELECT path FROM files WHERE kind = ? ORDER BY path", (f"timeform_{source}",))]
+            for rel in files:
+                name = Path(rel).name
+                path = out_dir / folder / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                df[df["source_file"] == name][TIMEFORM_COLUMNS[source]].to_csv(path, index=False, encoding=settings.CSV_ENCODING)
+                written.append(path)
+    if "race_links" in kinds:
+        for (day,) in conn.execute("SELECT DISTINCT date FROM race_links ORDER BY date").fetchall():
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(RACE_LINK_COLUMNS)} FROM race_links WHERE date = ? ORDER BY row_no", conn, params=[day],
+            )
+            path = out_dir / day / "race_links.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_csv(path, index=False, encoding=settings.CSV_ENCODING)
+            written.append(path)
+    return written
+
+
+def store_stats(conn: sqlite3.Connection) -> Dict[str, int]:
+    tables = ["files", "race_links", "runners", "races", "timeform_picks"]
+    if _signal_table_columns(conn):
+        tables.append("signals")
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in tables}
+
+
+def open_store(path: Optional[Path] = None) -> closing:
+    """``with open_store() as conn:`` — conexão fechada ao sair do bloco."""
+    return closing(connect(path))
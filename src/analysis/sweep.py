@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .rules import RULES, get_rule, threshold_params
+from .signal_engine import STAKE_FIX10, LIABILITY_FIX10, _py_round, entry_outcomes
+
+
+# Alvo, atributo varrido, comparação e guarda vêm do registro de regras (SignalRule.threshold);
+# o limiar fixo de cada regra vira um eixo da grade
+
+SWEEP_COLUMNS = [
+    "rule", "threshold", "bsp_min", "bsp_max", "entry_type",
+    "count", "greens", "strike_rate",
+    "base_stake_fixed_10", "pnl_stake_fixed_10", "roi_stake_fixed_10",
+    "pnl_liability_fixed_10", "roi_liability_fixed_10",
+]
+
+# Métricas somadas por entrada: count, greens, base stake, pnl stake, pnl liability
+_N_METRICS = 5
+
+
+def parse_grid(text: str) -> List[float]:
+    """Valores de limiar: "início:fim:passo" (fim incluído) ou lista "0.4,0.5,0.6"."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    if ":" in text:
+        start, stop, step = (float(p) for p in text.split(":"))
+        if step <= 0:
+            raise ValueError(f"Passo inválido na grade: {text}")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return [round(start + i * step, 10) for i in range(max(0, count))]
+    return [float(p) for p in text.split(",") if p.strip()]
+
+
+def parse_bands(text: Optional[str]) -> List[Tuple[float, float]]:
+    """Faixas de BSP "1.01-3,3-6,6-1000" (limites incluídos, como no filtro do dashboard); vazio = sem filtro."""
+    bands: List[Tuple[float, float]] = []
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, high = part.split("-", 1)
+        bands.append((float(low), float(high)))
+    return bands or [(0.0, float("inf"))]
+
+
+def _entry_metrics(odd: np.ndarray, win_lose: np.ndarray) -> Dict[str, np.ndarray]:
+    """Métricas por corrida e tipo de entrada, arredondadas como nas colunas do CSV de sinais."""
+    outcome = entry_outcomes(odd, win_lose)
+    n = len(odd)
+    ones = np.ones(n, dtype=np.float64)
+    zeros = np.zeros(n, dtype=np.float64)
+    return {
+        "back": np.column_stack([
+            ones,
+            outcome["back_green"].astype(np.float64),
+            np.full(n, STAKE_FIX10),
+            _py_round(outcome["back_pnl_stake"], 2),
+            zeros,
+        ]),
+        "lay": np.column_stack([
+            ones,
+            outcome["lay_green"].astype(np.float64),
+            _py_round(outcome["lay_liability_from_stake"], 2),
+            _py_round(outcome["lay_pnl_stake"], 2),
+            _py_round(outcome["lay_pnl_liability"], 2),
+        ]),
+    }
+
+
+def _suffix_totals(values: np.ndarray, metrics: np.ndarray, thresholds: np.ndarray, strict: bool) -> np.ndarray:
+    """Somas de ``metrics`` das linhas com value >= t (ou > t) para todos os limiares de uma vez."""
+    order = np.argsort(values, kind="stable")
+    ordered = metrics[order]
+    suffix = np.zeros((len(values) + 1, metrics.shape[1]), dtype=np.float64)
+    if len(values):
+        suffix[:-1] = np.cumsum(ordered[::-1], axis=0)[::-1]
+    idx = np.searchsorted(values[order], thresholds, side="right" if strict else "left")
+    return suffix[idx]
+
+
+def sweep_rule(
+    features: pd.DataFrame,
+    rule: str,
+    thresholds: Sequence[float],
+    bsp_bands: Sequence[Tuple[float, float]] = ((0.0, float("inf")),),
+    entry_types: Iterable[str] = ("back", "lay"),
+) -> pd.DataFrame:
+    """Avalia uma regra em todos os pontos (limiar x faixa de BSP x entrada) sobre race_features.
+
+    Cada faixa ordena as corridas pelo atributo da regra uma única vez; os totais de todos os
+    limiares saem de somas acumuladas + searchsorted, sem refazer o cálculo por ponto.
+    """
+    spec = get_rule(rule)
+    if spec.threshold is None:
+        raise ValueError(f"Regra sem varredura: {rule}")
+    target = spec.target
+    strict = spec.threshold.strict
+    entry_types = list(entry_types)
+    grid = np.asarray(list(thresholds), dtype=np.float64)
+
+    eligible = features[f"{target}_found"].to_numpy(dtype=bool) & spec.threshold.guard_mask(features)
+    feats = features[eligible]
+    values = feats[spec.threshold.column].to_numpy(dtype=np.float64)
+    odd = feats[f"{target}_odd"].to_numpy(dtype=np.float64)
+    odd_r = _py_round(odd, 2)
+    metrics = _entry_metrics(odd, feats[f"{target}_win_lose"].to_numpy())
+
+    parts: List[pd.DataFrame] = []
+    for low, high in bsp_bands:
+        in_band = (odd_r >= low) & (odd_r <= high)
+        for entry in entry_types:
+            totals = _suffix_totals(values[in_band], metrics[entry][in_band], grid, strict)
+            count, greens, base, pnl, pnl_liab = (totals[:, i] for i in range(_N_METRICS))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                parts.append(pd.DataFrame({
+                    "rule": rule,
+                    "threshold": grid,
+                    "bsp_min": low,
+                    "bsp_max": high,
+                    "entry_type": entry,
+                    "count": count.astype(np.int64),
+                    "greens": greens.astype(np.int64),
+                    "strike_rate": np.where(count > 0, greens / count, 0.0),
+                    "base_stake_fixed_10": base,
+                    "pnl_stake_fixed_10": pnl,
+                    "roi_stake_fixed_10": np.where(base > 0, pnl / base, 0.0),
+                    "pnl_liability_fixed_10": pnl_liab,
+                    "roi_liability_fixed_10": np.where((count > 0) & (entry == "lay"), pnl_liab / (LIABILITY_FIX10 * count), 0.0),
+                }))
+    if not parts:
+        return pd.DataFrame(columns=SWEEP_COLUMNS)
+    return pd.concat(parts, ignore_index=True)[SWEEP_COLUMNS]
+
+
+def sweep_thresholds(
+    features: pd.DataFrame,
+    grids: Optional[Mapping[str, Sequence[float]]] = None,
+    bsp_bands: Sequence[Tuple[float, float]] = ((0.0, float("inf")),),
+    entry_types: Iterable[str] = ("back", "lay"),
+) -> pd.DataFrame:
+    """Grade completa: ``grids`` leva o parâmetro de limiar (RuleThreshold.param, ex.: leader_share_min,
+    drop_min) aos valores a testar, em cada regra registrada que varre esse parâmetro.
+
+    Parâmetro sem grade avalia só o valor padrão de cada regra (``params``); parâmetro que
+    nenhuma regra declara é registrado como erro e ignorado.
+    """
+    grids = dict(grids or {})
+    known = threshold_params()
+    for param in grids:
+        if param not in known:
+            logger.error("Parâmetro de limiar desconhecido na grade: {} (regras varrem: {})", param, ", ".join(known))
+    entry_types = list(entry_types)
+    parts = []
+    for param in [p for p in grids if p in known] + [p for p in known if p not in grids]:
+        values = grids.get(param)
+        if values is not None and not len(values):
+            continue
+        for name, rule in RULES.items():
+            if rule.threshold is not None and rule.threshold.param == param:
+                points = values if values is not None else [rule.params[param]]
+                parts.append(sweep_rule(features, name, points, bsp_bands, entry_types))
+    if not parts:
+        return pd.DataFrame(columns=SWEEP_COLUMNS)
+    out = pd.concat(parts, ignore_index=True)
+    for col in ["strike_rate", "roi_stake_fixed_10", "roi_liability_fixed_10"]:
+        out[col] = out[col].round(4)
+    for col in ["base_stake_fixed_10", "pnl_stake_fixed_10", "pnl_liability_fixed_10"]:
+        out[col] = out[col].round(2)
+    return out
@@ -42,6 +42,36 @@ class Settings:
 
 	# CSV
 	CSV_ENCODING: str = "utf-8-sig"
+	# Registros pendentes no log de um CSV (append/upsert em src/utils/files.py) antes da compactação automática
+	CSV_LOG_COMPACT_RECORDS: int = 1000
+
+	# Cache Parquet dos CSVs normalizados de data/Result (em data/cache)
+	RESULT_CACHE_ENABLED: bool = True
+	# Teto aproximado de memória (MB) por CSV de data/Result; acima disso o arquivo é lido em blocos
+	RESULT_READ_MEMORY_MB: int = 512
+	# Linhas de sinais acumuladas antes de cada gravação no modo streaming (--stream)
+	SIGNALS_WRITE_BATCH_ROWS: int = 20000
+	# Grava também cada CSV de sinais normalizado (corridas + entradas, em Parquet ao lado do CSV)
+	SIGNALS_NORMALIZED: bool = False
+	# Grava também cada CSV de sinais como dataset Parquet particionado por data (data/signals/dataset)
+	SIGNALS_DATASET: bool = False
+	# Dias mais recentes selecionados ao abrir o dashboard quando ele lê o dataset por data
+	DASHBOARD_DEFAULT_DAYS: int = 30
+	# Usa o banco SQLite (data/greyhounds.sqlite) como fonte de Result/Timeform/sinais, sincronizado com os CSVs
+	SQLITE_STORE: bool = False
+
+	# Tolerância (minutos) ao casar o horário Timeform com o da corrida Betfair/card do Timeform; 0 = chave exata
+	RACE_TIME_TOLERANCE_MIN: int = 0
+
+	# Casamento aproximado de nomes Timeform x Betfair dentro da mesma corrida (aliases em data/cache/name_aliases.json)
+	NAME_MATCH_ENABLED: bool = False
+	NAME_MATCH_MIN_SCORE: float = 0.75
+
+	# Junta corredores por selection_id aprendido (data/cache/selection_ids.parquet) no motor vetorizado
+	SELECTION_ID_JOIN: bool = False
+
+	# Semi-junção na carga de data/Result: WIN só com as corridas do Timeform, PLACE só com as candidatas a sinal
+	BETFAIR_PUSHDOWN: bool = False
 
 	# Logs
 	LOG_LEVEL: str = "INFO"
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import random
 import time
-from typing import Dict, List, Iterable
+from typing import Dict, List, Iterable, Optional, Tuple
 import re
 from urllib.parse import urljoin
 
@@ -187,10 +187,51 @@ def _convert_forecast_to_decimal(raw: str) -> str:
 	return ", ".join(converted)
 
 
+def _hhmm_minutes(hhmm: str) -> int:
+	try:
+		hour, minute = [int(x) for x in (hhmm or "").strip()[:5].split(":")]
+		return hour * 60 + minute
+	except Exception:
+		return -1
+
+
+def _assign_cards(index: Dict[tuple, str], keys: List[Tuple[str, str]], tolerance_min: int) -> Tuple[List[Optional[str]], int]:
+	"""
+	Casa cada (track_normalizado, HH:MM) com a url de um card: chave exata primeiro e,
+	com tolerância > 0, o card livre mais próximo da mesma pista dentro de tolerance_min
+	minutos (cada card usado no máximo uma vez; menor diferença tem prioridade).
+	Retorna as urls na ordem de keys e quantas vieram da tolerância.
+	"""
+	urls: List[Optional[str]] = [index.get(k) for k in keys]
+	used = {k for k in keys if k in index}
+	if tolerance_min <= 0:
+		return urls, 0
+	candidates = []
+	for i, (track, hhmm) in enumerate(keys):
+		if urls[i] or _hhmm_minutes(hhmm) < 0:
+			continue
+		for card_key in index:
+			if card_key[0] != track or card_key in used:
+				continue
+			minutes = _hhmm_minutes(card_key[1])
+			diff = abs(minutes - _hhmm_minutes(hhmm))
+			if minutes >= 0 and diff <= tolerance_min:
+				candidates.append((diff, i, card_key))
+	recovered = 0
+	for diff, i, card_key in sorted(candidates):
+		if urls[i] or card_key in used:
+			continue
+		urls[i] = index[card_key]
+		used.add(card_key)
+		recovered += 1
+	return urls, recovered
+
+
 def scrape_timeform_for_races(race_rows: Iterable[Dict[str, str]]) -> Iterable[Dict[str, object]]:
 	"""
 	Para cada corrida em race_rows (com chaves track_name, race_time_iso),
-	busca na home do Timeform a corrida correspondente por pista e horário (HH:MM).
+	busca na home do Timeform a corrida correspondente por pista e horário (HH:MM),
+	aceitando diferença de até settings.RACE_TIME_TOLERANCE_MIN minutos (um card por corrida).
 	Ao achar, abre o link e extrai TimeformForecast e o Top3.
 	Gera (yield) um dict por corrida encontrada com track_name, race_time_iso, TimeformForecast e TimeformTop1/2/3 (se existirem).
 	"""
@@ -213,11 +254,17 @@ def scrape_timeform_for_races(race_rows: Iterable[Dict[str, str]]) -> Iterable[D
 			if track_key and hhmm and url:
 				index[(track_key, hhmm)] = url
 
-		for row in race_rows:
+		race_rows = list(race_rows)
+		match_keys = [(normalize_track_name(r.get("track_name", "")), iso_to_hhmm(r.get("race_time_iso", ""))) for r in race_rows]
+		urls, recovered = _assign_cards(index, match_keys, settings.RACE_TIME_TOLERANCE_MIN)
+		logger.info(
+			"Cards Timeform casados: {} de {} corridas ({} recuperadas com tolerância de {} min)",
+			sum(1 for u in urls if u), len(race_rows), recovered, settings.RACE_TIME_TOLERANCE_MIN,
+		)
+
+		for row, url in zip(race_rows, urls):
 			track = row.get("track_name", "")
 			race_time_iso = row.get("race_time_iso", "")
-			match_key = (normalize_track_name(track), iso_to_hhmm(race_time_iso))
-			url = index.get(match_key)
 			if not url:
 				continue
 
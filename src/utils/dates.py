@@ -2,10 +2,20 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+from dateutil import parser as date_parser
 
 from ..config import settings
 
 
+# Formato do event_dt nos CSVs Betfair de data/Result (ex.: "19-09-2025 20:01")
+EVENT_DT_FORMAT = "%d-%m-%Y %H:%M"
+
+_event_dt_stats: Dict[str, int] = {"rows": 0, "fallback_rows": 0, "failed_rows": 0}
+
+
 def utc_now_iso() -> str:
 	return datetime.now(timezone.utc).isoformat()
 
@@ -38,3 +48,38 @@ def iso_to_hhmm(iso_str: str) -> str:
 		return dt.strftime("%H:%M")
 	except Exception:
 		return ""
+
+
+def event_dt_to_iso(value: str) -> str:
+	"""Converte um event_dt qualquer (dia primeiro) para YYYY-MM-DDTHH:MM; vazio se inválido."""
+	try:
+		dt = date_parser.parse(value, dayfirst=True)
+		return dt.strftime("%Y-%m-%dT%H:%M")
+	except Exception:
+		return ""
+
+
+def event_dt_series_to_iso(values: pd.Series) -> pd.Series:
+	"""Versão colunar de event_dt_to_iso, com o mesmo resultado.
+
+	Cada valor distinto é convertido uma vez: primeiro em lote com EVENT_DT_FORMAT e,
+	só para o que não casar com o formato, pelo parser genérico do dateutil. As linhas
+	desviadas ao parser genérico são contadas em event_dt_parse_stats().
+	"""
+	codes, uniques = pd.factorize(values, use_na_sentinel=False)
+	uniq = pd.Series(uniques, dtype=object)
+	parsed = pd.to_datetime(uniq, format=EVENT_DT_FORMAT, errors="coerce")
+	iso = parsed.dt.strftime("%Y-%m-%dT%H:%M").astype(object).to_numpy()
+	slow = parsed.isna().to_numpy()
+	if slow.any():
+		iso[slow] = [event_dt_to_iso(v) for v in uniq[slow]]
+	failed = iso == ""
+	_event_dt_stats["rows"] += len(codes)
+	_event_dt_stats["fallback_rows"] += int(slow[codes].sum())
+	_event_dt_stats["failed_rows"] += int(failed[codes].sum())
+	return pd.Series(iso[codes], index=values.index, dtype=object)
+
+
+def event_dt_parse_stats() -> Dict[str, int]:
+	"""Contadores acumulados de event_dt_series_to_iso (linhas, desvios ao dateutil, falhas)."""
+	return dict(_event_dt_stats)
@@ -1,9 +1,23 @@
 from __future__ import annotations
 
+import atexit
+import io
+import json
+import math
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Dict, List
+from typing import Iterable, Iterator, Dict, List, Optional, Tuple
 
+try:
+	import fcntl
+except ImportError:  # Windows
+	fcntl = None
+	import msvcrt
+
+import numpy as np
 import pandas as pd
 
 from ..config import settings
@@ -33,34 +47,299 @@ def write_links_csv(day_dir: Path, rows: Iterable[Dict[str, object]]) -> Path:
 	return csv_path
 
 
+def _json_value(value: object) -> object:
+	if isinstance(value, np.generic):
+		return value.item()
+	if value is None or value is pd.NA or value is pd.NaT:
+		return None
+	return str(value)
+
+
+def _key_text(value: object) -> str:
+	"""Texto da chave como o str() do valor relido do CSV (vazio/NaN -> "nan")."""
+	if value is None or (isinstance(value, float) and math.isnan(value)):
+		return "nan"
+	return str(value)
+
+
+class _CsvRecords:
+	"""Linhas de um CSV com os registros do log aplicados em ordem (última gravação vence).
+
+	Índices por conjunto de chaves localizam a linha a substituir sem varrer a tabela. O
+	resultado tem o mesmo formato das funções antigas de leitura+regravação: linhas
+	substituídas vão para o fim e as colunas seguem a ordem em que apareceram.
+	"""
+
+	def __init__(self, csv_path: Path):
+		self._columns: List[str] = []
+		self._rows: Dict[int, Dict[str, object]] = {}
+		self._indexes: Dict[Tuple[str, ...], Dict[Tuple[str, ...], List[int]]] = {}
+		self._next_id = 0
+		if not csv_path.exists():
+			return
+		try:
+			df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+		except Exception:
+			# CSV vazio/ilegível: as funções antigas recriavam o arquivo do zero
+			return
+		self._columns = list(df.columns)
+		for row in df.to_dict(orient="records"):
+			self._add(row)
+
+	def _add(self, row: Dict[str, object]) -> None:
+		rid = self._next_id
+		self._next_id += 1
+		self._rows[rid] = row
+		for fields, index in self._indexes.items():
+			index.setdefault(tuple(_key_text(row.get(k)) for k in fields), []).append(rid)
+
+	def _remove(self, rids: List[int]) -> None:
+		for rid in rids:
+			row = self._rows.pop(rid)
+			for fields, index in self._indexes.items():
+				key = tuple(_key_text(row.get(k)) for k in fields)
+				ids = index.get(key)
+				if ids and rid in ids:
+					ids.remove(rid)
+					if not ids:
+						del index[key]
+
+	def _index(self, fields: Tuple[str, ...]) -> Dict[Tuple[str, ...], List[int]]:
+		if fields not in self._indexes:
+			index: Dict[Tuple[str, ...], List[int]] = {}
+			for rid, row in self._rows.items():
+				index.setdefault(tuple(_key_text(row.get(k)) for k in fields), []).append(rid)
+			self._indexes[fields] = index
+		return self._indexes[fields]
+
+	def _extend_columns(self, row: Dict[str, object]) -> None:
+		seen = set(self._columns)
+		self._columns.extend(c for c in row if c not in seen)
+
+	def apply(self, record: Dict[str, object]) -> None:
+		op, row = record["op"], record["row"]
+		if op == "append":
+			self._add(row)
+			self._extend_columns(row)
+		elif op == "upsert":
+			fields = tuple(record["keys"])
+			if self._rows and all(k in self._columns for k in fields):
+				matches = self._index(fields).get(tuple(str(row.get(k, "")) for k in fields))
+				if matches:
+					# mesma semântica do upsert antigo: remove as linhas da chave e limita as colunas às do novo registro
+					self._remove(list(matches))
+					self._add(row)
+					self._columns = list(row)
+					return
+			self._add(row)
+			self._extend_columns(row)
+		elif op == "update":
+			base: Dict[str, object] = {}
+			if self._rows:
+				last = self._rows[next(reversed(self._rows))]
+				base = {c: last.get(c, math.nan) for c in self._columns}
+			base.update(row)
+			self._remove(list(self._rows))
+			self._add(base)
+			self._columns = list(base)
+
+	def frame(self) -> pd.DataFrame:
+		return pd.DataFrame(list(self._rows.values()), columns=self._columns)
+
+
+def _log_path(csv_path: Path) -> Path:
+	return csv_path.with_name(csv_path.name + ".log")
+
+
+@contextmanager
+def _csv_lock(csv_path: Path, shared: bool = False) -> Iterator[None]:
+	"""Trava em ``<csv>.lock``: compartilhada para acrescentar ao log, exclusiva para compactar."""
+	fd = os.open(csv_path.with_name(csv_path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+	try:
+		if fcntl is not None:
+			fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+		else:
+			# Windows: sem trava compartilhada, todos os acessos são exclusivos
+			msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+		yield
+	finally:
+		if fcntl is None:
+			os.lseek(fd, 0, os.SEEK_SET)
+			msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+		os.close(fd)
+
+
+# Registros gravados por este processo em cada log desde a última compactação
+_PENDING: Dict[Path, int] = {}
+
+
+def _replay_log(csv_path: Path, log_path: Path) -> _CsvRecords:
+	"""CSV com os registros completos de ``log_path`` aplicados (chamar com a trava do CSV)."""
+	records = _CsvRecords(csv_path)
+	try:
+		data = log_path.read_bytes()
+	except FileNotFoundError:
+		# compactado entre a checagem e a trava: o CSV já tem tudo
+		return records
+	# ignora uma última linha incompleta (gravação interrompida ou ainda em curso)
+	for line in data[:data.rfind(b"\n") + 1].splitlines():
+		if line.strip():
+			records.apply(json.loads(line))
+	return records
+
+
+def _write_record(csv_path: Path, op: str, row: Dict[str, object], keys: Optional[List[str]] = None) -> None:
+	"""Acrescenta um registro (JSON por linha) a ``<csv>.log`` com uma única escrita O_APPEND.
+
+	O CSV não é lido nem regravado; ele só muda em compact_csv_log, chamado aqui quando o
+	processo acumula settings.CSV_LOG_COMPACT_RECORDS registros no mesmo log, por
+	compact_csv_logs (também ao fim do processo) ou por condense_*.
+	"""
+	record = {"op": op, "row": {str(k): v for k, v in row.items()}}
+	if keys is not None:
+		record["keys"] = list(keys)
+	line = (json.dumps(record, ensure_ascii=False, default=_json_value) + "\n").encode("utf-8")
+	csv_path.parent.mkdir(parents=True, exist_ok=True)
+	with _csv_lock(csv_path, shared=True):
+		fd = os.open(_log_path(csv_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+		try:
+			os.write(fd, line)
+		finally:
+			os.close(fd)
+	key = Path(os.path.abspath(csv_path))
+	_PENDING[key] = _PENDING.get(key, 0) + 1
+	if _PENDING[key] >= settings.CSV_LOG_COMPACT_RECORDS:
+		compact_csv_log(key)
+
+
+def compact_csv_log(csv_path: Path) -> bool:
+	"""Aplica ao CSV os registros pendentes em ``<csv>.log`` (de qualquer processo) e apaga o log.
+
+	Roda com a trava exclusiva do CSV: gravações e outras compactações esperam, então nenhum
+	registro fica de fora. Retorna False se não havia log.
+	"""
+	_PENDING.pop(Path(os.path.abspath(csv_path)), None)
+	log_path = _log_path(csv_path)
+	if not log_path.exists():
+		return False
+	with _csv_lock(csv_path):
+		if not log_path.exists():
+			return False
+		records = _replay_log(csv_path, log_path)
+		tmp = csv_path.with_name(f"{csv_path.name}.{os.getpid()}.tmp")
+		records.frame().to_csv(tmp, index=False, encoding=settings.CSV_ENCODING)
+		os.replace(tmp, csv_path)
+		log_path.unlink()
+	return True
+
+
+def compact_csv_logs() -> int:
+	"""Compacta os logs gravados por este processo (registrado para rodar ao fim do processo)."""
+	return sum(1 for path in list(_PENDING) if compact_csv_log(path))
+
+
+atexit.register(compact_csv_logs)
+
+
+@contextmanager
+def compacting_csv_logs() -> Iterator[None]:
+	"""``with compacting_csv_logs():`` — compacta ao sair do bloco os logs gravados dentro dele."""
+	try:
+		yield
+	finally:
+		compact_csv_logs()
+
+
+def read_csv_with_log(csv_path: Path, **kwargs) -> pd.DataFrame:
+	"""pd.read_csv do CSV com os registros ainda pendentes em ``<csv>.log`` já aplicados.
+
+	Devolve o mesmo que pd.read_csv devolveria logo após compact_csv_log, sem regravar o
+	CSV; sem log é só pd.read_csv. ``kwargs`` seguem para pd.read_csv (encoding padrão
+	settings.CSV_ENCODING).
+	"""
+	kwargs.setdefault("encoding", settings.CSV_ENCODING)
+	log_path = _log_path(csv_path)
+	if not log_path.exists():
+		return pd.read_csv(csv_path, **kwargs)
+	# trava compartilhada: gravações seguem, a compactação espera a leitura terminar
+	with _csv_lock(csv_path, shared=True):
+		records = _replay_log(csv_path, log_path)
+	buf = io.BytesIO()
+	records.frame().to_csv(buf, index=False, encoding=kwargs["encoding"])
+	buf.seek(0)
+	return pd.read_csv(buf, **kwargs)
+
+
+# Contrato das funções de gravação abaixo: o CSV é eventualmente consistente. Cada chamada só
+# acrescenta um registro a ``<csv>.log``; o CSV reflete os registros depois de compact_csv_log
+# (automática a cada settings.CSV_LOG_COMPACT_RECORDS registros do processo e ao fim dele).
+# Quem lê durante a gravação deve usar read_csv_with_log.
+
 def append_or_create_csv(csv_path: Path, row: Dict[str, object]) -> None:
-	if csv_path.exists():
-		df = pd.read_csv(csv_path)
-		df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-		df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-	else:
-		pd.DataFrame([row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+	"""Acrescenta uma linha ao CSV (via log; ver _write_record e compact_csv_log).
+
+	Eventualmente consistente: até a compactação a linha só aparece em read_csv_with_log.
+	"""
+	_write_record(csv_path, "append", row)
 
 
 def upsert_single_row_csv(csv_path: Path, update_row: Dict[str, object]) -> None:
 	"""Garante um único registro no CSV. Se existir, atualiza colunas; senão cria.
-	Mantém campos existentes e aplica os do update_row por cima.
+	Mantém campos existentes e aplica os do update_row por cima (via log; ver _write_record).
+	Eventualmente consistente: até a compactação a atualização só aparece em read_csv_with_log.
 	"""
-	if csv_path.exists():
+	_write_record(csv_path, "update", update_row)
+
+
+# Arquivos por lote em condense_day_folders (cada lote é uma tarefa do pool de processos)
+_CONDENSE_BATCH_FILES = 256
+
+
+def _last_valid_rows(frames: List[pd.DataFrame]) -> List[Dict[str, object]]:
+	"""Para cada frame, a última célula não nula/não vazia de cada coluna (a última célula, se nenhuma for válida).
+
+	As células de todos os frames são testadas de uma vez (NaN e textos só com espaços contam
+	como vazios); por frame resta só um argmax por coluna. Os valores saem como na iteração
+	de uma Series (escalares Python), o que mantém os tipos do pd.DataFrame de uma linha.
+	"""
+	arrays = [df.to_numpy(dtype=object) for df in frames]
+	cells = pd.Series(np.concatenate([a.ravel() for a in arrays]) if arrays else [], dtype=object)
+	valid = (cells.notna() & cells.astype(str).str.strip().ne("")).to_numpy()
+	rows: List[Dict[str, object]] = []
+	offset = 0
+	for df, arr in zip(frames, arrays):
+		n, c = arr.shape
+		ok = valid[offset:offset + n * c].reshape(n, c)
+		offset += n * c
+		last = n - 1 - np.argmax(ok[::-1], axis=0)
+		last[~ok.any(axis=0)] = n - 1
+		rows.append(dict(zip(df.columns, arr[last, np.arange(c)])))
+	return rows
+
+
+def _condense_files(paths: List[Path]) -> int:
+	"""condense_csv_to_single_row para um lote de arquivos, com uma única passada vetorizada (_last_valid_rows)."""
+	loaded: List[Tuple[Path, pd.DataFrame]] = []
+	for csv_path in paths:
+		compact_csv_log(csv_path)
+		if not csv_path.exists():
+			continue
 		try:
-			df_existing = pd.read_csv(csv_path)
-			base = {}
-			if not df_existing.empty:
-				# usa a última linha como base
-				base = df_existing.iloc[-1].to_dict()
-			base.update(update_row)
-			pd.DataFrame([base]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-			return
+			df = pd.read_csv(csv_path)
+			if df.empty:
+				# mantém vazio
+				df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+				continue
+		except Exception:
+			# Se falhar por qualquer motivo, não altera o arquivo
+			continue
+		loaded.append((csv_path, df))
+	for (csv_path, _df), row in zip(loaded, _last_valid_rows([df for _, df in loaded])):
+		try:
+			pd.DataFrame([row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
 		except Exception:
-			# em caso de erro de leitura, cria do zero
-			pass
-	# cria do zero
-	pd.DataFrame([update_row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+			continue
+	return len(paths)
 
 
 def condense_csv_to_single_row(csv_path: Path) -> None:
@@ -68,54 +347,30 @@ def condense_csv_to_single_row(csv_path: Path) -> None:
 	- Mantém a última ocorrência não vazia para cada coluna.
 	- Se o arquivo estiver vazio, mantém como CSV vazio com cabeçalhos (se houver).
 	"""
-	if not csv_path.exists():
-		return
-	try:
-		df = pd.read_csv(csv_path)
-		if df.empty:
-			# mantém vazio
-			df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-			return
-		aggregated: Dict[str, object] = {}
-		for col in df.columns:
-			series = df[col]
-			# pega a última célula não nula/não vazia
-			val = None
-			for item in series[::-1]:
-				if pd.notna(item) and str(item).strip() != "":
-					val = item
-					break
-			aggregated[col] = val if val is not None else (series.iloc[-1] if len(series) > 0 else None)
-		pd.DataFrame([aggregated]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-	except Exception:
-		# Se falhar por qualquer motivo, não altera o arquivo
-		return
+	_condense_files([csv_path])
+
+
+def condense_day_folders(day_dirs: Iterable[Path], workers: int = 1, pattern: str = "*/*.csv") -> int:
+	"""Condensa (como condense_csv_to_single_row) os CSVs por corrida das pastas de dia ``day_dirs``.
+
+	``pattern`` é relativo a cada pasta de dia (padrão: CSVs dentro das pastas de pista, sem
+	race_links.csv). Os arquivos são tratados em lotes; com ``workers`` > 1 os lotes rodam em
+	um pool de processos. Retorna quantos arquivos foram processados.
+	"""
+	paths = sorted(p for day_dir in day_dirs for p in Path(day_dir).glob(pattern))
+	n = max(1, min(workers, -(-len(paths) // _CONDENSE_BATCH_FILES)))
+	size = min(_CONDENSE_BATCH_FILES, max(1, -(-len(paths) // n)))
+	batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+	if n <= 1:
+		return sum(_condense_files(batch) for batch in batches)
+	with ProcessPoolExecutor(max_workers=n) as pool:
+		return sum(pool.map(_condense_files, batches))
 
 
 def upsert_row_by_keys(csv_path: Path, new_row: Dict[str, object], key_fields: List[str]) -> None:
 	"""Mantém múltiplas linhas por corrida, mas 1 por combinação de chaves.
 	Se existir linha com as mesmas chaves, substitui totalmente por new_row;
-	senão, acrescenta uma nova linha.
+	senão, acrescenta uma nova linha (via log; ver _write_record).
+	Eventualmente consistente: até a compactação a linha só aparece em read_csv_with_log.
 	"""
-	if csv_path.exists():
-		try:
-			df = pd.read_csv(csv_path)
-			if not df.empty and all(k in df.columns for k in key_fields):
-				mask = pd.Series([True] * len(df))
-				for k in key_fields:
-					mask &= (df[k].astype(str) == str(new_row.get(k, "")))
-				if mask.any():
-					# substitui a(s) linhas encontradas pelo new_row, sem preservar colunas antigas extras
-					out_df = pd.concat([df[~mask], pd.DataFrame([new_row])], ignore_index=True)
-					# restringe colunas ao superset das colunas desejadas
-					out_df = out_df[list(new_row.keys())]
-					out_df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-					return
-			# não encontrou linha com as chaves -> append
-			df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-			df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
-			return
-		except Exception:
-			pass
-	# arquivo não existe ou erro de leitura -> cria novo
-	pd.DataFrame([new_row]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+	_write_record(csv_path, "upsert", new_row, key_fields)
@@ -2,6 +2,11 @@ from __future__ import annotations
 
 import re
 import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
 
 _COUNTRY_SUFFIX_RE = re.compile(r"\s*\(([A-Z]{2,3})\)\s*$")
 _APOSTROPHES_RE = re.compile(r"[\u2019\u2018\']+")
@@ -59,3 +64,59 @@ def normalize_track_name(raw_name: str) -> str:
 	# normaliza espaços e title case
 	name = normalize_spaces(name).title()
 	return name
+
+
+# Normalização memoizada: poucos milhares de galgos e ~30 pistas distintas aparecem em
+# milhões de linhas, então as variantes *_cached e as funções de Series calculam cada
+# valor distinto uma única vez (factorize + LRU limitado) com resultado idêntico.
+_NAME_CACHE_SIZE = 1 << 16
+_TRACK_CACHE_SIZE = 1 << 12
+
+_map_stats: Dict[str, int] = {"rows": 0, "unique": 0}
+
+
+@lru_cache(maxsize=_NAME_CACHE_SIZE)
+def clean_horse_name_cached(raw_name: str) -> str:
+	return clean_horse_name(raw_name)
+
+
+@lru_cache(maxsize=_TRACK_CACHE_SIZE)
+def normalize_track_name_cached(raw_name: str) -> str:
+	return normalize_track_name(raw_name)
+
+
+def map_unique(values: pd.Series, func: Callable[[str], str]) -> pd.Series:
+	"""Aplica func apenas aos valores distintos da Series e expande de volta às linhas."""
+	codes, uniques = pd.factorize(values, use_na_sentinel=False)
+	_map_stats["rows"] += len(codes)
+	_map_stats["unique"] += len(uniques)
+	mapped = np.array([func(u) for u in uniques], dtype=object)
+	return pd.Series(mapped[codes] if len(codes) else mapped[:0], index=values.index, dtype=object)
+
+
+def clean_horse_names(values: pd.Series) -> pd.Series:
+	return map_unique(values, clean_horse_name_cached)
+
+
+def normalize_track_names(values: pd.Series) -> pd.Series:
+	return map_unique(values, normalize_track_name_cached)
+
+
+def name_cache_stats() -> Dict[str, float]:
+	"""Estatísticas acumuladas da normalização memoizada.
+
+	``dedup_rate``: fração das linhas das Series resolvidas sem chamar a função (repetidas);
+	``hit_rate``: fração das chamadas às variantes *_cached atendidas pelo LRU.
+	"""
+	infos = [clean_horse_name_cached.cache_info(), normalize_track_name_cached.cache_info()]
+	hits = sum(i.hits for i in infos)
+	misses = sum(i.misses for i in infos)
+	rows = _map_stats["rows"]
+	return {
+		"rows": rows,
+		"unique": _map_stats["unique"],
+		"dedup_rate": (1.0 - _map_stats["unique"] / rows) if rows else 0.0,
+		"lru_hits": hits,
+		"lru_misses": misses,
+		"hit_rate": (hits / (hits + misses)) if (hits + misses) else 0.0,
+	}
@@ -0,0 +1,82 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Ajuste de path para permitir "pytest" (sem "python -m") importar src
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config import settings  # noqa: E402
+
+
+# Dados sintéticos no formato de data/Result e das pastas Timeform, pequenos o bastante para
+# os testes de equivalência rodarem em segundos sem o data/ real. Cobrem nomes repetidos na
+# mesma corrida (com valores diferentes), nome vazio, BSP vazio, event_dt fora do
+# formato padrão e uma corrida que reaparece mais adiante no arquivo.
+
+TRACKS = ["Romford", "Hove", "Towcester", "Perry Barr", "Dunstall Park"]
+NAMES = [f"{a} {b}" for a in ["Swift", "Droopys", "Jet", "Lady", "O'Brien", "Zé"] for b in ["Star", "Bolt", "Dream", "Lass", "Fire"]]
+
+
+def write_result_day(root: Path, day: datetime, races: int, rng: np.random.Generator, event_base: int) -> None:
+    win_rows, place_rows, top3_rows, fc_rows = [], [], [], []
+    for r in range(races):
+        track = TRACKS[r % len(TRACKS)]
+        start = day.replace(hour=11 + r // 6, minute=(r * 7) % 60)
+        fmt = "%Y-%m-%d %H:%M" if r == 3 else "%d-%m-%Y %H:%M"
+        runners = list(rng.choice(NAMES, size=int(rng.integers(4, 7)), replace=False))
+        winner = int(rng.integers(0, len(runners)))
+        for market, rows in (("win", win_rows), ("place", place_rows)):
+            for i, name in enumerate(runners):
+                rows.append({
+                    "event_id": event_base + r + (500000 if market == "place" else 0),
+                    "menu_hint": f"{track} {day.day}th {day.strftime('%b')}",
+                    "event_name": "A2 480m",
+                    "event_dt": start.strftime(fmt),
+                    "selection_id": 100000 + NAMES.index(name),
+                    "selection_name": f"{i + 1}. {name}" + (" (IRE)" if i == 2 else ""),
+                    "win_lose": int(i == winner or (market == "place" and i == (winner + 1) % len(runners))),
+                    "bsp": "" if (r + i) % 17 == 0 else f"{float(rng.uniform(1.5, 20)):.2f}",
+                    "pptradedvol": round(float(rng.exponential(500)), 2),
+                })
+            # Nome repetido (fica a posição da 1ª ocorrência e os valores da última) e linha sem nome
+            rows.append({**rows[-2], "pptradedvol": 1.5, "bsp": "9.90"})
+            rows.append({**rows[-1], "selection_name": ""})
+        top = list(rng.choice(runners, size=3, replace=False))
+        iso = start.strftime("%Y-%m-%dT%H:%M")
+        top3_rows.append({"track_name": track, "race_time_iso": iso, "TimeformTop1": top[0], "TimeformTop2": top[1], "TimeformTop3": top[2]})
+        fc = ", ".join(f"{float(rng.uniform(2, 9)):.2f} {n}" for n in runners[:4])
+        fc_rows.append({"track_name": track, "race_time_iso": iso, "TimeformForecast": f"TimeformForecast : {fc}"})
+    # A primeira corrida volta a aparecer no fim do arquivo (fora da ordem)
+    win_rows.append({**win_rows[0], "pptradedvol": 7.25})
+    ds = day.strftime("%d%m%Y")
+    pd.DataFrame(win_rows).to_csv(root / "Result" / f"dwbfgreyhoundwin{ds}.csv", index=False, encoding=settings.CSV_ENCODING)
+    pd.DataFrame(place_rows).to_csv(root / "Result" / f"dwbfgreyhoundplace{ds}.csv", index=False, encoding=settings.CSV_ENCODING)
+    iso_day = day.strftime("%Y-%m-%d")
+    pd.DataFrame(top3_rows).to_csv(root / "timeform_top3" / f"timeform_top3_{iso_day}.csv", index=False, encoding=settings.CSV_ENCODING)
+    pd.DataFrame(fc_rows).to_csv(root / "TimeformForecast" / f"TimeformForecast_{iso_day}.csv", index=False, encoding=settings.CSV_ENCODING)
+
+
+def write_sample_data(root: Path, days: int = 4, races: int = 18, seed: int = 7, first_day: int = 0) -> None:
+    """Dias ``first_day`` .. ``first_day + days - 1`` a partir de 2025-01-01."""
+    for folder in ("Result", "timeform_top3", "TimeformForecast"):
+        (root / folder).mkdir(parents=True, exist_ok=True)
+    for d in range(first_day, first_day + days):
+        rng = np.random.default_rng(seed + d)
+        write_result_day(root, datetime(2025, 1, 1) + timedelta(days=d), races, rng, 30000000 + 1000 * d)
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path):
+    """DATA_DIR temporário com os dados sintéticos (restaurado ao final do teste)."""
+    root = tmp_path / "data"
+    write_sample_data(root)
+    previous = settings.DATA_DIR
+    object.__setattr__(settings, "DATA_DIR", root)
+    yield root
+    object.__setattr__(settings, "DATA_DIR", previous)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.betfair import (
+    RunnerTable,
+    RunnerTableBuilder,
+    _read_result_csv,
+    load_betfair_results,
+    load_normalized_results,
+    stream_betfair_results,
+)
+from src.analysis.races import RaceIndex
+
+_TABLE_FIELDS = [
+    "track_pool", "iso_pool", "race_track", "race_iso", "offsets", "name_pool", "name_codes",
+    "raw_pool", "raw_codes", "pptradedvol", "bsp", "win_lose", "selection_id",
+]
+
+
+def assert_same_table(a: RunnerTable, b: RunnerTable) -> None:
+    for name in _TABLE_FIELDS:
+        x, y = getattr(a, name), getattr(b, name)
+        assert x.dtype == y.dtype, name
+        assert np.array_equal(x, y, equal_nan=x.dtype.kind == "f"), name
+
+
+def test_chunked_read_matches_whole_file(data_dir):
+    for path in sorted((data_dir / "Result").glob("*.csv")):
+        whole = _read_result_csv(path, chunk_rows=None, memory_mb=1 << 20)
+        for rows in (7, 50):
+            pd.testing.assert_frame_equal(_read_result_csv(path, chunk_rows=rows), whole)
+
+
+def test_streamed_table_matches_from_frame(data_dir):
+    for market in ("win", "place"):
+        reference = RunnerTable.from_frame(load_normalized_results(market, use_cache=False))
+        for rows in (5, 33, 10000):
+            assert_same_table(stream_betfair_results(market, chunk_rows=rows), reference)
+
+
+def test_builder_handles_races_out_of_order(data_dir):
+    frame = load_normalized_results("win", use_cache=False)
+    parts = [frame.iloc[i:i + 19] for i in range(0, len(frame), 19)]
+    order = np.random.default_rng(3).permutation(len(parts))
+    builder = RunnerTableBuilder()
+    for i in order:
+        builder.add(parts[i])
+    shuffled = pd.concat([parts[i] for i in order], ignore_index=True)
+    assert_same_table(builder.build(), RunnerTable.from_frame(shuffled))
+
+
+def test_streamed_loader_binds_same_race_ids(data_dir):
+    cached_races, streamed_races = RaceIndex(), RaceIndex()
+    cached = load_betfair_results("win", use_cache=True, races=cached_races)
+    streamed = load_betfair_results("win", use_cache=False, races=streamed_races)
+    assert_same_table(streamed, cached)
+    assert np.array_equal(streamed.race_id, cached.race_id)
+    assert np.array_equal(streamed_races.event_ids, cached_races.event_ids)
@@ -0,0 +1,91 @@
+import shutil
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config import settings
+from src.utils.files import condense_csv_to_single_row, condense_day_folders
+
+_COLUMNS = ["track_name", "race_time_iso", "TimeformTop1", "TimeformTop2", "TimeformTop3", "num_runners", "bsp", "is_final", "notes"]
+
+
+def _legacy_condense(csv_path: Path) -> None:
+    """condense_csv_to_single_row original (laço por coluna/célula), referência do lote vetorizado."""
+    df = pd.read_csv(csv_path)
+    if df.empty:
+        df.to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+        return
+    aggregated: Dict[str, object] = {}
+    for col in df.columns:
+        series = df[col]
+        val = None
+        for item in series[::-1]:
+            if pd.notna(item) and str(item).strip() != "":
+                val = item
+                break
+        aggregated[col] = val if val is not None else series.iloc[-1]
+    pd.DataFrame([aggregated]).to_csv(csv_path, index=False, encoding=settings.CSV_ENCODING)
+
+
+def _write_day_folders(root: Path, days: int = 3, races: int = 40, seed: int = 5) -> None:
+    """Pastas AAAA-MM-DD/<pista>/<corrida>.csv com células vazias, só espaços, colunas sem valor,
+    números, booleanos e arquivos só com cabeçalho; race_links.csv na raiz do dia."""
+    rng = np.random.default_rng(seed)
+    for d in range(days):
+        day_dir = root / f"2025-01-{d + 1:02d}"
+        day_dir.mkdir(parents=True)
+        pd.DataFrame([{"track_name": "Track_0", "race_url": "a"}] * 2).to_csv(day_dir / "race_links.csv", index=False, encoding=settings.CSV_ENCODING)
+        for r in range(races):
+            track_dir = day_dir / f"Track_{r % 4}"
+            track_dir.mkdir(exist_ok=True)
+            rows = []
+            for i in range(0 if r % 13 == 0 else int(rng.integers(1, 12))):
+                row = {}
+                for c in _COLUMNS:
+                    roll = rng.random()
+                    if (c == "notes" and r % 5 == 0) or roll < 0.25:
+                        row[c] = None
+                    elif roll < 0.35 and c not in ("num_runners", "bsp", "is_final"):
+                        row[c] = "   "
+                    elif c == "num_runners":
+                        row[c] = int(rng.integers(4, 9))
+                    elif c == "bsp":
+                        row[c] = round(float(rng.uniform(1.1, 30)), 2)
+                    elif c == "is_final":
+                        row[c] = bool(rng.integers(0, 2))
+                    else:
+                        row[c] = f"{c}_{i}_{int(rng.integers(0, 100))}"
+                rows.append(row)
+            pd.DataFrame(rows, columns=_COLUMNS).to_csv(track_dir / f"race_{r:03d}.csv", index=False, encoding=settings.CSV_ENCODING)
+
+
+@pytest.fixture
+def day_folders(tmp_path: Path):
+    fixtures = tmp_path / "fixtures"
+    _write_day_folders(fixtures)
+    reference = tmp_path / "reference"
+    shutil.copytree(fixtures, reference)
+    for path in reference.glob("*/*/*.csv"):
+        _legacy_condense(path)
+    return fixtures, reference
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_condense_day_folders_matches_legacy(day_folders, tmp_path, workers):
+    fixtures, reference = day_folders
+    out = tmp_path / f"out_{workers}"
+    shutil.copytree(fixtures, out)
+    n = condense_day_folders(sorted(out.iterdir()), workers=workers)
+    paths = sorted(p.relative_to(reference) for p in reference.rglob("*.csv"))
+    assert n == sum(1 for p in paths if p.name != "race_links.csv")
+    assert [p for p in paths if (out / p).read_bytes() != (reference / p).read_bytes()] == []
+
+
+def test_condense_single_file_matches_legacy(day_folders):
+    fixtures, reference = day_folders
+    for path in sorted(fixtures.glob("*/Track_1/*.csv")):
+        condense_csv_to_single_row(path)
+        assert path.read_bytes() == (reference / path.relative_to(fixtures)).read_bytes()
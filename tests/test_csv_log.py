@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import settings
+from src.utils.files import append_or_create_csv, compact_csv_log, read_csv_with_log, upsert_row_by_keys, upsert_single_row_csv
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _write_mixed(tmp_path: Path) -> list:
+    """Um CSV de cada função de gravação, com parte dos registros já compactada e parte no log."""
+    paths = [tmp_path / "links.csv", tmp_path / "race.csv", tmp_path / "runners.csv"]
+    for i in range(12):
+        append_or_create_csv(paths[0], {"track_name": f"Track {i % 3}", "race_url": f"u{i}"})
+        upsert_single_row_csv(paths[1], {"track_name": "Hove", f"TimeformTop{i % 3 + 1}": f"Dog {i}", "num_runners": i})
+        upsert_row_by_keys(paths[2], {"race": f"r{i % 4}", "name": f"n{i % 2}", "bsp": i + 0.5, "notes": "" if i % 5 else "x"}, ["race", "name"])
+        if i == 5:
+            for path in paths:
+                compact_csv_log(path)
+    return paths
+
+
+def test_read_csv_with_log_matches_compacted(tmp_path):
+    paths = _write_mixed(tmp_path)
+    pending = [read_csv_with_log(path) for path in paths]
+    for path in paths:
+        assert path.with_name(path.name + ".log").exists()
+        compact_csv_log(path)
+    for path, df in zip(paths, pending):
+        pd.testing.assert_frame_equal(df, pd.read_csv(path, encoding=settings.CSV_ENCODING))
+        pd.testing.assert_frame_equal(read_csv_with_log(path), df)
+
+
+def test_logs_compacted_at_exit(tmp_path):
+    csv_path = tmp_path / "race.csv"
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from pathlib import Path\n"
+        "from src.utils.files import upsert_row_by_keys\n"
+        "for i in range(5):\n"
+        "    upsert_row_by_keys(Path(sys.argv[2]), {'race': 'r1', 'name': f'n{i % 2}', 'bsp': i}, ['race', 'name'])\n"
+    )
+    subprocess.run([sys.executable, "-c", code, str(PROJECT_ROOT), str(csv_path)], check=True)
+    assert not csv_path.with_name(csv_path.name + ".log").exists()
+    df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+    assert df.to_dict(orient="records") == [{"race": "r1", "name": "n1", "bsp": 3}, {"race": "r1", "name": "n0", "bsp": 4}]
@@ -0,0 +1,48 @@
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.analysis.incremental import generate_signals_incremental
+from src.analysis.rules import RULES
+
+from conftest import write_result_day, write_sample_data
+
+COMBOS = [(s, m, r) for s in ("top3", "forecast") for m in ("win", "place") for r in ("lider_volume_total", "terceiro_queda50")]
+
+
+def _outputs(out_dir: Path) -> dict:
+    return {p.name: p.read_bytes() for p in sorted(out_dir.glob("signals_*.csv"))}
+
+
+def _full(tmp_path: Path, name: str) -> dict:
+    out_dir = tmp_path / name
+    generate_signals_incremental(COMBOS, engine="vectorized", full_rebuild=True, out_dir=out_dir)
+    return _outputs(out_dir)
+
+
+def test_incremental_matches_full_generation(data_dir, tmp_path):
+    inc_dir = tmp_path / "inc"
+    generate_signals_incremental(COMBOS, engine="vectorized", out_dir=inc_dir)
+    assert _outputs(inc_dir) == _full(tmp_path, "full_0")
+
+    # Um dia novo e um arquivo existente alterado
+    write_sample_data(data_dir, days=1, first_day=4)
+    write_result_day(data_dir, datetime(2025, 1, 2), 18, np.random.default_rng(99), 30001000)
+    generate_signals_incremental(COMBOS, engine="vectorized", out_dir=inc_dir)
+    assert _outputs(inc_dir) == _full(tmp_path, "full_1")
+
+    # Sem mudanças: nada é regravado
+    before = {p.name: p.stat().st_mtime_ns for p in inc_dir.glob("signals_*.csv")}
+    generate_signals_incremental(COMBOS, engine="vectorized", out_dir=inc_dir)
+    assert {p.name: p.stat().st_mtime_ns for p in inc_dir.glob("signals_*.csv")} == before
+
+
+def test_incremental_rebuilds_when_rule_changes(data_dir, tmp_path, monkeypatch):
+    inc_dir = tmp_path / "inc"
+    generate_signals_incremental(COMBOS, engine="vectorized", out_dir=inc_dir)
+    rule = RULES["lider_volume_total"]
+    monkeypatch.setitem(RULES, "lider_volume_total", replace(rule, expression=f"{rule.expression} and num_runners >= 6"))
+    generate_signals_incremental(COMBOS, engine="vectorized", out_dir=inc_dir)
+    assert _outputs(inc_dir) == _full(tmp_path, "full")
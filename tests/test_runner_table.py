@@ -0,0 +1,76 @@
+import math
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from src.config import settings
+from src.analysis.betfair import (
+    RESULT_FILE_PREFIX,
+    RunnerBF,
+    _extract_track_from_menu_hint,
+    _strip_trap_prefix,
+    _to_iso_yyyy_mm_dd_thh_mm,
+    load_betfair_results,
+)
+from src.utils.text import clean_horse_name
+
+
+def _legacy_index(market: str) -> Dict[Tuple[str, str], Dict[str, RunnerBF]]:
+    """Índice dict-de-dicts original (groupby + iterrows), referência da RunnerTable."""
+    index: Dict[Tuple[str, str], Dict[str, RunnerBF]] = {}
+    for csv_path in sorted((settings.DATA_DIR / "Result").glob(f"{RESULT_FILE_PREFIX[market]}*.csv")):
+        df = pd.read_csv(csv_path, encoding=settings.CSV_ENCODING)
+        df["track_key"] = df["menu_hint"].astype(str).map(_extract_track_from_menu_hint)
+        df["race_iso"] = df["event_dt"].astype(str).map(_to_iso_yyyy_mm_dd_thh_mm)
+        df["selection_name_raw"] = df["selection_name"].astype(str)
+        df["selection_name_clean"] = df["selection_name_raw"].map(_strip_trap_prefix).map(clean_horse_name)
+        df["pptradedvol"] = pd.to_numeric(df["pptradedvol"], errors="coerce").fillna(0.0)
+        df["bsp"] = pd.to_numeric(df["bsp"], errors="coerce")
+        df["win_lose"] = pd.to_numeric(df["win_lose"], errors="coerce").fillna(0).astype(int)
+        for (track_key, race_iso), grp in df.groupby(["track_key", "race_iso"], dropna=False):
+            if not track_key or not race_iso:
+                continue
+            runners = index.setdefault((track_key, race_iso), {})
+            for _, r in grp.iterrows():
+                name = r["selection_name_clean"]
+                if not isinstance(name, str) or not name:
+                    continue
+                runners[name] = RunnerBF(
+                    selection_name_raw=r["selection_name_raw"],
+                    selection_name_clean=name,
+                    pptradedvol=float(r["pptradedvol"]),
+                    bsp=float(r["bsp"]) if pd.notna(r["bsp"]) else float("nan"),
+                    win_lose=int(r["win_lose"]),
+                )
+    return index
+
+
+def _same_runner(a: RunnerBF, b: RunnerBF) -> bool:
+    same_bsp = (math.isnan(a.bsp) and math.isnan(b.bsp)) or a.bsp == b.bsp
+    return (
+        a.selection_name_raw == b.selection_name_raw
+        and a.selection_name_clean == b.selection_name_clean
+        and a.pptradedvol == b.pptradedvol
+        and same_bsp
+        and a.win_lose == b.win_lose
+    )
+
+
+def test_runner_table_matches_legacy_index(data_dir):
+    for market in ("win", "place"):
+        legacy = _legacy_index(market)
+        table = load_betfair_results(market, use_cache=False)
+        assert set(table) == set(legacy)
+        for key, runners in legacy.items():
+            group = table[key]
+            assert list(group) == list(runners), key
+            assert all(_same_runner(r, group[name]) for name, r in runners.items()), key
+
+
+def test_runner_table_cache_matches_csv(data_dir):
+    cold = load_betfair_results("win", use_cache=True)
+    for other in (load_betfair_results("win", use_cache=True), load_betfair_results("win", use_cache=False)):
+        assert other.race_keys == cold.race_keys
+        for key in cold.race_keys:
+            assert list(other[key]) == list(cold[key])
+            assert all(_same_runner(r, other[key][name]) for name, r in cold[key].items())